@@ -0,0 +1,139 @@
+"""Async variants of the hot API endpoints, used when ``SUITUNE_ASYNC_API``.
+
+They answer with the same payloads as :mod:`apps.api.views` but never block
+the event loop: queue and score updates go through the ``a``-prefixed
+``RadioService``/``QueueManager`` methods and tracks are loaded with the
+async ORM, so one ASGI worker can keep thousands of connections open.
+"""
+
+import asyncio
+import json
+
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from apps.core import metrics
+from apps.core.concurrency import call_unblocked
+from apps.library.models import Track
+from apps.playback.ingest import feedback_buffer
+from apps.playback.models import Feedback
+from apps.playback.serializers import FeedbackEventSerializer
+from apps.radio import play_queue, radio_service
+from apps.radio.channels import channel_registry
+
+from .views import (
+    MAX_FEEDBACK_EVENTS,
+    feedback_events,
+    parse_count,
+    parse_seed,
+    track_items,
+)
+
+# Longest ``?wait=`` a client may hold /api/next open for, in seconds.
+MAX_WAIT = 30.0
+POLL_INTERVAL = 0.5
+
+
+def _error(message, status=400):
+    return JsonResponse({"error": message}, status=status)
+
+
+@require_GET
+async def me(request):
+    """Return basic information about the current user."""
+    user = await request.auser()
+    return JsonResponse(
+        {"username": user.get_username() if user.is_authenticated else None}
+    )
+
+
+@require_GET
+async def next_track(request):
+    """Return the next recommended track(s) for a channel.
+
+    Accepts ``?count=N`` and ``?seed=`` like the sync view, plus
+    ``?wait=S``: when nothing can be played right now, keep polling for up
+    to ``S`` seconds instead of answering 204 straight away.
+    """
+    channels = await channel_registry.asnapshot()
+    channel = channels.resolve(request.GET.get("channel", "default"))
+    count = request.GET.get("count")
+    try:
+        wanted = parse_count(count)
+        seed = parse_seed(request.GET.get("seed"))
+        wait = min(max(float(request.GET.get("wait") or 0), 0.0), MAX_WAIT)
+    except ValueError as exc:
+        return _error(str(exc))
+
+    metrics.label(channel=channel)
+    session = request.session.session_key or ""
+    user = await request.auser()
+    user_id = user.pk if user.is_authenticated else None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        with metrics.phase("queue"):
+            ids = await play_queue.atake(channel, session, wanted, seed, user_id)
+        if ids or loop.time() >= deadline:
+            break
+        await asyncio.sleep(POLL_INTERVAL)
+    tracks = {track.id: track async for track in Track.objects.filter(id__in=ids)}
+    items = track_items(ids, tracks, radio_service)
+    if count is not None:
+        return JsonResponse({"tracks": items})
+    if not items:
+        return HttpResponse(status=204)
+    return JsonResponse(items[0])
+
+
+def _csrf_failure(request):
+    """Enforce CSRF for session-authenticated users, as DRF does."""
+    check = CsrfViewMiddleware(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+@csrf_exempt
+@require_POST
+async def feedback(request):
+    """Record one feedback event or a JSON array of them."""
+    user = await request.auser()
+    if user.is_authenticated:
+        failure = _csrf_failure(request)
+        if failure is not None:
+            return failure
+    try:
+        data = json.loads(request.body or b"null")
+    except ValueError:
+        return _error("invalid JSON")
+    many = isinstance(data, list)
+    if many and len(data) > MAX_FEEDBACK_EVENTS:
+        return _error(f"at most {MAX_FEEDBACK_EVENTS} events per request")
+    serializer = FeedbackEventSerializer(data=data, many=many)
+    with metrics.phase("validate"):
+        valid = serializer.is_valid()
+    if not valid:
+        return _error(serializer.errors)
+
+    user_id = user.pk if user.is_authenticated else None
+    channels = await channel_registry.asnapshot()
+    events = feedback_events(serializer, many, user_id, channels)
+    if events:
+        metrics.label(channel=events[0].channel)
+    with metrics.phase("score"):
+        for event in events:
+            await radio_service.asubmit_feedback(
+                event.channel, event.track_id, event.action, event.user_id
+            )
+            if event.action == Feedback.BAN:
+                await call_unblocked(
+                    (play_queue._lock,),
+                    play_queue.discard,
+                    event.channel,
+                    event.track_id,
+                )
+    with metrics.phase("buffer"):
+        await feedback_buffer.aadd(events)
+    return JsonResponse({"status": "received", "count": len(events)}, status=202)
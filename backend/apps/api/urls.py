@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from apps.library.views import TrackViewSet
-from apps.playback.views import PlaybackViewSet, FeedbackViewSet
+from apps.library.views import TrackViewSet, artwork_file, search_tracks, track_artwork
+from apps.playback.views import PlaybackViewSet, FeedbackViewSet, play_stats, stream
 from apps.radio.views import ChannelViewSet, RatingWeightViewSet
-from . import views
+from . import async_views, views
+
+# Under ASGI the hot endpoints run natively async (see async_views).
+hot = async_views if settings.SUITUNE_ASYNC_API else views
 
 router = DefaultRouter()
 router.register("tracks", TrackViewSet, basename="track")
@@ -14,7 +18,18 @@ router.register("rating-weights", RatingWeightViewSet, basename="ratingweight")
 
 urlpatterns = [
     path("", include(router.urls)),
-    path("me", views.me),
-    path("next", views.next_track),
-    path("feedback", views.feedback),
+    path("me", hot.me),
+    path("next", hot.next_track),
+    path("feedback", hot.feedback),
+    path("metrics", views.metrics_view),
+    path("export", views.export_view),
+    path("stats", play_stats),
+    path("search", search_tracks),
+    path("artwork/<int:track_id>", track_artwork),
+    path("artwork/<str:digest>/<int:size>.jpg", artwork_file, name="artwork"),
+    path(
+        "stream/<int:track_id>/<int:expires>/<str:signature>/<path:path>",
+        stream,
+        name="stream",
+    ),
 ]
@@ -1,10 +1,74 @@
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-from rest_framework.decorators import api_view
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 
+from apps.core import metrics
+from apps.core.transfer import MODELS, aexport_chunks, export_chunks
+from apps.library.models import Track
 from apps.library.serializers import TrackSerializer
-from apps.radio import radio_service
+from apps.playback.ingest import FeedbackEvent, feedback_buffer
+from apps.playback.models import Feedback
+from apps.playback.serializers import FeedbackEventSerializer
+from apps.radio import play_queue, radio_service
+from apps.radio.channels import channel_registry
+
+MAX_BATCH = 20
+MAX_FEEDBACK_EVENTS = 1000
+
+
+def parse_count(count):
+    """Return the requested batch size (``None`` if not requested) or raise."""
+    try:
+        wanted = 1 if count is None else int(count)
+    except ValueError:
+        wanted = 0
+    if not 1 <= wanted <= MAX_BATCH:
+        raise ValueError(f"count must be between 1 and {MAX_BATCH}")
+    return wanted
+
+
+def parse_seed(seed):
+    """Return the ``?seed=`` track id (``None`` if not given) or raise."""
+    if seed in (None, ""):
+        return None
+    try:
+        return int(seed)
+    except ValueError:
+        raise ValueError("seed must be a track id") from None
+
+
+def track_items(ids, tracks, service):
+    """Serialise ``ids`` in order with signed stream URLs."""
+    with metrics.phase("serialize"):
+        return [
+            {
+                "track": TrackSerializer(tracks[track_id]).data,
+                "stream_url": service.sign_url(tracks[track_id]),
+            }
+            for track_id in ids
+            if track_id in tracks
+        ]
+
+
+def feedback_events(serializer, many, user_id, channels):
+    """Build events, naming channels given by id (``channels`` is a snapshot)."""
+    now = timezone.now()
+    return [
+        FeedbackEvent(
+            track_id=item["track_id"],
+            action=item["action"],
+            channel=channels.resolve(item["channel"]),
+            occurred_at=item.get("ts") or now,
+            user_id=user_id,
+        )
+        for item in (serializer.validated_data if many else [serializer.validated_data])
+    ]
 
 
 @api_view(["GET"])
@@ -18,26 +82,114 @@ def me(request):
 
 @api_view(["GET"])
 def next_track(request):
-    """Return the next recommended track for a channel."""
-    channel = request.query_params.get("channel", "default")
-    track, stream_url = radio_service.next_track(channel)
-    if not track:
+    """Return the next recommended track(s) for a channel.
+
+    ``?channel=`` is a channel name or id; ``?seed=<track id>`` leans
+    towards tracks similar to that one. With ``?count=N`` up to ``N``
+    queued tracks are returned at once as
+    ``{"tracks": [{"track": ..., "stream_url": ...}, ...]}``.
+    """
+    channel = channel_registry.resolve(request.query_params.get("channel", "default"))
+    count = request.query_params.get("count")
+    try:
+        wanted = parse_count(count)
+        seed = parse_seed(request.query_params.get("seed"))
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    metrics.label(channel=channel)
+    session = request.session.session_key or ""
+    user_id = request.user.pk if request.user.is_authenticated else None
+    with metrics.phase("queue"):
+        ids = play_queue.take(channel, session, wanted, seed, user_id)
+    items = track_items(ids, Track.objects.in_bulk(ids), radio_service)
+    if count is not None:
+        return Response({"tracks": items})
+    if not items:
         return Response(status=status.HTTP_204_NO_CONTENT)
-    data = TrackSerializer(track).data
-    return Response({"track": data, "stream_url": stream_url})
+    return Response(items[0])
 
 
 @api_view(["POST"])
 def feedback(request):
-    """Record feedback for a track and acknowledge it."""
-    channel = request.data.get("channel", "default")
-    track_id = request.data.get("track_id")
-    liked = request.data.get("liked")
-    if track_id is None or liked is None:
-        return Response({"error": "track_id and liked are required"}, status=status.HTTP_400_BAD_REQUEST)
+    """Record one feedback event or a JSON array of them.
 
-    try:
-        radio_service.submit_feedback(channel, int(track_id), bool(liked))
-        return Response({"status": "received"}, status=status.HTTP_201_CREATED)
-    except (ValueError, TypeError):
-        return Response({"error": "Invalid track_id or liked format"}, status=status.HTTP_400_BAD_REQUEST)
+    Scores are updated immediately; the events themselves are persisted in
+    batches by the feedback buffer, so the response never waits on the DB.
+    """
+    many = isinstance(request.data, list)
+    if many and len(request.data) > MAX_FEEDBACK_EVENTS:
+        return Response(
+            {"error": f"at most {MAX_FEEDBACK_EVENTS} events per request"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    serializer = FeedbackEventSerializer(data=request.data, many=many)
+    with metrics.phase("validate"):
+        valid = serializer.is_valid()
+    if not valid:
+        return Response(
+            {"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    user_id = request.user.pk if request.user.is_authenticated else None
+    events = feedback_events(serializer, many, user_id, channel_registry.snapshot())
+    if events:
+        metrics.label(channel=events[0].channel)
+    with metrics.phase("score"):
+        for event in events:
+            radio_service.submit_feedback(
+                event.channel, event.track_id, event.action, event.user_id
+            )
+            if event.action == Feedback.BAN:
+                play_queue.discard(event.channel, event.track_id)
+    with metrics.phase("buffer"):
+        feedback_buffer.add(events)
+    return Response(
+        {"status": "received", "count": len(events)}, status=status.HTTP_202_ACCEPTED
+    )
+
+
+def metrics_view(request):
+    """Expose request histograms in the Prometheus text format.
+
+    Not served at all unless ``SUITUNE_METRICS_TOKEN`` is set.
+    """
+    token = settings.SUITUNE_METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=404)
+    if not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def export_view(request):
+    """Stream an NDJSON export (see ``apps.core.transfer``); admins only.
+
+    ``?models=`` limits it to a comma-separated subset of the model labels.
+    """
+    labels = request.query_params.get("models")
+    labels = labels.split(",") if labels else None
+    if labels and not set(labels) <= set(MODELS):
+        return Response(
+            {"detail": f"models must be among {', '.join(MODELS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    # Under ASGI a sync iterator would be collected into one list first.
+    if hasattr(request, "scope"):
+        chunks = aexport_chunks(labels)
+    else:
+        chunks = export_chunks(labels)
+    stamp = timezone.now().strftime("%Y%m%d-%H%M%S")
+    return StreamingHttpResponse(
+        chunks,
+        content_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="suitune-{stamp}.ndjson"'
+        },
+    )
@@ -4,3 +4,25 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.core"
+
+    def ready(self):
+        from django.conf import settings
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from apps.library.signals import library_changed
+
+        from . import metrics
+        from .catalog import catalog_changed
+
+        for model in ("library.Track", "radio.Channel", "radio.RatingWeight"):
+            post_save.connect(catalog_changed, sender=model)
+            post_delete.connect(catalog_changed, sender=model)
+        library_changed.connect(catalog_changed)
+
+        if getattr(settings, "SUITUNE_METRICS_ENABLED", True):
+            connection_created.connect(metrics.instrument)
+            # Connections opened before now (e.g. by other apps' ready()).
+            for connection in connections.all(initialized_only=True):
+                metrics.instrument(connection)
@@ -0,0 +1,153 @@
+"""Catalog version and conditional, cached responses for catalog viewsets.
+
+The catalog (tracks, channels, rating weights) only changes on writes and
+library scans. Every such change stores a new random version token, with its
+timestamp, in a one-row table (:class:`~apps.core.models.CatalogVersion`);
+responses derive their ``ETag`` and ``Last-Modified`` from it and serialised
+bodies are cached under it.
+
+Each process remembers the version it last read for
+``SUITUNE_CATALOG_CHECK_INTERVAL`` seconds, so a revalidation is usually
+answered without a query, and a change made by another worker or by
+``manage.py`` reaches every process within that interval whatever cache
+backend is configured.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+import uuid
+from typing import Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+# ``(version, monotonic time it was read)`` of the version this process knows.
+_known: Optional[Tuple[Tuple[str, float], float]] = None
+
+
+def _cache():
+    return caches[getattr(settings, "SUITUNE_CATALOG_CACHE", "default")]
+
+
+def _versions():
+    return apps.get_model("core", "CatalogVersion").objects
+
+
+def bump_catalog_version() -> Tuple[str, float]:
+    """Store and return a new ``(token, timestamp)`` catalog version."""
+    global _known
+    version = (uuid.uuid4().hex[:16], time.time())
+    _versions().update_or_create(
+        pk=1, defaults={"token": version[0], "changed_at": version[1]}
+    )
+    _known = (version, time.monotonic())
+    return version
+
+
+def catalog_version(max_age: Optional[float] = None) -> Tuple[str, float]:
+    """Return the current ``(token, timestamp)`` catalog version.
+
+    The version read last is reused for ``max_age`` seconds (by default
+    ``SUITUNE_CATALOG_CHECK_INTERVAL``); pass ``0`` to read it now.
+    """
+    global _known
+    if max_age is None:
+        max_age = getattr(settings, "SUITUNE_CATALOG_CHECK_INTERVAL", 2.0)
+    now = time.monotonic()
+    if _known is not None and now - _known[1] < max_age:
+        return _known[0]
+    version = _versions().filter(pk=1).values_list("token", "changed_at").first()
+    if version is None:
+        return bump_catalog_version()
+    _known = (version, now)
+    return version
+
+
+def catalog_changed(sender=None, **kwargs) -> None:
+    """Signal receiver: bump now and again once the transaction commits.
+
+    The second bump drops anything cached from a reader that saw the
+    version change before the new rows were visible to it.
+    """
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tokens = [token.strip() for token in header.split(",")]
+    return "*" in tokens or etag in tokens
+
+
+class ConditionalCatalogMixin:
+    """Serve ``list``/``retrieve`` with validators and a body cache.
+
+    ``If-None-Match`` (or, without it, ``If-Modified-Since``) is answered
+    with ``304`` before the handler runs. JSON bodies are cached per catalog
+    version and full request path for ``SUITUNE_CATALOG_CACHE_TIMEOUT``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        token, modified = catalog_version()
+        media_type = request.accepted_media_type
+        digest = hashlib.sha1(
+            f"{request.get_full_path()}\n{media_type}".encode()
+        ).hexdigest()[:16]
+        etag = f'"{token}.{digest}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": http_date(modified),
+            # Cache, but revalidate every time: it is a 304 at worst.
+            "Cache-Control": "no-cache",
+        }
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            fresh = _etag_matches(if_none_match, etag)
+        else:
+            since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+            fresh = since is not None and int(modified) <= since
+        if fresh:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        self._body_key = None
+        if request.accepted_renderer.format == "json":
+            key = f"suitune:catalog:{token}:{digest}"
+            body = _cache().get(key)
+            if body is not None:
+                response = HttpResponse(body, content_type=media_type)
+                for name, value in headers.items():
+                    response[name] = value
+                return response
+            self._body_key = key
+        response = handler(request, *args, **kwargs)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            getattr(self, "_body_key", None)
+            and isinstance(response, Response)
+            and response.status_code == 200
+        ):
+            response.render()
+            _cache().set(
+                self._body_key,
+                response.content,
+                getattr(settings, "SUITUNE_CATALOG_CACHE_TIMEOUT", 3600),
+            )
+        return response
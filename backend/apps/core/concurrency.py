@@ -0,0 +1,45 @@
+"""Helpers for sharing thread-locked state with async views."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Callable, Sequence, TypeVar
+
+from asgiref.sync import sync_to_async
+
+T = TypeVar("T")
+
+
+def in_event_loop() -> bool:
+    """Return whether the calling thread is running an asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+async def call_unblocked(locks: Sequence, fn: Callable[..., T], *args) -> T:
+    """Run ``fn(*args)`` without ever blocking the event loop on ``locks``.
+
+    ``locks`` must be re-entrant (``RLock``) and are the locks ``fn`` takes
+    itself. When all of them are free they are held while ``fn`` runs inline,
+    which is the common case for in-memory work; otherwise ``fn`` runs in a
+    worker thread and waits there.
+
+    Run inline, ``fn`` must not touch the database: the radio caches check
+    :func:`in_event_loop` and put off refreshes that fall due meanwhile
+    until the next call from a worker thread (e.g. ``RadioService.aprepare``).
+    """
+    held = []
+    try:
+        for lock in locks:
+            if not lock.acquire(blocking=False):
+                break
+            held.append(lock)
+        else:
+            return fn(*args)
+    finally:
+        for lock in reversed(held):
+            lock.release()
+    return await sync_to_async(fn)(*args)
@@ -0,0 +1,45 @@
+"""Export the library and listening history as NDJSON."""
+
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand
+
+from apps.core.transfer import MODELS, export_lines
+
+
+class Command(BaseCommand):
+    help = (
+        "Write tracks, channels, rating weights, playbacks and feedback as "
+        "NDJSON, one row per line, for backups or moving hosts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            "-o",
+            default="-",
+            help="File to write; gzipped if it ends in .gz (default: stdout).",
+        )
+        parser.add_argument(
+            "--models", nargs="+", choices=MODELS, help="Only these models."
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        if output == "-":
+            out, close = sys.stdout, False
+        elif output.endswith(".gz"):
+            out, close = gzip.open(output, "wt", encoding="utf-8"), True
+        else:
+            out, close = open(output, "w", encoding="utf-8"), True
+        try:
+            rows = -1  # the header
+            for line in export_lines(options["models"]):
+                out.write(line)
+                rows += 1
+        finally:
+            if close:
+                out.close()
+        if output != "-":
+            self.stdout.write(self.style.SUCCESS(f"Exported {rows} rows."))
@@ -0,0 +1,48 @@
+"""Import an NDJSON export written by export_data."""
+
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.transfer import CHUNK_SIZE, Importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream an export_data file into the database with batched inserts. "
+        "Ids are kept in an empty database and shifted past existing rows "
+        "otherwise; with --checkpoint, an interrupted import resumes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Export file, .gz allowed; - for stdin.")
+        parser.add_argument("--batch-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            "--checkpoint",
+            help="Progress file; removed once the import has finished.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if path == "-":
+            source = sys.stdin
+        elif path.endswith(".gz"):
+            source = gzip.open(path, "rt", encoding="utf-8")
+        else:
+            source = open(path, encoding="utf-8")
+        importer = Importer(
+            batch_size=options["batch_size"], checkpoint=options["checkpoint"]
+        )
+        try:
+            counts = importer.run(source)
+        except (ValueError, KeyError) as exc:
+            raise CommandError(
+                f"Import failed in the batch from line {importer.line + 2}: {exc}"
+            )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        summary = ", ".join(f"{count} {label}" for label, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Imported {summary or 'nothing'}."))
+        self.stdout.write("Run rebuild_stats to rebuild the hourly play statistics.")
@@ -0,0 +1,187 @@
+"""Serve media files from Django, for deployments without Nginx.
+
+With ``SUITUNE_SERVE_MEDIA`` enabled, the stream and artwork views call
+:func:`serve_file` instead of handing the file to Nginx through
+``X-Accel-Redirect``. It answers what a browser's ``<audio>`` element asks
+for: ``Range`` requests (one range; ``206`` or ``416``) and ``If-Range``,
+conditional requests against an ``ETag`` and ``Last-Modified`` taken from
+the file's size and mtime, and ``HEAD``.
+
+The body is never read through Python buffers on the WSGI path. The
+response exposes the open file as ``file_to_stream``, limited to the
+requested range, and Django passes it to the server's
+``wsgi.file_wrapper``. gunicorn sends it with ``sendfile(2)``, starting at
+the file's offset and stopping after ``Content-Length`` bytes. Under ASGI, a
+sync iterator would be consumed through ``sync_to_async`` into one list
+(the whole range in memory, on the single thread-sensitive executor), so
+ASGI requests get an async iterator that reads large chunks in the default
+thread pool instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import mimetypes
+import os
+import re
+from typing import AsyncIterator, Optional, Tuple
+
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+# Chunk size when the server iterates the file itself (no sendfile).
+BLOCK_SIZE = 64 * 1024
+# Chunk size of the async iterator: fewer thread pool round trips.
+ASYNC_BLOCK_SIZE = 1024 * 1024
+
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class FileRange:
+    """File-like view of ``length`` bytes of ``file`` from ``start`` on.
+
+    ``fileno()`` is the underlying file's, positioned at ``start``, so a
+    server can ``sendfile`` the range; ``read()`` stops at its end.
+    """
+
+    def __init__(self, file, start: int, length: int) -> None:
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b""
+        self.remaining -= len(data)
+        return data
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __iter__(self):
+        return iter(lambda: self.read(BLOCK_SIZE), b"")
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        try:
+            while data := await asyncio.to_thread(self.read, ASYNC_BLOCK_SIZE):
+                yield data
+        finally:
+            self.close()
+
+
+class FileRangeResponse(StreamingHttpResponse):
+    """Stream a :class:`FileRange`, through ``wsgi.file_wrapper`` if possible."""
+
+    block_size = BLOCK_SIZE
+
+    def __init__(self, file_range: FileRange, asynchronous: bool, **kwargs) -> None:
+        content = file_range.chunks() if asynchronous else file_range
+        super().__init__(content, **kwargs)
+        self.file_to_stream = None if asynchronous else file_range
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Return the ``(start, end)`` bytes (inclusive) a ``Range`` header asks for.
+
+    ``None`` means the header is to be ignored (malformed, or several ranges)
+    and the whole file sent. Raise ``ValueError`` if the range cannot be
+    satisfied.
+    """
+    match = RANGE_RE.fullmatch(header.replace(" ", ""))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    elif last:
+        start, end = max(size - int(last), 0), size - 1
+        if not int(last):
+            raise ValueError("empty suffix range")
+    else:
+        return None
+    if start >= size:
+        raise ValueError("range starts past the end")
+    return start, end
+
+
+def _if_range_matches(value: str, etag: str, last_modified: int) -> bool:
+    if value.startswith(("W/", '"')):
+        return value == etag  # strong comparison: weak tags never match
+    return parse_http_date_safe(value) == last_modified
+
+
+def serve_file(request, root: str, path: str, cache_control: str = "") -> HttpResponse:
+    """Respond with the file at ``path`` below ``root``, honouring ranges.
+
+    Paths escaping ``root`` raise ``SuspiciousFileOperation`` (a 400).
+    """
+    full_path = safe_join(root, path)
+    try:
+        file = open(full_path, "rb", buffering=0)
+    except (OSError, ValueError):
+        raise Http404("No such file")
+    try:
+        stat = os.fstat(file.fileno())
+        size, last_modified = stat.st_size, int(stat.st_mtime)
+        etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": http_date(last_modified),
+            "Accept-Ranges": "bytes",
+        }
+        if cache_control:
+            headers["Cache-Control"] = cache_control
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:  # 304 Not Modified or 412
+            file.close()
+            for name, value in headers.items():
+                response[name] = value
+            return response
+
+        content_type, _ = mimetypes.guess_type(full_path)
+        headers["Content-Type"] = content_type or "application/octet-stream"
+        status, start, end = 200, 0, size - 1
+        header = request.META.get("HTTP_RANGE")
+        if_range = request.META.get("HTTP_IF_RANGE")
+        if header and (
+            if_range is None or _if_range_matches(if_range, etag, last_modified)
+        ):
+            try:
+                requested = parse_range(header, size)
+            except ValueError:
+                file.close()
+                headers["Content-Range"] = f"bytes */{size}"
+                del headers["Content-Type"]
+                return HttpResponse(status=416, headers=headers)
+            if requested is not None:
+                status, (start, end) = 206, requested
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+
+        if request.method == "HEAD":
+            file.close()
+            return HttpResponse(status=status, headers=headers)
+        return FileRangeResponse(
+            FileRange(file, start, end - start + 1),
+            asynchronous=hasattr(request, "scope"),
+            status=status,
+            headers=headers,
+        )
+    except BaseException:
+        file.close()
+        raise
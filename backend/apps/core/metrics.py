@@ -0,0 +1,241 @@
+"""Lightweight request instrumentation.
+
+Code on the hot path marks named phases::
+
+    with metrics.phase("sample"):
+        ...
+
+While :class:`~apps.core.middleware.MetricsMiddleware` is handling a request
+the phase durations, the number of SQL queries and their time are collected
+for that request, sent back as a ``Server-Timing`` header and folded into
+per-endpoint histograms, which :func:`render` prints in the Prometheus text
+format. Outside a request ``phase()`` is a no-op.
+
+Histograms live in the worker process; with several gunicorn workers every
+scrape sees the worker that answered it.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Label values come from clients (channel names); past this many series per
+# metric new ones are folded into ``other``.
+MAX_SERIES = 500
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-on-render bucket counts plus sum and count."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Named histograms keyed by label set."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[
+            str, Tuple[str, Sequence[float], Dict[Labels, Histogram]]
+        ] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float]) -> None:
+        self._metrics.setdefault(name, (help_text, buckets, {}))
+
+    def observe(self, name: str, labels: Dict[str, str], value: float) -> None:
+        _, buckets, series = self._metrics[name]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            hist = series.get(key)
+            if hist is None:
+                if len(series) >= MAX_SERIES:
+                    key = tuple((k, "other" if k == "channel" else v) for k, v in key)
+                    hist = series.get(key)
+                if hist is None:
+                    hist = series[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            for _, _, series in self._metrics.values():
+                series.clear()
+
+    def render(self) -> str:
+        """Return all histograms in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, (help_text, buckets, series) in self._metrics.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in series.items():
+                    labels = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+                    sep = "," if labels else ""
+                    cumulative = 0
+                    for bound, count in zip(list(buckets) + ["+Inf"], hist.counts):
+                        cumulative += count
+                        lines.append(
+                            f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}'
+                        )
+                    lines.append(f"{name}_sum{{{labels}}} {hist.sum}")
+                    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+registry.histogram(
+    "suitune_request_duration_seconds", "Request latency.", LATENCY_BUCKETS
+)
+registry.histogram(
+    "suitune_request_db_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS
+)
+registry.histogram("suitune_request_queries", "SQL queries per request.", QUERY_BUCKETS)
+registry.histogram(
+    "suitune_phase_seconds", "Time spent in named phases.", LATENCY_BUCKETS
+)
+
+
+class RequestTimings:
+    """Measurements for the request being handled."""
+
+    __slots__ = ("started", "phases", "queries", "db_time", "labels")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.queries = 0
+        self.db_time = 0.0
+        self.labels: Dict[str, str] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self, total: float) -> str:
+        parts = [f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"']
+        parts.extend(
+            f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.phases.items()
+        )
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "suitune_request_timings", default=None
+)
+_null = nullcontext()
+
+
+class _Phase:
+    __slots__ = ("timings", "name", "started")
+
+    def __init__(self, timings: RequestTimings, name: str) -> None:
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.timings.add(self.name, time.perf_counter() - self.started)
+
+
+def phase(name: str):
+    """Time the ``with`` block as phase ``name`` of the current request."""
+    timings = _current.get()
+    if timings is None:
+        return _null
+    return _Phase(timings, name)
+
+
+def label(**labels: str) -> None:
+    """Attach labels (e.g. ``channel``) to the current request's metrics."""
+    timings = _current.get()
+    if timings is not None:
+        timings.labels.update(labels)
+
+
+def count_queries(execute, sql, params, many, context):
+    """``execute_wrapper`` adding to the current request's timings, if any."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings.query_wrapper(execute, sql, params, many, context)
+
+
+def instrument(connection, **kwargs) -> None:
+    """``connection_created`` receiver installing :func:`count_queries`.
+
+    Every connection is wrapped, not just those of the thread running the
+    middleware: ORM calls from async views run in ``sync_to_async`` threads
+    with connections of their own, and the request's context goes with them.
+    """
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def start() -> Tuple[RequestTimings, object]:
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish(timings: RequestTimings, token, endpoint: str) -> float:
+    """Stop timing, record histograms and return the total duration."""
+    _current.reset(token)
+    total = time.perf_counter() - timings.started
+    labels = {"endpoint": endpoint, **timings.labels}
+    registry.observe("suitune_request_duration_seconds", labels, total)
+    registry.observe("suitune_request_db_seconds", labels, timings.db_time)
+    registry.observe("suitune_request_queries", labels, timings.queries)
+    for name, seconds in timings.phases.items():
+        registry.observe("suitune_phase_seconds", {**labels, "phase": name}, seconds)
+    return total
+
+
+def render() -> str:
+    return registry.render()
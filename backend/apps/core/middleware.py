@@ -0,0 +1,75 @@
+"""Request timing middleware."""
+
+from __future__ import annotations
+
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+
+logger = logging.getLogger("suitune.requests")
+
+
+class MetricsMiddleware:
+    """Time each request, record histograms and optionally add ``Server-Timing``.
+
+    The header is only sent with ``SUITUNE_SERVER_TIMING`` (default: DEBUG).
+    SQL is counted by :func:`metrics.count_queries`, which ``apps.core``
+    installs on every database connection as it is opened.
+    Requests slower than ``SUITUNE_SLOW_REQUEST_MS`` are logged with their
+    phase breakdown. Works in both sync and async middleware chains.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SUITUNE_METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow = getattr(settings, "SUITUNE_SLOW_REQUEST_MS", None)
+        self.server_timing = getattr(settings, "SUITUNE_SERVER_TIMING", settings.DEBUG)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings, token = metrics.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            total = self._finish(request, timings, token)
+        return self._annotate(request, response, timings, total)
+
+    async def __acall__(self, request):
+        timings, token = metrics.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            total = self._finish(request, timings, token)
+        return self._annotate(request, response, timings, total)
+
+    @staticmethod
+    def _finish(request, timings: metrics.RequestTimings, token) -> float:
+        match = getattr(request, "resolver_match", None)
+        endpoint = match.route if match is not None else "unmatched"
+        return metrics.finish(timings, token, endpoint)
+
+    def _annotate(self, request, response, timings, total):
+        header = timings.server_timing(total)
+        if self.server_timing:
+            response["Server-Timing"] = header
+        if self.slow is not None and total * 1000 >= self.slow:
+            logger.warning(
+                "Slow request %s %s (%.0f ms): %s",
+                request.method,
+                request.path,
+                total * 1000,
+                header,
+            )
+        return response
@@ -1 +1,10 @@
 """Data models for core."""
+
+from django.db import models
+
+
+class CatalogVersion(models.Model):
+    """The one row holding the current catalog version (``apps.core.catalog``)."""
+
+    token = models.CharField(max_length=32)
+    changed_at = models.FloatField(help_text="Unix time of the change.")
@@ -0,0 +1,109 @@
+"""Keyset (seek) pagination for the REST API."""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginate on a unique ordering such as ``("-started_at", "-id")``.
+
+    The cursor holds the ordering values of the last row served and the next
+    page is ``WHERE (started_at, id) < (...)`` on a matching index, so every
+    page costs the same however deep it is. Views set ``keyset_ordering``; all
+    fields must sort in the same direction and the last one must be unique.
+    Only forward (``next``) links are offered.
+    """
+
+    ordering: Sequence[str] = ("id",)
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None) -> List:
+        ordering = tuple(getattr(view, "keyset_ordering", self.ordering))
+        fields = [name.lstrip("-") for name in ordering]
+        descending = ordering[0].startswith("-")
+        size = self.get_page_size(request)
+        cursor = self.decode_cursor(request, queryset.model, fields)
+        if cursor is not None:
+            queryset = queryset.filter(self.seek(fields, cursor, descending))
+        rows = list(queryset.order_by(*ordering)[: size + 1])
+        self.request = request
+        self.next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            self.next_cursor = self.encode_cursor(
+                [getattr(rows[-1], name) for name in fields]
+            )
+        return rows
+
+    @staticmethod
+    def seek(fields: Sequence[str], values: Sequence, descending: bool) -> Q:
+        """Build ``(f1, f2, ...) > (v1, v2, ...)`` (``<`` when descending)."""
+        op = "lt" if descending else "gt"
+        condition = Q()
+        for i, name in enumerate(fields):
+            equal = {fields[j]: values[j] for j in range(i)}
+            condition |= Q(**equal, **{f"{name}__{op}": values[i]})
+        return condition
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    @staticmethod
+    def encode_cursor(values: Sequence) -> str:
+        plain = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+        raw = json.dumps(plain, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, request, model, fields) -> Optional[List]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(fields, values)
+            ]
+        except (binascii.Error, ValueError, ValidationError):
+            raise NotFound("Invalid cursor.")
+
+    def get_paginated_response(self, data) -> Response:
+        next_url = None
+        if self.next_cursor is not None:
+            next_url = replace_query_param(
+                self.request.build_absolute_uri(),
+                self.cursor_query_param,
+                self.next_cursor,
+            )
+        return Response({"next": next_url, "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
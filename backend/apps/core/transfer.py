@@ -0,0 +1,347 @@
+"""Streaming NDJSON export and import of the library and listening history.
+
+An export is one JSON object per line: a header, then every row of
+:data:`MODELS` in that order (referenced rows first), each model in id
+order::
+
+    {"format": "suitune", "version": 1, "models": ["radio.channel", ...]}
+    {"model": "library.track", "id": 1, "title": "...", "duplicate_of_id": null}
+    {"model": "playback.playback", "id": 1, "track_id": 1, "user": "alice", ...}
+
+Rows are read with ``QuerySet.iterator()`` (server-side cursors where the
+database has them), so memory stays constant however long the history is.
+Users are not exported; rows refer to them by username.
+
+:class:`Importer` streams such a file back with batched ``bulk_create``.
+Ids are remapped by adding a per-model offset, the largest id the model
+had when the import started: importing into an empty database keeps every
+id, and merging into a populated one needs no id map in memory. Foreign
+keys get the offset of the model they point to. Tracks of a file the
+database already has (same ``path``) are not imported; rows referring to
+them refer to the existing track instead. Rows carry their ids, so
+inserting a batch again is a no-op (``ignore_conflicts``). After every
+batch, the checkpoint file records how many lines are done, and an
+interrupted import resumes from there.
+
+Counters maintained by ``apps.playback.stats`` are exported with the
+tracks; the hourly rollups are not and are rebuilt with ``rebuild_stats``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from apps.library.signals import library_changed
+
+FORMAT = "suitune"
+VERSION = 1
+# Referenced models come first.
+MODELS = [
+    "radio.channel",
+    "radio.ratingweight",
+    "library.track",
+    "playback.playback",
+    "playback.feedback",
+]
+CHUNK_SIZE = 2000
+# Lines joined into one chunk of a streamed response.
+LINES_PER_CHUNK = 500
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """Compact JSON keeping microseconds, which ``DjangoJSONEncoder`` drops."""
+
+    item_separator, key_separator = ",", ":"
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _model(label: str):
+    return apps.get_model(label)
+
+
+def _columns(model) -> Tuple[List[str], Optional[str]]:
+    """Return the exported columns of ``model`` and its user column, if any."""
+    columns, user = [], None
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        if field.is_relation and field.related_model is get_user_model():
+            user = field.name
+        else:
+            columns.append(field.attname)
+    return columns, user
+
+
+def export_lines(labels: Optional[Iterable[str]] = None) -> Iterator[str]:
+    """Yield the NDJSON lines (with newlines) of an export of ``labels``."""
+    labels = [label for label in MODELS if labels is None or label in set(labels)]
+    encoder = ExportEncoder()
+    header = {
+        "format": FORMAT,
+        "version": VERSION,
+        "exported_at": timezone.now(),
+        "models": labels,
+    }
+    yield encoder.encode(header) + "\n"
+    for label in labels:
+        model = _model(label)
+        columns, user = _columns(model)
+        names = ["id", *columns] + (["user"] if user else [])
+        fields = ["id", *columns] + ([f"{user}__username"] if user else [])
+        rows = (
+            model.objects.order_by("id")
+            .values_list(*fields)
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        for row in rows:
+            record = {"model": label, **dict(zip(names, row))}
+            yield encoder.encode(record) + "\n"
+
+
+def export_chunks(labels: Optional[Iterable[str]] = None) -> Iterator[bytes]:
+    """:func:`export_lines` joined into chunks, for streaming responses."""
+    lines = export_lines(labels)
+    while chunk := "".join(islice(lines, LINES_PER_CHUNK)):
+        yield chunk.encode()
+
+
+async def aexport_chunks(labels: Optional[Iterable[str]] = None):
+    """:func:`export_chunks` for ASGI; the queries run on the sync thread."""
+    chunks = export_chunks(labels)
+    while chunk := await sync_to_async(next)(chunks, b""):
+        yield chunk
+
+
+@contextmanager
+def _given_timestamps(model):
+    """Let ``bulk_create`` keep the imported ``auto_now(_add)`` values."""
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer:
+    """Stream an export into the database; see the module docstring.
+
+    ``checkpoint`` is the path of a JSON file recording progress; if it
+    exists, the import continues where it stopped.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = CHUNK_SIZE,
+        checkpoint: Optional[str] = None,
+        progress: Optional[Callable[[str, int], None]] = None,
+    ) -> None:
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self.line = 0
+        self.offsets: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {}
+        # Exported ids of tracks whose file the database already has, and
+        # the ids of those rows.
+        self.aliases: Dict[int, int] = {}
+        # ``(track id, exported id)`` of copies of tracks later in the file.
+        self.links: List[Tuple[int, int]] = []
+        self._users: Dict[str, Optional[int]] = {}
+
+    def run(self, lines: Iterable) -> Dict[str, int]:
+        """Import ``lines`` (str or bytes) and return rows read per model."""
+        lines = iter(lines)
+        header = json.loads(next(lines, "null") or "null")
+        if not isinstance(header, dict) or header.get("format") != FORMAT:
+            raise ValueError("Not a suitune export")
+        if header.get("version") != VERSION:
+            raise ValueError(f"Unsupported export version {header.get('version')}")
+        labels = [label for label in header["models"] if label in MODELS]
+        if not self._resume():
+            self.offsets = {
+                label: _model(label).objects.aggregate(top=models.Max("id"))["top"] or 0
+                for label in labels
+            }
+            self._save()
+        for _ in islice(lines, self.line):
+            pass
+
+        batch: List[dict] = []
+        for line in lines:
+            record = json.loads(line)
+            if batch and (
+                record["model"] != batch[0]["model"] or len(batch) >= self.batch_size
+            ):
+                self._write(batch)
+                batch = []
+            batch.append(record)
+        if batch:
+            self._write(batch)
+        self._link()
+        self._reset_sequences(labels)
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        if self.counts:
+            # bulk_create sends no post_save: refresh the catalog, the radio
+            # index and search.
+            library_changed.send(sender=None)
+        return self.counts
+
+    def _write(self, batch: List[dict]) -> None:
+        label = batch[0]["model"]
+        if label not in self.offsets:
+            raise ValueError(f"Unexpected model {label!r}")
+        if label != "library.track":
+            self._link()  # every track is in by now
+        model = _model(label)
+        _, user = _columns(model)
+        if user:
+            self._load_users(record["user"] for record in batch)
+        if label == "library.track":
+            self._alias(batch)
+        User = get_user_model()
+        relations = [
+            field
+            for field in model._meta.concrete_fields
+            if field.is_relation and field.related_model is not User
+        ]
+        timestamps = [
+            field.attname
+            for field in model._meta.concrete_fields
+            if isinstance(field, models.DateTimeField)
+        ]
+        objects = []
+        for record in batch:
+            if label == "library.track" and record["id"] in self.aliases:
+                continue
+            record = dict(record)
+            del record["model"]
+            old_id = record["id"]
+            record["id"] = self._new_id(label, old_id)
+            if user:
+                record[f"{user}_id"] = self._users.get(record.pop("user"))
+            for field in relations:
+                self._remap(record, field, label, old_id)
+            for name in timestamps:
+                if record[name]:
+                    # Much cheaper than leaving it to the field.
+                    record[name] = datetime.fromisoformat(record[name])
+            objects.append(model(**record))
+        with transaction.atomic(), _given_timestamps(model):
+            model.objects.bulk_create(objects, ignore_conflicts=True)
+        self.line += len(batch)
+        self.counts[label] = self.counts.get(label, 0) + len(batch)
+        self._save()
+        if self.progress:
+            self.progress(label, self.counts[label])
+
+    def _new_id(self, label: str, old_id: int) -> int:
+        if label == "library.track" and old_id in self.aliases:
+            return self.aliases[old_id]
+        # Rows of models not in the export keep their ids.
+        return old_id + self.offsets.get(label, 0)
+
+    def _remap(self, record: dict, field, label: str, old_id: int) -> None:
+        value = record.get(field.attname)
+        if value is None:
+            return
+        target = field.related_model._meta.label_lower
+        if target == label and value > old_id:
+            # Points further down the file: set once the row exists.
+            self.links.append((record["id"], value))
+            record[field.attname] = None
+        else:
+            record[field.attname] = self._new_id(target, value)
+
+    def _alias(self, batch: List[dict]) -> None:
+        """Map tracks of files the database already has to the existing rows."""
+        paths = {record["path"]: record["id"] for record in batch if record["path"]}
+        existing = _model("library.track").objects.filter(path__in=list(paths))
+        for path, track_id in existing.values_list("path", "id"):
+            # After a resume, the rows may be this import's own.
+            if track_id != paths[path] + self.offsets["library.track"]:
+                self.aliases[paths[path]] = track_id
+
+    def _link(self) -> None:
+        if not self.links:
+            return
+        Track = _model("library.track")
+        with transaction.atomic():
+            for track_id, original_id in self.links:
+                Track.objects.filter(id=track_id).update(
+                    duplicate_of_id=self._new_id("library.track", original_id)
+                )
+        self.links = []
+        self._save()
+
+    def _load_users(self, usernames: Iterable[Optional[str]]) -> None:
+        wanted = {name for name in usernames if name} - set(self._users)
+        if not wanted:
+            return
+        User = get_user_model()
+        found = dict(
+            User.objects.filter(username__in=wanted).values_list("username", "id")
+        )
+        for name in wanted:
+            # Unknown listeners become anonymous.
+            self._users[name] = found.get(name)
+
+    def _reset_sequences(self, labels: List[str]) -> None:
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [_model(label) for label in labels]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def _resume(self) -> bool:
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return False
+        with open(self.checkpoint) as fh:
+            state = json.load(fh)
+        self.line = state["line"]
+        self.offsets = state["offsets"]
+        self.counts = state["counts"]
+        self.aliases = {int(old): new for old, new in state["aliases"].items()}
+        self.links = [tuple(link) for link in state["links"]]
+        return True
+
+    def _save(self) -> None:
+        if not self.checkpoint:
+            return
+        state = {
+            "line": self.line,
+            "offsets": self.offsets,
+            "counts": self.counts,
+            "aliases": self.aliases,
+            "links": self.links,
+        }
+        tmp = f"{self.checkpoint}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(state, fh)
+        os.replace(tmp, self.checkpoint)
@@ -0,0 +1,205 @@
+"""Cover art extraction into a content-addressed thumbnail cache.
+
+Artwork comes from the file's embedded picture or, failing that, a cover
+image next to it (``cover.jpg``, ``folder.png``, ...). The image bytes are
+hashed and every configured size is rendered once per hash to
+``SUITUNE_ARTWORK_ROOT/<ab>/<hash>-<size>.jpg``; tracks only store the hash.
+A cover shared by a whole album is therefore decoded and stored once, and
+its URLs never change, so they can be cached forever.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import io
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional, Set, Tuple
+
+import mutagen
+from django.conf import settings
+
+FOLDER_IMAGE_NAMES = ("cover", "folder", "front", "album", "artwork")
+FOLDER_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+DIGEST_LENGTH = 32
+DEFAULT_ARTWORK_SIZE = 256
+
+# Per process: hashes already rendered (or found on disk) and ones that
+# failed to decode, so a shared cover costs one decode per scan worker.
+_done: Set[str] = set()
+_broken: Set[str] = set()
+
+
+def artwork_root() -> Path:
+    return Path(settings.SUITUNE_ARTWORK_ROOT)
+
+
+def artwork_sizes() -> Tuple[int, ...]:
+    return tuple(sorted(settings.SUITUNE_ARTWORK_SIZES))
+
+
+def relative_path(digest: str, size: int) -> str:
+    return f"{digest[:2]}/{digest}-{size}.jpg"
+
+
+def embedded_image(path: str) -> Optional[bytes]:
+    """Return the front cover (or first picture) embedded in ``path``."""
+    try:
+        audio = mutagen.File(path)
+    except (mutagen.MutagenError, OSError):
+        return None
+    if audio is None:
+        return None
+    pictures = getattr(audio, "pictures", None)  # FLAC
+    if pictures:
+        return _pick(pictures).data
+    tags = audio.tags
+    if tags is None:
+        return None
+    if hasattr(tags, "getall"):  # ID3
+        frames = tags.getall("APIC")
+        return _pick(frames).data if frames else None
+    covers = tags.get("covr") if hasattr(tags, "get") else None  # MP4
+    if covers:
+        return bytes(covers[0])
+    blocks = tags.get("metadata_block_picture") if hasattr(tags, "get") else None
+    if blocks:  # Ogg Vorbis/Opus
+        from mutagen.flac import Picture
+
+        try:
+            return _pick([Picture(base64.b64decode(b)) for b in blocks]).data
+        except (ValueError, mutagen.MutagenError):
+            return None
+    return None
+
+
+def _pick(pictures):
+    """Prefer the front cover (picture type 3)."""
+    for picture in pictures:
+        if getattr(picture, "type", None) == 3:
+            return picture
+    return pictures[0]
+
+
+@lru_cache(maxsize=256)
+def _folder_image(directory: str, mtime_ns: int) -> Optional[str]:
+    try:
+        names = {name.lower(): name for name in os.listdir(directory)}
+    except OSError:
+        return None
+    for stem in FOLDER_IMAGE_NAMES:
+        for ext in FOLDER_IMAGE_EXTENSIONS:
+            name = names.get(stem + ext)
+            if name is not None:
+                return os.path.join(directory, name)
+    return None
+
+
+# Small on purpose: holds image bytes, and scans go album by album.
+@lru_cache(maxsize=8)
+def _file_digest(path: str, mtime_ns: int, size: int) -> Tuple[str, bytes]:
+    with open(path, "rb") as fh:
+        data = fh.read()
+    return digest_of(data), data
+
+
+def folder_image(path: str) -> Optional[Tuple[str, bytes]]:
+    """Return ``(digest, bytes)`` of the cover image next to ``path``.
+
+    Directory listings and image hashes are memoised per process, so the
+    tracks of one album read their shared cover once.
+    """
+    directory = os.path.dirname(path)
+    try:
+        image = _folder_image(directory, os.stat(directory).st_mtime_ns)
+        if image is None:
+            return None
+        st = os.stat(image)
+        return _file_digest(image, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def digest_of(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+
+
+def render(digest: str, data: bytes, sizes: Iterable[int] = ()) -> bool:
+    """Write every size of ``data`` under ``digest``; ``False`` if undecodable.
+
+    Existing files are kept, so this is a few ``stat`` calls for a known
+    cover. Files are written to a temporary name and renamed into place, so
+    concurrent workers never expose half-written images.
+    """
+    if digest in _done:
+        return True
+    if digest in _broken:
+        return False
+    root = artwork_root()
+    sizes = tuple(sizes) or artwork_sizes()
+    missing = [s for s in sizes if not (root / relative_path(digest, s)).exists()]
+    if missing:
+        from PIL import Image, UnidentifiedImageError
+
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                # Let the JPEG decoder downscale while decoding.
+                image.draft("RGB", (max(missing), max(missing)))
+                image = image.convert("RGB")
+                for size in sorted(missing, reverse=True):
+                    image.thumbnail((size, size))
+                    _save(image, root / relative_path(digest, size))
+        except (UnidentifiedImageError, OSError, ValueError):
+            _broken.add(digest)
+            return False
+    _done.add(digest)
+    return True
+
+
+def _save(image, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            image.save(fh, "JPEG", quality=85, optimize=True, progressive=True)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def extract(root: str, path: str) -> str:
+    """Find, hash and render the artwork of ``root/path``; return its digest.
+
+    Returns ``""`` when the track has no usable artwork.
+    """
+    full = os.path.join(root, path)
+    data = embedded_image(full)
+    if data:
+        digest = digest_of(data)
+    else:
+        found = folder_image(full)
+        if found is None:
+            return ""
+        digest, data = found
+    return digest if render(digest, data) else ""
+
+
+def prune(keep: Set[str]) -> int:
+    """Delete cached artwork whose digest is not in ``keep``; return count."""
+    removed = 0
+    root = artwork_root()
+    if not root.is_dir():
+        return 0
+    for shard in root.iterdir():
+        if not shard.is_dir():
+            continue
+        for image in shard.iterdir():
+            if image.name.split("-", 1)[0] not in keep:
+                image.unlink()
+                removed += 1
+    _done.intersection_update(keep)
+    return removed
@@ -0,0 +1,223 @@
+"""Acoustic fingerprints and duplicate track detection.
+
+A fingerprint is one 32-bit word per ~93 ms block of the first
+:data:`FINGERPRINT_SECONDS` of audio, counted from the first audible frame
+so leading silence does not shift it. Bit ``m`` says whether the energy
+ratio of bands ``m`` and ``m + 1`` (33 log-spaced bands, 300 Hz - 2 kHz) is
+above its median over the track: gain, encoder and bitrate hardly move it,
+and each bit is set half of the time, so unrelated tracks differ in about
+half of their bits and copies of one recording in few.
+
+:func:`find_duplicates` hashes the first :data:`LSH_BLOCKS` words of every
+fingerprint into :data:`LSH_TABLES` tables keyed by :data:`LSH_BITS` sampled
+bits (bit-sampling LSH for Hamming distance). Only tracks sharing a bucket
+are compared, so the work grows with the library rather than with its
+square, and confirmed pairs are merged into clusters with union-find.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from django.db import transaction
+
+from .models import Track, TrackFeature
+
+FINGERPRINT_SECONDS = 30.0
+BLOCK_FRAMES = 4
+BAND_EDGES_HZ = np.geomspace(300.0, 2000.0, 34)
+# Frames quieter than this RMS (about -60 dBFS) before the first audible
+# one are not fingerprinted.
+SILENCE_RMS = 1e-3
+# Bands more than 20 dB below the loudest one of their block count as silent.
+BAND_FLOOR = 1e-2
+
+LSH_BLOCKS = 96
+LSH_TABLES = 24
+LSH_BITS = 20
+LSH_SEED = 20260118
+# Buckets this full hold silence or noise, not one recording; skip them.
+MAX_BUCKET = 64
+# Blocks either fingerprint may be shifted by when comparing.
+MAX_SHIFT = 3
+# Share of differing bits below which two tracks are the same recording.
+DUPLICATE_BER = 0.2
+
+
+class Fingerprinter:
+    """Build a fingerprint from power spectra fed frame by frame.
+
+    ``freqs`` are the centre frequencies in Hz of the spectrum bins.
+    """
+
+    def __init__(self, freqs: np.ndarray, hop_seconds: float) -> None:
+        edges = np.searchsorted(freqs, BAND_EDGES_HZ)
+        self.bands = np.zeros((len(freqs), len(edges) - 1), dtype=np.float32)
+        for band, (low, high) in enumerate(zip(edges[:-1], edges[1:])):
+            self.bands[low : max(high, low + 1), band] = 1.0
+        self.max_blocks = int(FINGERPRINT_SECONDS / hop_seconds / BLOCK_FRAMES)
+        self.started = False
+        self.pending = np.zeros((0, self.bands.shape[1]))
+        self.ratios: List[np.ndarray] = []
+        self.blocks = 0
+
+    def add(self, power: np.ndarray, rms: np.ndarray) -> None:
+        """Add frames given their power spectra and RMS levels."""
+        if self.blocks >= self.max_blocks:
+            return
+        if not self.started:
+            audible = np.flatnonzero(rms >= SILENCE_RMS)
+            if not len(audible):
+                return
+            self.started = True
+            power = power[audible[0] :]
+        energy = np.vstack([self.pending, power @ self.bands])
+        count = min(len(energy) // BLOCK_FRAMES, self.max_blocks - self.blocks)
+        self.pending = energy[count * BLOCK_FRAMES :]
+        if count:
+            blocks = energy[: count * BLOCK_FRAMES].reshape(count, BLOCK_FRAMES, -1)
+            energy = blocks.mean(axis=1)
+            # Quiet bands sit on a floor instead of measuring the noise.
+            floor = BAND_FLOOR * energy.max(axis=1, keepdims=True) + 1e-10
+            level = np.log(np.maximum(energy, floor))
+            self.ratios.append(level[:, :-1] - level[:, 1:])
+            self.blocks += count
+
+    def result(self) -> np.ndarray:
+        """Return the fingerprint as uint32 words (empty for silence)."""
+        if not self.ratios:
+            return np.zeros(0, dtype=np.uint32)
+        ratios = np.concatenate(self.ratios)
+        bits = ratios > np.median(ratios, axis=0)
+        weights = np.left_shift(np.uint64(1), np.arange(32, dtype=np.uint64))
+        return (bits.astype(np.uint64) @ weights).astype(np.uint32)
+
+
+def fingerprint_words(data: bytes) -> np.ndarray:
+    """Return a stored fingerprint as uint32 words."""
+    return np.frombuffer(bytes(data), dtype="<u4")
+
+
+def _popcount(words: np.ndarray) -> int:
+    return int(np.unpackbits(words.view(np.uint8)).sum())
+
+
+def bit_error_rate(a: np.ndarray, b: np.ndarray, max_shift: int = MAX_SHIFT) -> float:
+    """Return the lowest share of differing bits over shifts up to ``max_shift``."""
+    best = 1.0
+    for shift in range(-max_shift, max_shift + 1):
+        x, y = (a[shift:], b) if shift >= 0 else (a, b[-shift:])
+        size = min(len(x), len(y))
+        if size < LSH_BLOCKS // 2:
+            continue
+        best = min(best, _popcount(x[:size] ^ y[:size]) / (32 * size))
+    return best
+
+
+def candidate_pairs(
+    words: np.ndarray,
+    tables: int = LSH_TABLES,
+    bits: int = LSH_BITS,
+    seed: int = LSH_SEED,
+) -> Set[Tuple[int, int]]:
+    """Return row pairs of ``words`` (n x blocks, uint32) sharing an LSH bucket."""
+    rng = np.random.default_rng(seed)
+    total = words.shape[1] * 32
+    pairs: Set[Tuple[int, int]] = set()
+    for _ in range(tables):
+        sampled = rng.choice(total, size=bits, replace=False)
+        columns = words[:, sampled // 32] >> (sampled % 32).astype(np.uint32)
+        keys = (columns & 1).astype(np.uint64) @ (
+            np.uint64(1) << np.arange(bits, dtype=np.uint64)
+        )
+        order = np.argsort(keys, kind="stable")
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        for bucket in np.split(order, bounds):
+            if 1 < len(bucket) <= MAX_BUCKET:
+                members = np.sort(bucket).tolist()
+                pairs.update(
+                    (a, b) for i, a in enumerate(members) for b in members[i + 1 :]
+                )
+    return pairs
+
+
+class _UnionFind:
+    def __init__(self) -> None:
+        self.parent: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        root = self.parent.setdefault(item, item)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+    def groups(self) -> List[List[int]]:
+        groups: Dict[int, List[int]] = defaultdict(list)
+        for item in self.parent:
+            groups[self.find(item)].append(item)
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def find_duplicates(
+    threshold: float = DUPLICATE_BER, fingerprints: Optional[Iterable] = None
+) -> List[List[int]]:
+    """Return clusters of track ids that are copies of the same recording.
+
+    ``fingerprints`` are ``(track_id, bytes)`` pairs; by default every
+    stored fingerprint of the current feature version.
+    """
+    if fingerprints is None:
+        from .features import FEATURE_VERSION
+
+        fingerprints = (
+            TrackFeature.objects.filter(version=FEATURE_VERSION, error="")
+            .exclude(fingerprint=b"")
+            .values_list("track_id", "fingerprint")
+            .iterator(chunk_size=2000)
+        )
+    ids: List[int] = []
+    words: List[np.ndarray] = []
+    for track_id, data in fingerprints:
+        fingerprint = fingerprint_words(data)
+        if len(fingerprint) >= LSH_BLOCKS:
+            ids.append(track_id)
+            words.append(fingerprint)
+    if len(ids) < 2:
+        return []
+    heads = np.stack([fingerprint[:LSH_BLOCKS] for fingerprint in words])
+    clusters = _UnionFind()
+    for a, b in candidate_pairs(heads):
+        if bit_error_rate(words[a], words[b]) < threshold:
+            clusters.union(ids[a], ids[b])
+    return sorted(clusters.groups())
+
+
+def store_duplicates(clusters: List[List[int]]) -> int:
+    """Point every cluster member at its best copy; return tracks marked.
+
+    The best copy has the highest bitrate, then the lowest id, and is the
+    only member the radio plays (see ``apps.radio.index.TrackIndex``).
+    """
+    bitrates = dict(Track.objects.values_list("pk", "bitrate").iterator())
+    tracks = []
+    for cluster in clusters:
+        cluster = [track_id for track_id in cluster if track_id in bitrates]
+        if len(cluster) < 2:
+            continue
+        best = min(cluster, key=lambda pk: (-(bitrates[pk] or 0), pk))
+        tracks.extend(
+            Track(pk=pk, duplicate_of_id=None if pk == best else best) for pk in cluster
+        )
+    with transaction.atomic():
+        Track.objects.filter(duplicate_of__isnull=False).update(duplicate_of=None)
+        Track.objects.bulk_update(tracks, ["duplicate_of"], batch_size=500)
+    return sum(track.duplicate_of_id is not None for track in tracks)
@@ -0,0 +1,408 @@
+"""Streaming audio feature extraction (README §6 ``sui_feature``).
+
+Audio is decoded to mono float32 PCM at :data:`SAMPLE_RATE` in chunks of
+``chunk_frames`` samples (``ffmpeg`` for everything, the ``wave`` module
+for plain WAV files already at that rate) and fed through a
+:class:`FeatureAccumulator`, which keeps running sums and a bounded onset
+envelope. Memory use is therefore flat whatever the length of the track.
+
+Each track gets a float32 vector laid out as :data:`FEATURE_NAMES` and an
+acoustic fingerprint (:mod:`apps.library.duplicates`) from the same pass,
+stored with :data:`FEATURE_VERSION`; bump the version whenever either
+changes and ``manage.py analyze_library`` reprocesses every track.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .duplicates import Fingerprinter
+from .models import Track, TrackFeature
+
+FEATURE_VERSION = 2
+SAMPLE_RATE = 22050
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+CHUNK_FRAMES = 65536
+
+PITCH_CLASSES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+FEATURE_NAMES = (
+    "bpm",
+    "energy",
+    "energy_std",
+    "centroid",
+    "rolloff",
+    "flux",
+    "zcr",
+) + tuple(f"chroma_{pc}" for pc in PITCH_CLASSES)
+
+# Tempo is estimated from the onset envelope of the first two minutes;
+# this bounds the only per-frame state the accumulator keeps.
+TEMPO_SECONDS = 120.0
+MIN_BPM, MAX_BPM = 60.0, 200.0
+ROLLOFF = 0.85
+
+# Sample width -> (dtype, zero offset, full scale) of PCM WAV files.
+WAV_SAMPLE_TYPES = {1: ("u1", 128, 128), 2: ("<i2", 0, 32768), 4: ("<i4", 0, 2**31)}
+
+
+class FeatureError(Exception):
+    """A file could not be decoded."""
+
+
+def decode(
+    path: str,
+    sample_rate: int = SAMPLE_RATE,
+    chunk_frames: int = CHUNK_FRAMES,
+    max_seconds: Optional[float] = None,
+) -> Iterator[np.ndarray]:
+    """Yield mono float32 PCM of ``path`` in chunks of ``chunk_frames``."""
+    if path.lower().endswith(".wav"):
+        try:
+            wav = wave.open(path, "rb")
+        except (wave.Error, EOFError):
+            wav = None  # e.g. float or extensible WAV: let ffmpeg try
+        if wav is not None:
+            with wav:
+                if (
+                    wav.getframerate() == sample_rate
+                    and wav.getsampwidth() in WAV_SAMPLE_TYPES
+                ):
+                    yield from _decode_wav(wav, chunk_frames, max_seconds)
+                    return
+    yield from _decode_ffmpeg(path, sample_rate, chunk_frames, max_seconds)
+
+
+def _decode_wav(wav, chunk_frames: int, max_seconds: Optional[float]):
+    width, channels = wav.getsampwidth(), wav.getnchannels()
+    dtype, offset, scale = WAV_SAMPLE_TYPES[width]
+    remaining = int(max_seconds * wav.getframerate()) if max_seconds else None
+    while remaining is None or remaining > 0:
+        want = chunk_frames if remaining is None else min(chunk_frames, remaining)
+        data = wav.readframes(want)
+        if not data:
+            break
+        pcm = np.frombuffer(data, dtype=dtype).astype(np.float32)
+        pcm = (pcm - offset) / scale
+        if channels > 1:
+            pcm = pcm.reshape(-1, channels).mean(axis=1)
+        if remaining is not None:
+            remaining -= len(pcm)
+        yield pcm
+
+
+def _decode_ffmpeg(
+    path: str, sample_rate: int, chunk_frames: int, max_seconds: Optional[float]
+):
+    command = [settings.SUITUNE_FFMPEG, "-nostdin", "-v", "error", "-i", path]
+    if max_seconds:
+        command += ["-t", str(max_seconds)]
+    command += [
+        "-map",
+        "0:a:0",
+        "-ac",
+        "1",
+        "-ar",
+        str(sample_rate),
+        "-f",
+        "f32le",
+        "-",
+    ]
+    try:
+        proc = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+    except OSError as exc:
+        raise FeatureError(f"cannot run ffmpeg: {exc}") from exc
+    try:
+        while True:
+            data = proc.stdout.read(chunk_frames * 4)
+            if not data:
+                break
+            usable = len(data) - len(data) % 4
+            yield np.frombuffer(data[:usable], dtype="<f4")
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+        returncode = proc.wait()
+    if returncode:
+        raise FeatureError(f"ffmpeg exited with status {returncode}")
+
+
+class FeatureAccumulator:
+    """Compute :data:`FEATURE_NAMES` from PCM fed chunk by chunk."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE) -> None:
+        self.sample_rate = sample_rate
+        self.window = np.hanning(FRAME_SIZE).astype(np.float32)
+        freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / sample_rate)
+        self.freqs = freqs / (sample_rate / 2)
+        # Map 55 Hz - 5 kHz bins to pitch classes (A4 = 440 Hz is class 9).
+        audible = (freqs >= 55) & (freqs <= 5000)
+        midi = 69 + 12 * np.log2(np.where(audible, freqs, 440.0) / 440.0)
+        self.chroma_map = np.zeros((len(freqs), 12), dtype=np.float32)
+        self.chroma_map[audible, np.round(midi[audible]).astype(int) % 12] = 1.0
+        self.tail = np.zeros(0, dtype=np.float32)
+        self.previous: Optional[np.ndarray] = None
+        self.envelope: List[np.ndarray] = []
+        self.envelope_frames = 0
+        self.max_envelope = int(TEMPO_SECONDS * sample_rate / HOP_SIZE)
+        self.frames = 0
+        self.sums = np.zeros(6)  # rms, rms², centroid, rolloff, flux, zcr
+        self.chroma = np.zeros(12)
+        self.fingerprinter = Fingerprinter(freqs, HOP_SIZE / sample_rate)
+
+    def update(self, pcm: np.ndarray) -> None:
+        buffer = np.concatenate([self.tail, pcm]) if len(self.tail) else pcm
+        count = (len(buffer) - FRAME_SIZE) // HOP_SIZE + 1
+        if count <= 0:
+            self.tail = buffer
+            return
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, FRAME_SIZE)[
+            : count * HOP_SIZE : HOP_SIZE
+        ]
+        self.tail = buffer[count * HOP_SIZE :].copy()
+        self._frames(frames)
+
+    def _frames(self, frames: np.ndarray) -> None:
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+        zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+        magnitude = np.abs(np.fft.rfft(frames * self.window, axis=1))
+        total = magnitude.sum(axis=1)
+        safe = np.maximum(total, 1e-12)
+        centroid = (magnitude @ self.freqs) / safe
+        cumulative = np.cumsum(magnitude, axis=1)
+        rolloff = self.freqs[
+            np.minimum(
+                (cumulative < (ROLLOFF * total)[:, None]).sum(axis=1),
+                len(self.freqs) - 1,
+            )
+        ]
+        log_mag = np.log1p(magnitude)
+        previous = np.vstack(
+            [log_mag[:1] if self.previous is None else self.previous, log_mag[:-1]]
+        )
+        flux = np.maximum(log_mag - previous, 0.0).mean(axis=1)
+        self.previous = log_mag[-1]
+        power = np.square(magnitude)
+        self.fingerprinter.add(power, rms)
+        chroma = power @ self.chroma_map
+        chroma /= np.maximum(chroma.max(axis=1, keepdims=True), 1e-12)
+        chroma[total < 1e-6] = 0.0
+
+        self.frames += len(frames)
+        self.sums += [
+            rms.sum(),
+            np.square(rms).sum(),
+            centroid.sum(),
+            rolloff.sum(),
+            flux.sum(),
+            zcr.sum(),
+        ]
+        self.chroma += chroma.sum(axis=0)
+        room = self.max_envelope - self.envelope_frames
+        if room > 0:
+            self.envelope.append(flux[:room])
+            self.envelope_frames += min(room, len(flux))
+
+    def tempo(self) -> float:
+        """Estimate beats per minute from the onset envelope (``nan`` if unsure)."""
+        fps = self.sample_rate / HOP_SIZE
+        if self.envelope_frames < 4 * fps:
+            return float("nan")
+        onset = np.concatenate(self.envelope)
+        onset = onset - onset.mean()
+        size = 1 << int(2 * len(onset) - 1).bit_length()
+        spectrum = np.fft.rfft(onset, size)
+        corr = np.fft.irfft(spectrum * np.conj(spectrum), size)[: len(onset)]
+        if corr[0] <= 0:
+            return float("nan")
+        low = int(np.floor(60 * fps / MAX_BPM))
+        high = int(np.ceil(60 * fps / MIN_BPM))
+        lags = np.arange(low, high + 1)
+        # Mild preference for moderate tempi against octave errors.
+        prior = np.exp(-0.5 * np.square(np.log2(60 * fps / lags / 120.0)))
+        best = int(lags[np.argmax(corr[lags] * prior)])
+        if 0 < best < len(corr) - 1:
+            a, b, c = corr[best - 1], corr[best], corr[best + 1]
+            denominator = a - 2 * b + c
+            shift = 0.5 * (a - c) / denominator if denominator else 0.0
+        else:
+            shift = 0.0
+        return float(60 * fps / (best + shift))
+
+    def result(self) -> np.ndarray:
+        """Return the feature vector as float32, see :data:`FEATURE_NAMES`."""
+        if not self.frames:
+            raise FeatureError("no audio")
+        rms, rms_sq, centroid, rolloff, flux, zcr = self.sums / self.frames
+        chroma = self.chroma / self.frames
+        return np.array(
+            [
+                self.tempo(),
+                rms,
+                np.sqrt(max(rms_sq - rms * rms, 0.0)),
+                centroid,
+                rolloff,
+                flux,
+                zcr,
+                *chroma,
+            ],
+            dtype=np.float32,
+        )
+
+
+def accumulate(path: str, chunk_frames: int = CHUNK_FRAMES) -> FeatureAccumulator:
+    """Decode ``path`` chunk by chunk into a :class:`FeatureAccumulator`."""
+    accumulator = FeatureAccumulator()
+    max_seconds = getattr(settings, "SUITUNE_FEATURE_MAX_SECONDS", None)
+    for pcm in decode(path, chunk_frames=chunk_frames, max_seconds=max_seconds):
+        accumulator.update(pcm)
+    return accumulator
+
+
+def analyse(path: str, chunk_frames: int = CHUNK_FRAMES) -> np.ndarray:
+    """Decode ``path`` chunk by chunk and return its feature vector."""
+    return accumulate(path, chunk_frames).result()
+
+
+class Analysed(NamedTuple):
+    track_id: int
+    file_mtime_ns: Optional[int]
+    vector: Optional[bytes]
+    error: str
+    fingerprint: bytes = b""
+
+
+def _analyse_file(args: Tuple[int, Optional[int], str]) -> Analysed:
+    track_id, mtime_ns, path = args
+    try:
+        accumulator = accumulate(path)
+        vector = accumulator.result()
+    except (FeatureError, OSError, ValueError) as exc:
+        return Analysed(track_id, mtime_ns, None, str(exc)[:255] or type(exc).__name__)
+    return Analysed(
+        track_id,
+        mtime_ns,
+        vector.astype("<f4").tobytes(),
+        "",
+        accumulator.fingerprinter.result().astype("<u4").tobytes(),
+    )
+
+
+def feature_vector(feature: TrackFeature) -> np.ndarray:
+    """Return the stored vector of ``feature`` as a float32 array."""
+    return np.frombuffer(bytes(feature.vector), dtype="<f4")
+
+
+def stale_tracks(force: bool = False, retry_failed: bool = False):
+    """Local tracks without up-to-date features."""
+    tracks = Track.objects.exclude(path="")
+    if force:
+        return tracks
+    tracks = tracks.exclude(
+        feature__version=FEATURE_VERSION, feature__file_mtime_ns=F("file_mtime_ns")
+    )
+    if retry_failed:
+        tracks = tracks | Track.objects.exclude(path="").filter(~Q(feature__error=""))
+    return tracks
+
+
+class FeatureExtractor:
+    """Analyse stale tracks in a process pool and store their features."""
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        workers: Optional[int] = None,
+        batch_size: int = 200,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> None:
+        self.root = str(root or settings.SUITUNE_MEDIA_ROOT)
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.progress = progress
+
+    def run(self, tracks) -> Tuple[int, int]:
+        """Analyse ``tracks``; return ``(analysed, failed)``."""
+        todo = list(tracks.order_by("path").values_list("id", "file_mtime_ns", "path"))
+        args = [(pk, mtime, os.path.join(self.root, path)) for pk, mtime, path in todo]
+        if self.workers > 1 and len(args) > 1:
+            pool = ProcessPoolExecutor(max_workers=self.workers)
+            results: Iterable[Analysed] = pool.map(_analyse_file, args, chunksize=4)
+        else:
+            pool = None
+            results = map(_analyse_file, args)
+        analysed = failed = 0
+        try:
+            batch: List[Analysed] = []
+            for result in results:
+                batch.append(result)
+                failed += bool(result.error)
+                analysed += not result.error
+                if len(batch) >= self.batch_size:
+                    self._store(batch)
+                    batch = []
+                    if self.progress:
+                        self.progress(analysed + failed, len(args))
+            if batch:
+                self._store(batch)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        return analysed, failed
+
+    def _store(self, batch: List[Analysed]) -> None:
+        # Tracks deleted by a rescan while they were being analysed.
+        known = set(
+            Track.objects.filter(id__in=[r.track_id for r in batch]).values_list(
+                "id", flat=True
+            )
+        )
+        now = timezone.now()
+        rows = []
+        for result in batch:
+            if result.track_id not in known:
+                continue
+            vector = (
+                np.frombuffer(result.vector, dtype="<f4") if result.vector else None
+            )
+            bpm = float(vector[0]) if vector is not None else None
+            rows.append(
+                TrackFeature(
+                    track_id=result.track_id,
+                    version=FEATURE_VERSION,
+                    file_mtime_ns=result.file_mtime_ns,
+                    bpm=None if bpm is None or np.isnan(bpm) else round(bpm, 2),
+                    energy=float(vector[1]) if vector is not None else None,
+                    vector=result.vector or b"",
+                    fingerprint=result.fingerprint,
+                    error=result.error,
+                    analysed_at=now,
+                )
+            )
+        TrackFeature.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["track"],
+            update_fields=[
+                "version",
+                "file_mtime_ns",
+                "bpm",
+                "energy",
+                "vector",
+                "fingerprint",
+                "error",
+                "analysed_at",
+            ],
+        )
@@ -0,0 +1,72 @@
+"""Extract audio features of tracks whose features are missing or stale."""
+
+from django.core.management.base import BaseCommand
+
+from apps.library.duplicates import find_duplicates, store_duplicates
+from apps.library.features import FEATURE_VERSION, FeatureExtractor, stale_tracks
+from apps.library.models import TrackFeature
+from apps.library.signals import library_changed
+
+
+class Command(BaseCommand):
+    help = (
+        "Decode tracks and store their audio features (bpm, energy, chroma, ...). "
+        "Only tracks without features of the current version, or whose file "
+        "changed, are analysed; duplicate clusters are then found again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--root", help="Media directory (default: SUITUNE_MEDIA_ROOT)."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Decoder processes (default: all cores).",
+        )
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--limit", type=int, help="Analyse at most this many.")
+        parser.add_argument(
+            "--force", action="store_true", help="Analyse every track again."
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Also retry tracks that failed to decode last time.",
+        )
+
+    def handle(self, *args, **options):
+        tracks = stale_tracks(
+            force=options["force"], retry_failed=options["retry_failed"]
+        )
+        if options["limit"]:
+            tracks = tracks.filter(
+                pk__in=list(
+                    tracks.order_by("path").values_list("pk", flat=True)[
+                        : options["limit"]
+                    ]
+                )
+            )
+        extractor = FeatureExtractor(
+            root=options["root"],
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            progress=lambda done, total: self.stdout.write(f"{done}/{total}"),
+        )
+        analysed, failed = extractor.run(tracks)
+        if analysed:
+            clusters = find_duplicates()
+            marked = store_duplicates(clusters)
+            self.stdout.write(
+                f"Found {len(clusters)} duplicate clusters ({marked} extra copies)."
+            )
+            library_changed.send(
+                sender=TrackFeature, created=0, updated=analysed, deleted=0
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Analysed {analysed} tracks ({failed} failed), "
+                f"feature version {FEATURE_VERSION}."
+            )
+        )
@@ -0,0 +1,44 @@
+"""Cluster tracks that are copies of the same recording."""
+
+from django.core.management.base import BaseCommand
+
+from apps.library.duplicates import DUPLICATE_BER, find_duplicates, store_duplicates
+from apps.library.models import Track
+from apps.library.signals import library_changed
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the acoustic fingerprints stored by analyze_library and mark "
+        "every copy of a recording but the best one as its duplicate, so the "
+        "radio plays only one of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=DUPLICATE_BER,
+            help="Largest share of differing fingerprint bits between copies.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="List clusters, change nothing."
+        )
+
+    def handle(self, *args, **options):
+        clusters = find_duplicates(options["threshold"])
+        if options["dry_run"]:
+            for cluster in clusters:
+                self.stdout.write(" ".join(map(str, cluster)))
+            marked = sum(len(cluster) - 1 for cluster in clusters)
+        else:
+            marked = store_duplicates(clusters)
+            # Search text is unchanged, so no track_ids to re-index.
+            library_changed.send(
+                sender=Track, created=0, updated=marked, deleted=0, track_ids=()
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Found {len(clusters)} duplicate clusters ({marked} extra copies)."
+            )
+        )
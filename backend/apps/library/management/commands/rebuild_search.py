@@ -0,0 +1,19 @@
+"""Re-index every track for search."""
+
+from django.core.management.base import BaseCommand
+
+from apps.library.search import track_search
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the track search index from the Track table, e.g. after "
+        "tracks were changed without signals."
+    )
+
+    def handle(self, *args, **options):
+        backend = track_search()
+        backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the {type(backend).__name__} index.")
+        )
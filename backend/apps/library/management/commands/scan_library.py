@@ -0,0 +1,57 @@
+"""Scan SUITUNE_MEDIA_ROOT and sync the track table."""
+
+from django.core.management.base import BaseCommand
+
+from apps.library import artwork
+from apps.library.models import Track
+from apps.library.scanner import LibraryScanner
+
+
+class Command(BaseCommand):
+    help = "Scan the media root and create, update or mark missing tracks to match it."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--root", help="Directory to scan (default: SUITUNE_MEDIA_ROOT)."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Tag reader processes (default: all cores).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--no-artwork",
+            action="store_true",
+            help="Skip extracting cover art into SUITUNE_ARTWORK_ROOT.",
+        )
+        parser.add_argument(
+            "--prune-artwork",
+            action="store_true",
+            help="Afterwards, delete cached artwork no track refers to.",
+        )
+
+    def handle(self, *args, **options):
+        scanner = LibraryScanner(
+            root=options["root"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            artwork=not options["no_artwork"],
+        )
+        result = scanner.scan()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scanned {result.seen} files: {result.created} created, "
+                f"{result.updated} updated, {result.missing} missing."
+            )
+        )
+        if options["prune_artwork"]:
+            keep = set(
+                Track.objects.filter(missing_since=None)
+                .exclude(artwork="")
+                .values_list("artwork", flat=True)
+                .distinct()
+            )
+            removed = artwork.prune(keep)
+            self.stdout.write(f"Pruned {removed} unused artwork files.")
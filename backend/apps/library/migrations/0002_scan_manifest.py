@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="track",
+            name="album",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="track",
+            name="bitrate",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="track",
+            name="duration",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="track",
+            name="file_inode",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="track",
+            name="file_mtime_ns",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="track",
+            name="file_size",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="track",
+            name="path",
+            field=models.CharField(
+                blank=True,
+                help_text="Path relative to SUITUNE_MEDIA_ROOT.",
+                max_length=1024,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="track",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("path", ""), _negated=True),
+                fields=("path",),
+                name="library_track_unique_path",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0002_scan_manifest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="track",
+            name="artwork",
+            field=models.CharField(
+                blank=True,
+                help_text="Hash of the cover image in SUITUNE_ARTWORK_ROOT.",
+                max_length=64,
+            ),
+        ),
+    ]
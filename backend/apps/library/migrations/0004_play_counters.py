@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0003_artwork"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="track",
+            name="complete_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="track",
+            name="last_played_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="track",
+            name="play_count",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name="track",
+            name="skip_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
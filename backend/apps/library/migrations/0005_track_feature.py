@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0004_play_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrackFeature",
+            fields=[
+                (
+                    "track",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="feature",
+                        serialize=False,
+                        to="library.track",
+                    ),
+                ),
+                ("version", models.PositiveSmallIntegerField()),
+                ("file_mtime_ns", models.BigIntegerField(blank=True, null=True)),
+                ("bpm", models.FloatField(blank=True, null=True)),
+                ("energy", models.FloatField(blank=True, null=True)),
+                ("vector", models.BinaryField(blank=True)),
+                ("error", models.CharField(blank=True, max_length=255)),
+                ("analysed_at", models.DateTimeField()),
+            ],
+        ),
+    ]
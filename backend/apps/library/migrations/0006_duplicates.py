@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0005_track_feature"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="track",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="library.track",
+            ),
+        ),
+        migrations.AddField(
+            model_name="trackfeature",
+            name="fingerprint",
+            field=models.BinaryField(blank=True, default=b""),
+        ),
+    ]
@@ -0,0 +1,69 @@
+import re
+import unicodedata
+
+from django.db import DatabaseError, migrations, transaction
+
+FTS_TABLE = "library_track_search"
+BATCH_SIZE = 1000
+
+# A frozen copy of ``apps.library.search.indexed_text`` as of this migration.
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def indexed_text(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return "".join("  " + word for word in _NON_WORD.sub(" ", text).split())
+
+
+def create_search_table(apps, schema_editor):
+    # Only SQLite has FTS5; elsewhere apps.library.search uses its own index.
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} "
+                "USING fts5(title, artist, album, tokenize='trigram')"
+            )
+    except DatabaseError:
+        return  # SQLite built without FTS5 or older than 3.34
+    Track = apps.get_model("library", "Track")
+    rows = (
+        Track.objects.using(connection.alias)
+        .order_by("id")
+        .values_list("id", "title", "artist", "album")
+        .iterator(chunk_size=5000)
+    )
+    batch = []
+    with connection.cursor() as cursor:
+        for track_id, *texts in rows:
+            batch.append((track_id, *map(indexed_text, texts)))
+            if len(batch) >= BATCH_SIZE:
+                _insert(cursor, batch)
+                batch = []
+        _insert(cursor, batch)
+
+
+def _insert(cursor, batch):
+    cursor.executemany(
+        f"INSERT INTO {FTS_TABLE} (rowid, title, artist, album) "
+        "VALUES (%s, %s, %s, %s)",
+        batch,
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0006_duplicates"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0007_track_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="track",
+            name="missing_since",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0008_track_missing_since"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("track_ids", models.JSONField(null=True)),
+            ],
+        ),
+    ]
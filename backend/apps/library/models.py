@@ -7,11 +7,87 @@ class Track(models.Model):
 
     title = models.CharField(max_length=255)
     artist = models.CharField(max_length=255, blank=True)
+    album = models.CharField(max_length=255, blank=True)
     audio_url = models.URLField()
+    path = models.CharField(
+        max_length=1024, blank=True, help_text="Path relative to SUITUNE_MEDIA_ROOT."
+    )
+    artwork = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Hash of the cover image in SUITUNE_ARTWORK_ROOT.",
+    )
+    duration = models.FloatField(null=True, blank=True)
+    bitrate = models.IntegerField(null=True, blank=True)
+    # Scan manifest: a file is re-read only when one of these changes.
+    file_size = models.BigIntegerField(null=True, blank=True)
+    file_mtime_ns = models.BigIntegerField(null=True, blank=True)
+    file_inode = models.BigIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set by the scanner when the file is gone; the row (and its history)
+    # stays, and comes back if the file does.
+    missing_since = models.DateTimeField(null=True, blank=True)
+    # Maintained by apps.playback.stats as feedback events are written.
+    play_count = models.PositiveIntegerField(default=0, db_index=True)
+    skip_count = models.PositiveIntegerField(default=0)
+    complete_count = models.PositiveIntegerField(default=0)
+    last_played_at = models.DateTimeField(null=True, blank=True)
+    # Set by apps.library.duplicates on every copy but the best one.
+    duplicate_of = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="duplicates",
+    )
 
     class Meta:
         ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["path"],
+                condition=~models.Q(path=""),
+                name="library_track_unique_path",
+            )
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - simple repr
         return f"{self.title} - {self.artist}".strip(" -")
+
+
+class TrackFeature(models.Model):
+    """Audio features of a track (README §6 ``sui_feature``).
+
+    Written by :mod:`apps.library.features`; ``vector`` holds little-endian
+    float32 values in the order of ``features.FEATURE_NAMES`` and
+    ``fingerprint`` little-endian uint32 words (see :mod:`apps.library.duplicates`).
+    """
+
+    track = models.OneToOneField(
+        Track, on_delete=models.CASCADE, primary_key=True, related_name="feature"
+    )
+    version = models.PositiveSmallIntegerField()
+    # Manifest of the analysed file; a changed file is analysed again.
+    file_mtime_ns = models.BigIntegerField(null=True, blank=True)
+    bpm = models.FloatField(null=True, blank=True)
+    energy = models.FloatField(null=True, blank=True)
+    vector = models.BinaryField(blank=True)
+    fingerprint = models.BinaryField(blank=True, default=b"")
+    error = models.CharField(max_length=255, blank=True)
+    analysed_at = models.DateTimeField()
+
+    def __str__(self) -> str:  # pragma: no cover - simple repr
+        return f"Features v{self.version} of track {self.track_id}"
+
+
+class SearchChange(models.Model):
+    """Tracks to re-index in every :class:`~apps.library.search.TrigramSearch`.
+
+    Rows are read in ``id`` order; ``track_ids`` is ``null`` when every
+    track has to be re-indexed.
+    """
+
+    track_ids = models.JSONField(null=True)
+
+    def __str__(self) -> str:  # pragma: no cover - simple repr
+        return f"Search change {self.pk}"
@@ -0,0 +1,278 @@
+"""Incremental scanner populating :class:`~apps.library.models.Track`.
+
+Files are compared against the manifest stored on each track (size, mtime,
+inode); only new or changed files have their tags and artwork read, in a
+process pool, and results are written with chunked
+``bulk_create``/``bulk_update``.
+
+Tracks are never deleted, since their playback and feedback history would go
+with them. A new file with the inode and size (or size and mtime) of a
+file that is gone is taken as that file renamed or moved, and its track
+follows it; tracks whose file is simply gone get ``missing_since`` set
+and are skipped by the radio, listings and search until it is back.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+import mutagen
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import artwork
+from .models import Track
+from .signals import library_changed
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = frozenset(
+    {".mp3", ".m4a", ".aac", ".flac", ".ogg", ".oga", ".opus", ".wav", ".wma"}
+)
+
+TAG_FIELDS = ["title", "artist", "album", "duration", "bitrate"]
+MANIFEST_FIELDS = ["file_size", "file_mtime_ns", "file_inode"]
+# Also written for existing tracks, which may have moved or come back.
+MOVE_FIELDS = ["path", "audio_url", "missing_since"]
+
+
+class FileStat(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+
+
+class ScanResult(NamedTuple):
+    seen: int
+    created: int
+    updated: int
+    missing: int
+
+
+def walk(root: str) -> Iterator[FileStat]:
+    """Yield audio files below ``root`` with paths relative to it."""
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(root, rel_dir))
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(rel)
+                elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                    try:
+                        st = entry.stat()
+                    except OSError as exc:  # dangling link, deleted meanwhile
+                        logger.warning("Skipping %s: %s", rel, exc)
+                        continue
+                    yield FileStat(rel, st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def _first(tags, key: str) -> str:
+    values = tags.get(key) if tags else None
+    return str(values[0]).strip()[:255] if values else ""
+
+
+def read_tags(root: str, path: str) -> Dict[str, object]:
+    """Return tag fields for one file; falls back to the file name."""
+    try:
+        audio = mutagen.File(os.path.join(root, path), easy=True)
+    except (mutagen.MutagenError, OSError):
+        audio = None
+    tags = getattr(audio, "tags", None)
+    info = getattr(audio, "info", None)
+    bitrate = getattr(info, "bitrate", None)
+    length = getattr(info, "length", None)
+    return {
+        "title": _first(tags, "title")
+        or os.path.splitext(os.path.basename(path))[0][:255],
+        "artist": _first(tags, "artist"),
+        "album": _first(tags, "album"),
+        "duration": round(length, 3) if length else None,
+        "bitrate": int(bitrate) if bitrate else None,
+    }
+
+
+def _read_file(args: Tuple[str, str, bool]) -> Dict[str, object]:
+    root, path, with_artwork = args
+    tags = read_tags(root, path)
+    if with_artwork:
+        tags["artwork"] = artwork.extract(root, path)
+    return tags
+
+
+def stream_url(path: str) -> str:
+    return settings.SUITUNE_STREAM_PREFIX + quote(path)
+
+
+class LibraryScanner:
+    """Walk ``root`` and bring the ``Track`` table in line with it."""
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        workers: Optional[int] = None,
+        chunk_size: int = 500,
+        progress: Optional[Callable[[int, int], None]] = None,
+        artwork: bool = True,
+    ) -> None:
+        self.root = str(root or settings.SUITUNE_MEDIA_ROOT)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.artwork = artwork
+        self.update_fields = TAG_FIELDS + MANIFEST_FIELDS + MOVE_FIELDS
+        if artwork:
+            self.update_fields = self.update_fields + ["artwork"]
+
+    def _manifest(self) -> Dict[str, Tuple[int, Tuple[int, int, int], bool]]:
+        rows = (
+            Track.objects.exclude(path="")
+            .values_list("path", "id", "missing_since", *MANIFEST_FIELDS)
+            .iterator(chunk_size=5000)
+        )
+        return {
+            path: (pk, tuple(stat), missing is not None)
+            for path, pk, missing, *stat in rows
+        }
+
+    def scan(self) -> ScanResult:
+        manifest = self._manifest()
+        known_ids = {path: pk for path, (pk, _, _) in manifest.items()}
+        changed: List[FileStat] = []
+        seen = 0
+        for stat in walk(self.root):
+            seen += 1
+            known = manifest.pop(stat.path, None)
+            if (
+                known is None
+                or known[2]
+                or known[1] != (stat.size, stat.mtime_ns, stat.inode)
+            ):
+                changed.append(stat)
+        # Whatever is left in the manifest no longer exists on disk, unless
+        # it moved.
+        self._follow_moves(changed, manifest, known_ids)
+        removed = [pk for pk, _, missing in manifest.values() if not missing]
+
+        created = updated = 0
+        # Ids for incremental search updates; None if a backend could not
+        # return the ids of created rows.
+        track_ids: Optional[List[int]] = []
+        for batch in self._read(changed):
+            new, existing = self._build(batch, known_ids)
+            with transaction.atomic():
+                Track.objects.bulk_create(new)
+                Track.objects.bulk_update(existing, self.update_fields)
+            if track_ids is not None:
+                if any(track.pk is None for track in new):
+                    track_ids = None
+                else:
+                    track_ids += [track.pk for track in new + existing]
+            created += len(new)
+            updated += len(existing)
+            if self.progress:
+                self.progress(created + updated, len(changed))
+
+        now = timezone.now()
+        for start in range(0, len(removed), self.chunk_size):
+            Track.objects.filter(
+                id__in=removed[start : start + self.chunk_size]
+            ).update(missing_since=now)
+
+        result = ScanResult(seen, created, updated, len(removed))
+        if created or updated or removed:
+            library_changed.send(
+                sender=Track,
+                created=created,
+                updated=updated + len(removed),
+                deleted=0,
+                track_ids=None if track_ids is None else track_ids + removed,
+            )
+        return result
+
+    @staticmethod
+    def _follow_moves(changed: List[FileStat], gone: dict, known_ids: dict) -> None:
+        """Point new files that are gone files moved at their old tracks.
+
+        ``gone`` (the manifest of files not found) loses the entries that
+        moved, and ``known_ids`` maps their new paths to the old tracks.
+        A key shared by several gone files identifies none of them.
+        """
+        keys = {
+            path: (("inode", inode, size), ("mtime", size, mtime_ns))
+            for path, (_, (size, mtime_ns, inode), _) in gone.items()
+            if size is not None
+        }
+        counts = Counter(key for pair in keys.values() for key in pair)
+        by_key = {
+            key: path for path, pair in keys.items() for key in pair if counts[key] == 1
+        }
+        for stat in changed:
+            if stat.path in known_ids:
+                continue
+            for key in (
+                ("inode", stat.inode, stat.size),
+                ("mtime", stat.size, stat.mtime_ns),
+            ):
+                old = by_key.get(key)
+                if old is not None and old in gone:
+                    known_ids[stat.path] = gone.pop(old)[0]
+                    break
+
+    def _read(self, changed: List[FileStat]) -> Iterator[List[Tuple[FileStat, dict]]]:
+        """Yield ``(stat, tags)`` pairs in chunks of ``chunk_size``."""
+        # Files arrive directory by directory, so each worker's chunk mostly
+        # shares one album cover, which it then decodes only once.
+        args = [(self.root, stat.path, self.artwork) for stat in changed]
+        if self.workers > 1 and len(changed) > 1:
+            pool = ProcessPoolExecutor(max_workers=self.workers)
+            results = pool.map(_read_file, args, chunksize=32)
+        else:
+            pool = None
+            results = map(_read_file, args)
+        try:
+            batch = []
+            for stat, tags in zip(changed, results):
+                batch.append((stat, tags))
+                if len(batch) >= self.chunk_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def _build(
+        self, batch, known_ids: Dict[str, int]
+    ) -> Tuple[List[Track], List[Track]]:
+        new: List[Track] = []
+        existing: List[Track] = []
+        for stat, tags in batch:
+            track = Track(
+                path=stat.path,
+                audio_url=stream_url(stat.path),
+                file_size=stat.size,
+                file_mtime_ns=stat.mtime_ns,
+                file_inode=stat.inode,
+                **tags,
+            )
+            pk = known_ids.get(stat.path)
+            if pk is None:
+                new.append(track)
+            else:
+                track.pk = pk
+                existing.append(track)
+        return new, existing
@@ -0,0 +1,412 @@
+"""Ranked track search over title, artist and album.
+
+Text is normalised (accents dropped, case folded, punctuation turned into
+spaces) and each word ``w`` is indexed by the trigrams of ``"  " + w``. With
+that padding, the first one and two characters of a word are grams too, so
+a query matches while its first letter is being typed and word prefixes
+rank above matches inside a word. A typo breaks only the grams around it,
+so the rest of the word still matches.
+
+:func:`score` ranks a track by the share of the query's grams it contains
+(at least :data:`MIN_COVERAGE`) plus the Dice coefficient of the query with
+each field, weighted by :data:`FIELD_WEIGHTS`. Two backends find the
+candidates to score:
+
+* :class:`FTS5Search`, when the database is SQLite with FTS5. A virtual
+  table with the trigram tokenizer (created by migration ``0007``) holds
+  the normalised text. The :data:`CANDIDATES` tracks containing all query
+  grams that ``bm25`` (weighted like :data:`FIELD_WEIGHTS`) ranks best are
+  scored. Only if they are fewer than asked for, the query is run again
+  with the grams OR'ed to find tracks with typos.
+* :class:`TrigramSearch` otherwise: an inverted index of numpy arrays in
+  each process. Changes reach it through a log of changed track ids in the
+  database (:class:`~apps.library.models.SearchChange`), which it reads at
+  most every ``check_interval`` seconds.
+
+``Track`` save/delete signals and ``library_changed`` (which scans send
+with the ids they touched) keep either backend in step, one track at a time.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max
+
+from .models import SearchChange, Track
+
+SEARCH_FIELDS = ("title", "artist", "album")
+FIELD_WEIGHTS = np.array([3.0, 2.0, 1.0])
+# Share of the query's grams a result must contain.
+MIN_COVERAGE = 0.5
+# Candidates the FTS5 backend fetches for re-ranking.
+CANDIDATES = 200
+MAX_QUERY_GRAMS = 64
+FTS_TABLE = "library_track_search"
+CHUNK_SIZE = 1000
+
+# Catching up on more log entries than this costs more than a rebuild, so
+# older entries are deleted.
+MAX_CATCH_UP = 1000
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+Row = Tuple[int, str, str, str]
+
+
+def words(text: Optional[str]) -> List[str]:
+    """Split ``text`` into normalised words."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return _NON_WORD.sub(" ", text).split()
+
+
+def grams(text: Optional[str]) -> Set[str]:
+    """Return the padded trigrams of every word of ``text``."""
+    found: Set[str] = set()
+    for word in words(text):
+        padded = "  " + word
+        found.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return found
+
+
+def indexed_text(text: Optional[str]) -> str:
+    """Return ``text`` as stored for FTS5: every word behind two spaces."""
+    return "".join("  " + word for word in words(text))
+
+
+def query_grams(query: str) -> Set[str]:
+    return set(sorted(grams(query))[:MAX_QUERY_GRAMS])
+
+
+def score(overlaps: np.ndarray, sizes: np.ndarray, wanted: int) -> np.ndarray:
+    """Score tracks given per-field gram ``overlaps`` and ``sizes`` (n x 3).
+
+    ``wanted`` is the number of query grams; tracks below
+    :data:`MIN_COVERAGE` score 0.
+    """
+    coverage = np.minimum(overlaps.sum(axis=1) / wanted, 1.0)
+    dice = 2.0 * overlaps / (sizes + wanted)
+    return np.where(coverage >= MIN_COVERAGE, coverage + dice @ FIELD_WEIGHTS, 0.0)
+
+
+def score_fields(wanted: Set[str], fields: Sequence[Sequence[Set[str]]]) -> np.ndarray:
+    """:func:`score` tracks given as gram sets per field."""
+    overlaps = np.array(
+        [[len(wanted & field) for field in track] for track in fields], dtype=float
+    ).reshape(-1, len(SEARCH_FIELDS))
+    sizes = np.array(
+        [[len(field) for field in track] for track in fields], dtype=float
+    ).reshape(-1, len(SEARCH_FIELDS))
+    return score(overlaps, sizes, len(wanted))
+
+
+def top(ids: np.ndarray, scores: np.ndarray, limit: int) -> List[int]:
+    """Return up to ``limit`` ids with positive scores, best first."""
+    keep = scores > 0
+    ids, scores = ids[keep], scores[keep]
+    if len(ids) > limit:
+        best = np.argpartition(-scores, limit - 1)[:limit]
+        ids, scores = ids[best], scores[best]
+    order = np.lexsort((ids, -scores))
+    return ids[order].tolist()
+
+
+def _rows(track_ids: Optional[Iterable[int]] = None) -> Iterable[Row]:
+    """Yield ``(id, title, artist, album)`` of some or all tracks."""
+    if track_ids is None:
+        yield from (
+            Track.objects.order_by("id")
+            .values_list("id", *SEARCH_FIELDS)
+            .iterator(chunk_size=5000)
+        )
+        return
+    track_ids = sorted(set(track_ids))
+    for start in range(0, len(track_ids), CHUNK_SIZE):
+        chunk = track_ids[start : start + CHUNK_SIZE]
+        yield from Track.objects.filter(id__in=chunk).values_list("id", *SEARCH_FIELDS)
+
+
+class SearchBackend:
+    """Find track ids matching a query, best first."""
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        wanted = query_grams(query)
+        if not wanted:
+            return []
+        return self._search(wanted, limit)
+
+    def _search(self, wanted: Set[str], limit: int) -> List[int]:
+        raise NotImplementedError
+
+    def changed(self, track_ids: Iterable[int]) -> None:
+        """Re-index ``track_ids`` (saved, or deleted if gone)."""
+        raise NotImplementedError
+
+    def rebuild(self) -> None:
+        """Re-index every track."""
+        raise NotImplementedError
+
+    def ensure(self) -> None:
+        """Get ready to answer queries (load the index, catch up)."""
+
+
+class FTS5Search(SearchBackend):
+    """Candidates from the SQLite FTS5 table :data:`FTS_TABLE`."""
+
+    def __init__(self, using: str = "default") -> None:
+        self.using = using
+
+    def _search(self, wanted: Set[str], limit: int) -> List[int]:
+        quoted = [f'"{gram}"' for gram in sorted(wanted)]
+        count = max(CANDIDATES, limit)
+        rows = self._match(" AND ".join(quoted), count)
+        if len(rows) < limit:
+            found = {row[0] for row in rows}
+            rows += [
+                row
+                for row in self._match(" OR ".join(quoted), count)
+                if row[0] not in found
+            ]
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        fields = [[grams(text) for text in row[1:]] for row in rows]
+        return top(ids, score_fields(wanted, fields), limit)
+
+    def _match(self, match: str, count: int) -> List[tuple]:
+        # The best ``count`` by bm25, not the first by rowid: with a short
+        # query those would be the oldest tracks, not the best matches.
+        weights = ", ".join(str(weight) for weight in FIELD_WEIGHTS)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, title, artist, album FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+                [match, count],
+            )
+            return cursor.fetchall()
+
+    def write(self, rows: Iterable[Row], remove: Iterable[int] = ()) -> None:
+        """Replace the entries of ``rows`` and delete those of ``remove``."""
+        rows = list(rows)
+        stale = [(track_id,) for track_id in remove]
+        stale += [(row[0],) for row in rows]
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", stale)
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, artist, album) "
+                "VALUES (%s, %s, %s, %s)",
+                [(track_id, *map(indexed_text, texts)) for track_id, *texts in rows],
+            )
+
+    def changed(self, track_ids: Iterable[int]) -> None:
+        track_ids = set(track_ids)
+        with transaction.atomic(using=self.using):
+            rows = list(_rows(track_ids))
+            self.write(rows, track_ids - {row[0] for row in rows})
+
+    def rebuild(self, rows: Optional[Iterable[Row]] = None) -> None:
+        with transaction.atomic(using=self.using):
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            batch: List[Row] = []
+            for row in _rows() if rows is None else rows:
+                batch.append(row)
+                if len(batch) >= CHUNK_SIZE:
+                    self.write(batch)
+                    batch = []
+            self.write(batch)
+
+
+def _append(entries: List[SearchChange]) -> None:
+    head = SearchChange.objects.bulk_create(entries)[-1].pk
+    SearchChange.objects.filter(pk__lte=head - MAX_CATCH_UP).delete()
+
+
+def log_changes(track_ids: Iterable[int]) -> None:
+    """Append ``track_ids`` to the change log :class:`TrigramSearch` reads."""
+    track_ids = sorted(set(track_ids))
+    if track_ids:
+        _append(
+            [
+                SearchChange(track_ids=track_ids[start : start + CHUNK_SIZE])
+                for start in range(0, len(track_ids), CHUNK_SIZE)
+            ]
+        )
+
+
+def log_rebuild() -> None:
+    """Make every :class:`TrigramSearch` rebuild on its next check."""
+    _append([SearchChange(track_ids=None)])
+
+
+def log_head() -> int:
+    return SearchChange.objects.aggregate(head=Max("pk"))["head"] or 0
+
+
+class TrigramSearch(SearchBackend):
+    """In-process inverted trigram index.
+
+    Gram ``g`` lists the *slots* ``3 * position + field`` of the tracks
+    containing it in ``slots[offsets[g]:offsets[g + 1]]``, so one
+    ``bincount`` gives every track's per-field overlap with a query.
+    Tracks changed since that index was built are kept as gram sets in
+    ``extra`` and scored directly; past ``compact_at`` of them the index
+    is rebuilt.
+    """
+
+    def __init__(self, check_interval: float = 2.0, compact_at: int = 2000) -> None:
+        self.check_interval = check_interval
+        self.compact_at = compact_at
+        self.vocabulary: Dict[str, int] = {}
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.sizes = np.zeros((0, len(SEARCH_FIELDS)))
+        self.live = np.zeros(0, dtype=bool)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.slots = np.zeros(0, dtype=np.int32)
+        self.extra: Dict[int, List[Set[str]]] = {}
+        self.seq: Optional[int] = None
+        self._checked_at: Optional[float] = None
+        self._missing: Optional[int] = None
+        self._lock = threading.RLock()
+
+    def ensure(self) -> None:
+        now = time.monotonic()
+        if (
+            self.seq is not None
+            and self._checked_at is not None
+            and now - self._checked_at < self.check_interval
+        ):
+            return
+        with self._lock:
+            head = log_head()
+            behind = head - (self.seq or 0)
+            if self.seq is None or behind < 0 or behind > MAX_CATCH_UP:
+                self._build(head)
+            elif behind:
+                entries = dict(
+                    SearchChange.objects.filter(
+                        pk__gt=self.seq, pk__lte=head
+                    ).values_list("pk", "track_ids")
+                )
+                expected = range(self.seq + 1, head + 1)
+                missing = next((seq for seq in expected if seq not in entries), None)
+                if missing is None:
+                    if None in entries.values():
+                        self._build(head)
+                    else:
+                        self._refresh(set().union(*map(set, entries.values())))
+                        self.seq = head
+                elif missing == self._missing:
+                    self._build(head)  # rolled back, not just being written
+                self._missing = missing
+            self._checked_at = now
+
+    def changed(self, track_ids: Iterable[int]) -> None:
+        track_ids = list(track_ids)
+        transaction.on_commit(lambda: self._logged(track_ids))
+
+    def _logged(self, track_ids: List[int]) -> None:
+        log_changes(track_ids)
+        # See our own changes on the next query.
+        self._checked_at = None
+
+    def rebuild(self) -> None:
+        transaction.on_commit(self._rebuilt)
+
+    def _rebuilt(self) -> None:
+        log_rebuild()
+        self._checked_at = None
+
+    def _build(self, seq: int) -> None:
+        vocabulary: Dict[str, int] = {}
+        ids = array("q")
+        sizes = array("d")
+        gram_ids = array("i")
+        slots = array("i")
+        fields = len(SEARCH_FIELDS)
+        for pos, (track_id, *texts) in enumerate(_rows()):
+            ids.append(track_id)
+            for field, text in enumerate(texts):
+                found = grams(text)
+                sizes.append(len(found))
+                slot = pos * fields + field
+                for gram in found:
+                    gram_ids.append(vocabulary.setdefault(gram, len(vocabulary)))
+                    slots.append(slot)
+        gram_ids = np.frombuffer(gram_ids, dtype=np.int32)
+        order = np.argsort(gram_ids, kind="stable")
+        counts = np.bincount(gram_ids, minlength=len(vocabulary))
+        self.vocabulary = vocabulary
+        self.ids = np.frombuffer(ids, dtype=np.int64)
+        self.sizes = np.frombuffer(sizes, dtype=np.float64).reshape(-1, fields)
+        self.live = np.ones(len(self.ids), dtype=bool)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.slots = np.frombuffer(slots, dtype=np.int32)[order]
+        self.extra = {}
+        self.seq = seq
+
+    def _refresh(self, track_ids: Set[int]) -> None:
+        ids = np.fromiter(track_ids, dtype=np.int64, count=len(track_ids))
+        if len(self.ids):
+            pos = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+            self.live[pos[self.ids[pos] == ids]] = False
+        for track_id in track_ids:
+            self.extra.pop(track_id, None)
+        for track_id, *texts in _rows(track_ids):
+            self.extra[track_id] = [grams(text) for text in texts]
+        if len(self.extra) > self.compact_at:
+            self._build(log_head())
+
+    def _search(self, wanted: Set[str], limit: int) -> List[int]:
+        self.ensure()
+        with self._lock:
+            found_ids: List[np.ndarray] = []
+            found_scores: List[np.ndarray] = []
+            known = [
+                self.vocabulary[gram] for gram in wanted if gram in self.vocabulary
+            ]
+            size = len(self.ids)
+            if known and size:
+                hits = np.concatenate(
+                    [self.slots[self.offsets[g] : self.offsets[g + 1]] for g in known]
+                )
+                overlaps = np.bincount(hits, minlength=size * len(SEARCH_FIELDS))
+                overlaps = overlaps.reshape(size, len(SEARCH_FIELDS))
+                matched = np.flatnonzero(overlaps.any(axis=1) & self.live)
+                found_ids.append(self.ids[matched])
+                found_scores.append(
+                    score(overlaps[matched], self.sizes[matched], len(wanted))
+                )
+            if self.extra:
+                found_ids.append(np.fromiter(self.extra, dtype=np.int64))
+                found_scores.append(score_fields(wanted, list(self.extra.values())))
+        if not found_ids:
+            return []
+        return top(np.concatenate(found_ids), np.concatenate(found_scores), limit)
+
+
+_backend: Optional[SearchBackend] = None
+
+
+def track_search() -> SearchBackend:
+    """Return the backend chosen by ``SUITUNE_SEARCH_BACKEND``.
+
+    ``auto`` picks FTS5 if its table exists (SQLite built with FTS5),
+    otherwise the in-process trigram index.
+    """
+    global _backend
+    if _backend is None:
+        choice = getattr(settings, "SUITUNE_SEARCH_BACKEND", "auto")
+        if choice == "auto":
+            tables = connections["default"].introspection.table_names()
+            choice = "fts5" if FTS_TABLE in tables else "trigram"
+        _backend = FTS5Search() if choice == "fts5" else TrigramSearch()
+    return _backend
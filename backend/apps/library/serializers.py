@@ -1,9 +1,20 @@
 """Serializers for the library app."""
+from django.urls import reverse
 from rest_framework import serializers
+
+from .artwork import DEFAULT_ARTWORK_SIZE
 from .models import Track
 
 
 class TrackSerializer(serializers.ModelSerializer):
+    artwork = serializers.SerializerMethodField()
+
     class Meta:
         model = Track
-        fields = ["id", "title", "artist", "audio_url"]
+        fields = ["id", "title", "artist", "album", "duration", "audio_url", "artwork"]
+
+    def get_artwork(self, track):
+        """Immutable URL of the default-size cover, or ``None``."""
+        if not track.artwork:
+            return None
+        return reverse("artwork", args=[track.artwork, DEFAULT_ARTWORK_SIZE])
@@ -0,0 +1,31 @@
+"""Signals sent by the library app, and the receivers keeping search current."""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+# Sent after bulk changes that bypass ``post_save``/``post_delete``, such as
+# a library scan or feature analysis (``sender=TrackFeature``). Receivers get
+# ``created``, ``updated`` and ``deleted`` counts, and ``track_ids`` if the
+# sender knows which tracks were saved or deleted.
+library_changed = Signal()
+
+
+@receiver(post_save, sender="library.Track")
+@receiver(post_delete, sender="library.Track")
+def track_changed(sender, instance, **kwargs):
+    from .search import track_search
+
+    track_search().changed([instance.pk])
+
+
+@receiver(library_changed)
+def library_updated(sender, track_ids=None, **kwargs):
+    from .models import TrackFeature
+    from .search import track_search
+
+    if sender is TrackFeature:
+        return  # features are not searched
+    if track_ids is None:
+        track_search().rebuild()
+    elif track_ids:
+        track_search().changed(track_ids)
@@ -1,10 +1,118 @@
 """REST API views for the library."""
+import re
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.urls import reverse
 from rest_framework import viewsets
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from apps.core.catalog import ConditionalCatalogMixin
+from apps.core.media import serve_file
+from apps.core.pagination import KeysetPagination
+
+from .artwork import DEFAULT_ARTWORK_SIZE, artwork_sizes, relative_path
 from .models import Track
+from .search import track_search
 from .serializers import TrackSerializer
 
 
-class TrackViewSet(viewsets.ModelViewSet):
+class TrackViewSet(ConditionalCatalogMixin, viewsets.ModelViewSet):
+    """Tracks in id order; ``?artist=``/``?album=`` filter exactly.
+
+    Tracks whose file is missing are not listed.
+    """
+
     queryset = Track.objects.all()
     serializer_class = TrackSerializer
     http_method_names = ["get", "post", "head", "options"]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("id",)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            queryset = queryset.filter(missing_since=None)
+            params = self.request.query_params
+            for name in ("artist", "album"):
+                if name in params:
+                    queryset = queryset.filter(**{name: params[name]})
+            # Only the serialised columns, not the scan manifest.
+            queryset = queryset.only(*TrackSerializer.Meta.fields)
+        return queryset
+
+
+MAX_SEARCH_RESULTS = 50
+
+
+@api_view(["GET"])
+def search_tracks(request):
+    """A list of tracks matching ``?q=`` in title, artist or album, best first.
+
+    Words match by prefix and tolerate typos; ``?limit=`` caps the results
+    (default 20).
+    """
+    params = request.query_params
+    try:
+        limit = int(params.get("limit", 20))
+    except ValueError:
+        raise ValidationError({"detail": "limit must be an integer"})
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        raise ValidationError(
+            {"detail": f"limit must be between 1 and {MAX_SEARCH_RESULTS}"}
+        )
+    ids = track_search().search(params.get("q", ""), limit)
+    tracks = (
+        Track.objects.filter(missing_since=None)
+        .only(*TrackSerializer.Meta.fields)
+        .in_bulk(ids)
+    )
+    # Tracks deleted or missing since they were indexed are skipped.
+    ranked = [tracks[pk] for pk in ids if pk in tracks]
+    return Response(TrackSerializer(ranked, many=True).data)
+
+
+DIGEST_RE = re.compile(r"[0-9a-f]{32}")
+
+
+def track_artwork(request, track_id):
+    """Redirect to the immutable artwork URL of a track (``?size=``)."""
+    digest = Track.objects.filter(pk=track_id).values_list("artwork", flat=True).first()
+    if not digest:
+        raise Http404("No artwork")
+    sizes = artwork_sizes()
+    try:
+        wanted = int(request.GET.get("size", DEFAULT_ARTWORK_SIZE))
+    except ValueError:
+        wanted = DEFAULT_ARTWORK_SIZE
+    size = next((s for s in sizes if s >= wanted), sizes[-1])
+    response = HttpResponseRedirect(reverse("artwork", args=[digest, size]))
+    # The track may get new artwork on a rescan; the target never changes.
+    response["Cache-Control"] = "public, max-age=300"
+    return response
+
+
+def artwork_file(request, digest, size):
+    """Serve a cached thumbnail through Nginx (``X-Accel-Redirect``).
+
+    The URL is content-addressed, so it is cacheable forever; no database
+    access is needed.
+    """
+    if not DIGEST_RE.fullmatch(digest) or size not in artwork_sizes():
+        raise Http404("Unknown artwork")
+    cache_control = "public, max-age=31536000, immutable"
+    if settings.SUITUNE_SERVE_MEDIA:
+        return serve_file(
+            request,
+            settings.SUITUNE_ARTWORK_ROOT,
+            relative_path(digest, size),
+            cache_control=cache_control,
+        )
+    response = HttpResponse(content_type="image/jpeg")
+    response["X-Accel-Redirect"] = settings.SUITUNE_ARTWORK_PREFIX + relative_path(
+        digest, size
+    )
+    response["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,209 @@
+"""Write-behind ingestion of listener feedback events.
+
+``POST /api/feedback`` only validates events and appends them to a
+:class:`FeedbackBuffer`. The buffer writes ``Playback``/``Feedback`` rows
+with ``bulk_create`` once ``batch_size`` events are pending or
+``flush_interval`` seconds after the first pending event, whichever comes
+first, updating the play statistics (:mod:`apps.playback.stats`) in the
+same transaction.
+
+A batch that fails to be written goes back to the front of the buffer and
+is tried again, up to ``max_attempts`` times. Then its events are written
+one by one and those that still fail (say, for a track deleted meanwhile)
+are logged and dropped, so one bad event cannot hold up the rest.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from apps.library.models import Track
+
+from . import stats
+from .models import Feedback, Playback
+from .stats import PLAYBACK_ACTIONS
+
+logger = logging.getLogger(__name__)
+
+
+class FeedbackEvent(NamedTuple):
+    track_id: int
+    action: str
+    channel: str
+    occurred_at: datetime
+    user_id: Optional[int] = None
+
+
+class FeedbackBuffer:
+    """Collect events in memory and persist them in batches."""
+
+    def __init__(
+        self,
+        batch_size: int = 200,
+        flush_interval: Optional[float] = 5.0,
+        max_attempts: int = 3,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._events: List[FeedbackEvent] = []
+        self._failures = 0
+        self._lock = threading.Lock()
+        # Held for a whole flush, from taking the events to committing them.
+        self._write_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
+
+    def add(self, events: Iterable[FeedbackEvent]) -> None:
+        if self._append(events):
+            self.flush()
+
+    async def aadd(self, events: Iterable[FeedbackEvent]) -> None:
+        """:meth:`add` for async views; a full buffer is written in a thread."""
+        if self._append(events):
+            await sync_to_async(self.flush)()
+
+    def _append(self, events: Iterable[FeedbackEvent]) -> bool:
+        """Buffer ``events``; return whether the buffer is now full."""
+        with self._lock:
+            self._events.extend(events)
+            full = len(self._events) >= self.batch_size
+            if not full:
+                self._arm_timer()
+        return full
+
+    def _arm_timer(self) -> None:
+        """Schedule a flush of pending events; call with the lock held."""
+        if self._timer is None and self.flush_interval is not None:
+            self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    @contextmanager
+    def settled(self) -> Iterator[None]:
+        """Hold off flushes, so every event is either committed or pending."""
+        with self._write_lock:
+            yield
+
+    def pending(self) -> List[FeedbackEvent]:
+        """Return the events not written yet; see :meth:`settled`."""
+        with self._lock:
+            return list(self._events)
+
+    def _flush_from_timer(self) -> None:
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+    def flush(self) -> int:
+        """Persist pending events; return how many rows of feedback were written."""
+        with self._write_lock:
+            with self._lock:
+                events, self._events = self._events, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            written = None
+            try:
+                written = self._flush(events) if events else 0
+            finally:
+                if written is None:
+                    with self._lock:
+                        # Try again later, before anything that came in since.
+                        self._events[:0] = events
+                        self._arm_timer()
+        return written or 0
+
+    def _flush(self, events: List[FeedbackEvent]) -> Optional[int]:
+        """Write ``events``; ``None`` means they should be tried again."""
+        try:
+            written = self._write(events)
+        except Exception:
+            self._failures += 1
+            if self._failures < self.max_attempts:
+                logger.exception(
+                    "Failed to persist %d feedback events (attempt %d of %d)",
+                    len(events),
+                    self._failures,
+                    self.max_attempts,
+                )
+                return None
+            logger.exception(
+                "Failed to persist %d feedback events; writing them one by one",
+                len(events),
+            )
+            written = self._write_each(events)
+        self._failures = 0
+        return written
+
+    def _write_each(self, events: List[FeedbackEvent]) -> int:
+        written = 0
+        for event in events:
+            try:
+                written += self._write([event])
+            except Exception:
+                logger.exception("Dropping feedback event %r", event)
+        return written
+
+    def _write(self, events: List[FeedbackEvent]) -> int:
+        known = set(
+            Track.objects.filter(id__in={e.track_id for e in events}).values_list(
+                "id", flat=True
+            )
+        )
+        events = [e for e in events if e.track_id in known]
+        with transaction.atomic():
+            playbacks = Playback.objects.bulk_create(
+                [
+                    Playback(
+                        track_id=e.track_id,
+                        user_id=e.user_id,
+                        channel=e.channel,
+                        started_at=e.occurred_at,
+                        finished_at=e.occurred_at,
+                        skipped=e.action == Feedback.SKIP,
+                    )
+                    for e in events
+                    if e.action in PLAYBACK_ACTIONS
+                ]
+            )
+            played = iter(playbacks)
+            Feedback.objects.bulk_create(
+                [
+                    Feedback(
+                        playback=next(played) if e.action in PLAYBACK_ACTIONS else None,
+                        track_id=e.track_id,
+                        user_id=e.user_id,
+                        channel=e.channel,
+                        action=e.action,
+                        rating=Feedback.ACTION_RATINGS[e.action],
+                        created_at=e.occurred_at,
+                    )
+                    for e in events
+                ]
+            )
+            stats.record(
+                (e.track_id, e.channel, e.action, e.occurred_at) for e in events
+            )
+        return len(events)
+
+
+def get_feedback_buffer() -> FeedbackBuffer:
+    """Build a :class:`FeedbackBuffer` from ``SUITUNE_FEEDBACK_BUFFER``."""
+    return FeedbackBuffer(**getattr(settings, "SUITUNE_FEEDBACK_BUFFER", {}))
+
+
+feedback_buffer = get_feedback_buffer()
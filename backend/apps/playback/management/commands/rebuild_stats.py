@@ -0,0 +1,20 @@
+"""Recompute play statistics from the feedback history."""
+
+from django.core.management.base import BaseCommand
+
+from apps.playback import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild track play counters and hourly channel rollups from Feedback "
+        "(backfill, or repair after deleting history)."
+    )
+
+    def handle(self, *args, **options):
+        rollups, tracks = stats.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {rollups} hourly rollups and counters of {tracks} tracks."
+            )
+        )
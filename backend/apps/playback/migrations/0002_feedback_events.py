@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_feedback_track(apps, schema_editor):
+    Feedback = apps.get_model("playback", "Feedback")
+    Playback = apps.get_model("playback", "Playback")
+    Feedback.objects.filter(track__isnull=True, playback__isnull=False).update(
+        track_id=models.Subquery(
+            Playback.objects.filter(pk=models.OuterRef("playback_id")).values(
+                "track_id"
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0002_scan_manifest"),
+        ("playback", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="feedback",
+            name="action",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("like", "Like"),
+                    ("ban", "Ban"),
+                    ("skip", "Skip"),
+                    ("complete", "Complete"),
+                ],
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="feedback",
+            name="channel",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="feedback",
+            name="track",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="feedback",
+                to="library.track",
+            ),
+        ),
+        migrations.AddField(
+            model_name="feedback",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="playback",
+            name="channel",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="playback",
+            name="finished_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="playback",
+            name="skipped",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name="feedback",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name="feedback",
+            name="playback",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="feedback",
+                to="playback.playback",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="playback",
+            name="started_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_feedback_track, migrations.RunPython.noop),
+    ]
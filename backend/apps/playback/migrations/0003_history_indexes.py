@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("library", "0002_scan_manifest"),
+        ("playback", "0002_feedback_events"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="feedback",
+            index=models.Index(fields=["created_at", "id"], name="feedback_created_id"),
+        ),
+        migrations.AddIndex(
+            model_name="feedback",
+            index=models.Index(
+                fields=["channel", "created_at", "id"], name="feedback_channel_created"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="feedback",
+            index=models.Index(
+                fields=["user", "created_at", "id"], name="feedback_user_created"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playback",
+            index=models.Index(fields=["started_at", "id"], name="playback_started_id"),
+        ),
+        migrations.AddIndex(
+            model_name="playback",
+            index=models.Index(
+                fields=["channel", "started_at", "id"], name="playback_channel_started"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playback",
+            index=models.Index(
+                fields=["user", "started_at", "id"], name="playback_user_started"
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("playback", "0003_history_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="feedback",
+            name="action",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("like", "Like"),
+                    ("ban", "Ban"),
+                    ("skip", "Skip"),
+                    ("complete", "Complete"),
+                    ("error", "Playback error"),
+                ],
+                max_length=16,
+            ),
+        ),
+        migrations.CreateModel(
+            name="ChannelHourStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("channel", models.CharField(max_length=255)),
+                ("hour", models.DateTimeField()),
+                ("plays", models.PositiveIntegerField(default=0)),
+                ("completes", models.PositiveIntegerField(default=0)),
+                ("skips", models.PositiveIntegerField(default=0)),
+                ("likes", models.PositiveIntegerField(default=0)),
+                ("bans", models.PositiveIntegerField(default=0)),
+                ("errors", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["hour", "channel"],
+                "indexes": [models.Index(fields=["hour"], name="playback_stats_hour")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("channel", "hour"), name="playback_stats_channel_hour"
+                    )
+                ],
+            },
+        ),
+    ]
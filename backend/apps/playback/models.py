@@ -2,6 +2,7 @@
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from apps.library.models import Track
 
 
@@ -12,28 +13,101 @@ class Playback(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True
     )
-    started_at = models.DateTimeField(auto_now_add=True)
+    channel = models.CharField(max_length=255, blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    skipped = models.BooleanField(default=False)
 
     class Meta:
         ordering = ["id"]
+        # Keyset pagination seeks on (started_at, id), optionally per user
+        # or channel.
+        indexes = [
+            models.Index(fields=["started_at", "id"], name="playback_started_id"),
+            models.Index(
+                fields=["channel", "started_at", "id"], name="playback_channel_started"
+            ),
+            models.Index(
+                fields=["user", "started_at", "id"], name="playback_user_started"
+            ),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - simple representation
         return f"{self.track} @ {self.started_at:%Y-%m-%d %H:%M:%S}"
 
 
 class Feedback(models.Model):
-    """Stores user feedback for a particular playback."""
+    """Stores user feedback for a track, optionally tied to a playback."""
+
+    LIKE = "like"
+    BAN = "ban"
+    SKIP = "skip"
+    COMPLETE = "complete"
+    ERROR = "error"
+    ACTION_CHOICES = [
+        (LIKE, "Like"),
+        (BAN, "Ban"),
+        (SKIP, "Skip"),
+        (COMPLETE, "Complete"),
+        (ERROR, "Playback error"),
+    ]
+    ACTION_RATINGS = {LIKE: 1, BAN: -1, SKIP: -1, COMPLETE: 1, ERROR: 0}
 
     playback = models.ForeignKey(
-        Playback, on_delete=models.CASCADE, related_name="feedback"
+        Playback,
+        on_delete=models.CASCADE,
+        related_name="feedback",
+        null=True,
+        blank=True,
+    )
+    track = models.ForeignKey(
+        Track, on_delete=models.CASCADE, related_name="feedback", null=True, blank=True
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True
     )
+    channel = models.CharField(max_length=255, blank=True)
+    action = models.CharField(max_length=16, choices=ACTION_CHOICES, blank=True)
     rating = models.IntegerField()
     comment = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["id"]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="feedback_created_id"),
+            models.Index(
+                fields=["channel", "created_at", "id"], name="feedback_channel_created"
+            ),
+            models.Index(
+                fields=["user", "created_at", "id"], name="feedback_user_created"
+            ),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - simple representation
         return f"Feedback {self.rating} for playback {self.playback_id}"
 
+
+class ChannelHourStats(models.Model):
+    """Event counts of one channel in one UTC hour (see ``apps.playback.stats``)."""
+
+    channel = models.CharField(max_length=255)
+    hour = models.DateTimeField()
+    plays = models.PositiveIntegerField(default=0)
+    completes = models.PositiveIntegerField(default=0)
+    skips = models.PositiveIntegerField(default=0)
+    likes = models.PositiveIntegerField(default=0)
+    bans = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["hour", "channel"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["channel", "hour"], name="playback_stats_channel_hour"
+            )
+        ]
+        indexes = [models.Index(fields=["hour"], name="playback_stats_hour")]
+
+    def __str__(self) -> str:  # pragma: no cover - simple representation
+        return f"{self.channel} @ {self.hour:%Y-%m-%d %H}:00"
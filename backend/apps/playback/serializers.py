@@ -6,10 +6,78 @@ from .models import Playback, Feedback
 class PlaybackSerializer(serializers.ModelSerializer):
     class Meta:
         model = Playback
-        fields = ["id", "track", "user", "started_at"]
+        fields = [
+            "id",
+            "track",
+            "user",
+            "channel",
+            "started_at",
+            "finished_at",
+            "skipped",
+        ]
+
+
+class PlaybackListSerializer(serializers.ModelSerializer):
+    """Read-only list rows with the track's title and artist inlined."""
+
+    track_title = serializers.CharField(source="track.title", read_only=True)
+    track_artist = serializers.CharField(source="track.artist", read_only=True)
+
+    class Meta:
+        model = Playback
+        fields = PlaybackSerializer.Meta.fields + ["track_title", "track_artist"]
+        read_only_fields = fields
 
 
 class FeedbackSerializer(serializers.ModelSerializer):
     class Meta:
         model = Feedback
-        fields = ["id", "playback", "rating", "comment", "created_at"]
+        fields = [
+            "id",
+            "playback",
+            "track",
+            "user",
+            "channel",
+            "action",
+            "rating",
+            "comment",
+            "created_at",
+        ]
+
+
+class FeedbackListSerializer(serializers.ModelSerializer):
+    """Read-only list rows with the track's title and artist inlined."""
+
+    track_title = serializers.CharField(
+        source="track.title", read_only=True, default=None
+    )
+    track_artist = serializers.CharField(
+        source="track.artist", read_only=True, default=None
+    )
+
+    class Meta:
+        model = Feedback
+        fields = FeedbackSerializer.Meta.fields + ["track_title", "track_artist"]
+        read_only_fields = fields
+
+
+class FeedbackEventSerializer(serializers.Serializer):
+    """One listener event posted to ``/api/feedback``.
+
+    The older ``{"track_id", "liked"}`` shape is still accepted and mapped to
+    ``like``/``ban``.
+    """
+
+    track_id = serializers.IntegerField(min_value=1)
+    action = serializers.ChoiceField(choices=Feedback.ACTION_CHOICES, required=False)
+    liked = serializers.BooleanField(required=False, write_only=True)
+    channel = serializers.CharField(max_length=255, required=False, default="default")
+    ts = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        liked = attrs.pop("liked", None)
+        if "action" not in attrs:
+            if liked is None:
+                raise serializers.ValidationError("action (or liked) is required")
+            attrs["action"] = Feedback.LIKE if liked else Feedback.BAN
+        return attrs
@@ -0,0 +1,25 @@
+"""Signal handlers keeping play statistics in sync with feedback."""
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import stats
+
+
+@receiver(post_save, sender="playback.Feedback")
+def feedback_saved(sender, instance, created, raw=False, **kwargs):
+    # The feedback buffer uses ``bulk_create`` and records its own events;
+    # this covers rows created one at a time (REST API, admin, shell).
+    if created and not raw:
+        with transaction.atomic():
+            stats.record(
+                [
+                    (
+                        instance.track_id,
+                        instance.channel,
+                        instance.action,
+                        instance.created_at,
+                    )
+                ]
+            )
@@ -0,0 +1,231 @@
+"""Play statistics maintained incrementally as feedback events are written.
+
+Every event bumps counters on its track (plays, skips, completes, last
+play) and on the :class:`~apps.playback.models.ChannelHourStats` row of its
+channel and UTC hour. Both use ``F()`` increments inside the transaction
+that writes the events, so concurrent writers never lose counts and the
+statistics never run ahead of ``Feedback``. Reports then read at most one
+row per channel and hour of the window, however long the history is.
+``manage.py rebuild_stats`` recomputes everything from ``Feedback``.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, TruncHour
+from django.utils import timezone
+
+from apps.library.models import Track
+
+from .models import ChannelHourStats, Feedback
+
+# Actions that mean the track was actually played.
+PLAYBACK_ACTIONS = {Feedback.SKIP, Feedback.COMPLETE}
+
+ROLLUP_FIELDS = {
+    Feedback.COMPLETE: "completes",
+    Feedback.SKIP: "skips",
+    Feedback.LIKE: "likes",
+    Feedback.BAN: "bans",
+    Feedback.ERROR: "errors",
+}
+COUNT_FIELDS = ("plays", "completes", "skips", "likes", "bans", "errors")
+
+# Rows per UPDATE; each one adds a few parameters to every CASE.
+UPDATE_CHUNK = 100
+
+# ``(track_id, channel, action, occurred_at)``
+Event = Tuple[int, str, str, datetime]
+
+
+def hour_of(moment: datetime) -> datetime:
+    """Return the start of the UTC hour containing ``moment``."""
+    if timezone.is_aware(moment):
+        moment = moment.astimezone(dt_timezone.utc)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record(events: Iterable[Event]) -> None:
+    """Add ``events`` to the track counters and hourly rollups.
+
+    Call inside the transaction that writes the events.
+    """
+    rollups: Dict[Tuple[str, datetime], Counter] = defaultdict(Counter)
+    tracks: Dict[int, Dict] = {}
+    for track_id, channel, action, occurred_at in events:
+        field = ROLLUP_FIELDS.get(action)
+        if field is None:
+            continue
+        counts = rollups[(channel, hour_of(occurred_at))]
+        counts[field] += 1
+        if action not in PLAYBACK_ACTIONS or track_id is None:
+            continue
+        counts["plays"] += 1
+        track = tracks.setdefault(
+            track_id, {"play_count": 0, "skip_count": 0, "complete_count": 0}
+        )
+        track["play_count"] += 1
+        track["skip_count"] += action == Feedback.SKIP
+        track["complete_count"] += action == Feedback.COMPLETE
+        track["last_played_at"] = max(
+            track.get("last_played_at", occurred_at), occurred_at
+        )
+    if not rollups:
+        return
+    ChannelHourStats.objects.bulk_create(
+        [ChannelHourStats(channel=channel, hour=hour) for channel, hour in rollups],
+        ignore_conflicts=True,
+    )
+    _increment(
+        ChannelHourStats,
+        [(Q(channel=c, hour=h), counts) for (c, h), counts in rollups.items()],
+        COUNT_FIELDS,
+    )
+    _increment(
+        Track,
+        [(Q(pk=pk), counts) for pk, counts in tracks.items()],
+        ("play_count", "skip_count", "complete_count"),
+        latest=("last_played_at",),
+    )
+
+
+def _increment(model, rows, fields, latest=()) -> None:
+    """Apply ``[(row filter, {field: value})]`` in one UPDATE per chunk.
+
+    ``fields`` are incremented by their value and ``latest`` fields are set
+    to their value unless they already hold a later one.
+    """
+    for start in range(0, len(rows), UPDATE_CHUNK):
+        chunk = rows[start : start + UPDATE_CHUNK]
+        changes = {}
+        for field in fields:
+            if any(values.get(field) for _, values in chunk):
+                changes[field] = F(field) + Case(
+                    *[When(q, then=Value(values.get(field, 0))) for q, values in chunk],
+                    default=Value(0),
+                )
+        for field in latest:
+            value = Case(
+                *[When(q, then=Value(values[field])) for q, values in chunk],
+                output_field=model._meta.get_field(field),
+            )
+            changes[field] = Greatest(Coalesce(field, value), value)
+        condition = Q()
+        for q, _ in chunk:
+            condition |= q
+        model.objects.filter(condition).update(**changes)
+
+
+def rebuild() -> Tuple[int, int]:
+    """Recompute all statistics from ``Feedback``; return (rollups, tracks)."""
+    played = Q(action__in=PLAYBACK_ACTIONS)
+    hourly = (
+        Feedback.objects.annotate(
+            bucket=TruncHour("created_at", tzinfo=dt_timezone.utc)
+        )
+        .values("channel", "bucket")
+        .annotate(
+            plays=Count("id", filter=played),
+            **{
+                field: Count("id", filter=Q(action=action))
+                for action, field in ROLLUP_FIELDS.items()
+            },
+        )
+        .order_by()
+    )
+    per_track = (
+        Feedback.objects.filter(played, track__isnull=False)
+        .values("track_id")
+        .annotate(
+            plays=Count("id"),
+            skips=Count("id", filter=Q(action=Feedback.SKIP)),
+            completes=Count("id", filter=Q(action=Feedback.COMPLETE)),
+            last=Max("created_at"),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        ChannelHourStats.objects.all().delete()
+        rows = ChannelHourStats.objects.bulk_create(
+            [
+                ChannelHourStats(
+                    channel=row["channel"],
+                    hour=row["bucket"],
+                    **{field: row[field] for field in COUNT_FIELDS},
+                )
+                for row in hourly.iterator()
+                if any(row[field] for field in COUNT_FIELDS)
+            ],
+            batch_size=500,
+        )
+        Track.objects.update(
+            play_count=0, skip_count=0, complete_count=0, last_played_at=None
+        )
+        tracks = [
+            Track(
+                pk=row["track_id"],
+                play_count=row["plays"],
+                skip_count=row["skips"],
+                complete_count=row["completes"],
+                last_played_at=row["last"],
+            )
+            for row in per_track.iterator()
+        ]
+        Track.objects.bulk_update(
+            tracks,
+            ["play_count", "skip_count", "complete_count", "last_played_at"],
+            batch_size=500,
+        )
+    return len(rows), len(tracks)
+
+
+def night_hours() -> List[int]:
+    """Local hours counted as night, from ``SUITUNE_STATS_NIGHT_HOURS``."""
+    start, end = getattr(settings, "SUITUNE_STATS_NIGHT_HOURS", (22, 6))
+    return [h % 24 for h in range(start, end + 24 if end <= start else end)]
+
+
+def summary(since: datetime, until: datetime, channel: Optional[str] = None) -> Dict:
+    """Return counts and rates in ``[since, until)``, overall and per channel.
+
+    ``night_share`` is the share of plays during :func:`night_hours` in the
+    current time zone.
+    """
+    rows = ChannelHourStats.objects.filter(hour__gte=hour_of(since), hour__lt=until)
+    if channel is not None:
+        rows = rows.filter(channel=channel)
+    totals = (
+        rows.values("channel")
+        .annotate(
+            night=Sum("plays", filter=Q(hour__hour__in=night_hours())),
+            **{field: Sum(field) for field in COUNT_FIELDS},
+        )
+        .order_by("channel")
+    )
+    overall: Counter = Counter()
+    channels = []
+    for row in totals:
+        name = row.pop("channel")
+        overall.update({k: row[k] or 0 for k in (*COUNT_FIELDS, "night")})
+        channels.append({"channel": name, **_rates(row)})
+    return {"total": _rates(overall), "channels": channels}
+
+
+def _rates(counts) -> Dict:
+    counts = {k: counts.get(k) or 0 for k in (*COUNT_FIELDS, "night")}
+    plays, night = counts["plays"], counts.pop("night")
+    attempts = plays + counts["errors"]
+    return {
+        **counts,
+        "completion_rate": counts["completes"] / plays if plays else None,
+        "skip_rate": counts["skips"] / plays if plays else None,
+        "error_rate": counts["errors"] / attempts if attempts else None,
+        "night_share": night / plays if plays else None,
+    }
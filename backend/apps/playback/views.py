@@ -1,16 +1,180 @@
 """REST API views for playback."""
 
+from datetime import datetime, time, timedelta
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import viewsets
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from apps.core.media import serve_file
+from apps.core.pagination import KeysetPagination
+from apps.library.models import Track
+from apps.radio.channels import channel_registry
+
+from . import stats
 from .models import Playback, Feedback
-from .serializers import PlaybackSerializer, FeedbackSerializer
+from .serializers import (
+    FeedbackListSerializer,
+    FeedbackSerializer,
+    PlaybackListSerializer,
+    PlaybackSerializer,
+)
+from .signing import get_signer
+
+
+def _parse_moment(value):
+    """Parse an ISO date or datetime query parameter."""
+    try:
+        moment = parse_datetime(value)
+        day = parse_date(value) if moment is None else None
+    except ValueError:  # well formatted, but no such date, e.g. 2024-13-45
+        moment = day = None
+    if moment is None:
+        if day is None:
+            raise ValidationError({"detail": f"Invalid date: {value!r}"})
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _parse_id(name, value):
+    """Parse an id query parameter; empty means ``None``."""
+    if not value:
+        return None
+    if not value.isdigit():
+        raise ValidationError({name: f"Invalid id: {value!r}"})
+    return int(value)
+
+
+class HistoryViewSet(viewsets.ModelViewSet):
+    """Listening history, newest first, filterable and keyset-paginated.
+
+    ``?user=``, ``?channel=`` and ``?track=`` filter exactly; ``?since=`` and
+    ``?until=`` bound ``time_field`` (inclusive / exclusive).
+    """
+
+    pagination_class = KeysetPagination
+    time_field = "started_at"
+    list_serializer_class = None
 
+    @property
+    def keyset_ordering(self):
+        return (f"-{self.time_field}", "-id")
 
-class PlaybackViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != "list":
+            return queryset
+        params = self.request.query_params
+        if "channel" in params:
+            queryset = queryset.filter(channel=params["channel"])
+        for name in ("user", "track"):
+            if name in params:
+                # ``?user=`` (empty) selects anonymous history.
+                queryset = queryset.filter(**{name: _parse_id(name, params[name])})
+        if params.get("since"):
+            since = _parse_moment(params["since"])
+            queryset = queryset.filter(**{f"{self.time_field}__gte": since})
+        if params.get("until"):
+            until = _parse_moment(params["until"])
+            queryset = queryset.filter(**{f"{self.time_field}__lt": until})
+        return queryset.select_related("track")
+
+    def get_serializer_class(self):
+        if self.action == "list" and self.list_serializer_class is not None:
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+
+class PlaybackViewSet(HistoryViewSet):
     queryset = Playback.objects.all()
     serializer_class = PlaybackSerializer
+    list_serializer_class = PlaybackListSerializer
 
 
-class FeedbackViewSet(viewsets.ModelViewSet):
+class FeedbackViewSet(HistoryViewSet):
     queryset = Feedback.objects.all()
     serializer_class = FeedbackSerializer
+    list_serializer_class = FeedbackListSerializer
+    time_field = "created_at"
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        action = self.request.query_params.get("action")
+        if self.action == "list" and action:
+            queryset = queryset.filter(action=action)
+        return queryset
+
+
+def stream(request, track_id, expires, signature, path):
+    """Hand a signed stream request over to Nginx via ``X-Accel-Redirect``.
+
+    Deliberately a plain Django view: no authentication, session or
+    database access, since browsers hit it again for every Range request.
+    With ``SUITUNE_SERVE_MEDIA`` the file is served from here instead.
+    """
+    if not get_signer().verify(track_id, expires, signature, path):
+        return HttpResponseForbidden()
+    if settings.SUITUNE_SERVE_MEDIA:
+        # The URL, and so the cached copy, is only valid until it expires.
+        max_age = max(expires - int(timezone.now().timestamp()), 0)
+        return serve_file(
+            request,
+            settings.SUITUNE_MEDIA_ROOT,
+            path,
+            cache_control=f"private, max-age={max_age}",
+        )
+    response = HttpResponse()
+    # Let Nginx pick the Content-Type from the file it serves.
+    del response["Content-Type"]
+    response["X-Accel-Redirect"] = settings.SUITUNE_STREAM_PREFIX + quote(path)
+    return response
+
+
+STATS_DAYS = 7
+MAX_TOP_TRACKS = 100
+
+
+@api_view(["GET"])
+def play_stats(request):
+    """Completion, skip and error rates and night share, per channel.
 
+    Answered from the hourly rollups for ``?since=``/``?until=`` (default:
+    the last 7 days), optionally for one ``?channel=``, plus the ``?top=N``
+    most played tracks from the track counters.
+    """
+    params = request.query_params
+    until = _parse_moment(params["until"]) if "until" in params else timezone.now()
+    if "since" in params:
+        since = _parse_moment(params["since"])
+    else:
+        since = until - timedelta(days=STATS_DAYS)
+    try:
+        top = min(max(int(params.get("top", 10)), 0), MAX_TOP_TRACKS)
+    except ValueError:
+        raise ValidationError({"detail": "top must be an integer"})
+    channel = params.get("channel")
+    if channel is not None:
+        channel = channel_registry.resolve(channel)
+    data = stats.summary(since, until, channel)
+    data["top_tracks"] = list(
+        Track.objects.filter(play_count__gt=0)
+        .order_by("-play_count", "id")
+        .values(
+            "id",
+            "title",
+            "artist",
+            "play_count",
+            "skip_count",
+            "complete_count",
+            "last_played_at",
+        )[:top]
+    )
+    return Response({"since": since, "until": until, **data})
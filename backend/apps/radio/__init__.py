@@ -1,5 +1,17 @@
 """radio app."""
 
+from django.conf import settings
+
+from .history import get_score_history
+from .profiles import get_user_profiles
+from .queue import get_queue_manager
 from .services import RadioService
+from .state import get_state_backend
 
-radio_service = RadioService()
+radio_service = RadioService(
+    state=get_state_backend(),
+    cooldowns=getattr(settings, "SUITUNE_RADIO_COOLDOWNS", None),
+    score_history=get_score_history(),
+    profiles=get_user_profiles(),
+)
+play_queue = get_queue_manager(radio_service)
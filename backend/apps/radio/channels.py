@@ -0,0 +1,177 @@
+"""In-process snapshot of every channel's radio configuration.
+
+Channels and their rating weights change rarely but are consulted on every
+radio request. :data:`channel_registry` holds an immutable
+:class:`ChannelSnapshot` of all of them, loaded in one query. Change signals
+mark it stale and the next reader builds a new snapshot and swaps the
+reference, so readers never see a half-built one and, once warm, lookups do
+no queries. Writes made by other processes are noticed through the shared
+catalog version (:mod:`apps.core.catalog`), checked at most every
+``check_interval`` seconds.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Iterator, Mapping, NamedTuple, Optional
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+
+from apps.core.catalog import catalog_version
+from apps.core.concurrency import in_event_loop
+
+from .cooldown import validate_cooldowns
+from .scoring import ScoringParams
+
+_NO_COOLDOWNS: Mapping[str, Mapping] = MappingProxyType({})
+
+
+class ChannelConfig(NamedTuple):
+    """Radio settings of one channel; ``id`` is ``None`` if it has no row."""
+
+    id: Optional[int]
+    name: str
+    params: ScoringParams
+    # Per-kind overrides of the service's cooldown windows.
+    cooldowns: Mapping[str, Mapping] = _NO_COOLDOWNS
+
+
+class ChannelSnapshot:
+    """Read-only view of all channels, by name and by id.
+
+    Channel names are not unique in the database; the first row wins.
+    Unknown names get the default :class:`ScoringParams`.
+    """
+
+    __slots__ = ("_by_name", "_by_id", "token")
+
+    def __init__(self, configs=(), token: Optional[str] = None) -> None:
+        by_name: Dict[str, ChannelConfig] = {}
+        by_id: Dict[int, ChannelConfig] = {}
+        for config in configs:
+            by_name.setdefault(config.name, config)
+            by_id[config.id] = config
+        self._by_name = MappingProxyType(by_name)
+        self._by_id = MappingProxyType(by_id)
+        self.token = token
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def __iter__(self) -> Iterator[ChannelConfig]:
+        return iter(self._by_id.values())
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get(self, name: str) -> ChannelConfig:
+        config = self._by_name.get(name)
+        if config is None:
+            return ChannelConfig(None, name, ScoringParams())
+        return config
+
+    def by_id(self, channel_id: int) -> Optional[ChannelConfig]:
+        return self._by_id.get(channel_id)
+
+    def resolve(self, value: str) -> str:
+        """Return the channel name for ``value``, a name or a channel id."""
+        if value not in self._by_name and value.isdigit():
+            config = self._by_id.get(int(value))
+            if config is not None:
+                return config.name
+        return value
+
+
+def _config(channel) -> ChannelConfig:
+    weight = getattr(channel, "rating_weight", None)
+    try:
+        cooldowns = validate_cooldowns(channel.cooldowns or {})
+    except ValueError:
+        # Written around model validation; fall back to the defaults.
+        cooldowns = {}
+    return ChannelConfig(
+        id=channel.pk,
+        name=channel.name,
+        params=ScoringParams(
+            positive=weight.positive if weight else 1.0,
+            negative=weight.negative if weight else 1.0,
+            artist_penalty=channel.artist_penalty,
+            freshness_days=channel.freshness_days,
+            exploration=channel.exploration,
+        ),
+        cooldowns=MappingProxyType(
+            {kind: MappingProxyType(dict(opts)) for kind, opts in cooldowns.items()}
+        ),
+    )
+
+
+class ChannelRegistry:
+    """Holds the current :class:`ChannelSnapshot` and rebuilds it when stale."""
+
+    def __init__(self, check_interval: float = 2.0) -> None:
+        self.check_interval = check_interval
+        self._snapshot: Optional[ChannelSnapshot] = None
+        self._stale = True
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    def needs_io(self) -> bool:
+        """Return whether :meth:`snapshot` may query the cache or database."""
+        return (
+            self._stale
+            or self._snapshot is None
+            or time.monotonic() - self._checked_at >= self.check_interval
+        )
+
+    def snapshot(self) -> ChannelSnapshot:
+        """Return the current snapshot, rebuilding it if it is out of date."""
+        current = self._snapshot
+        if current is not None and in_event_loop():
+            return current  # rebuilt by the next asnapshot() if out of date
+        if not self._stale and current is not None:
+            now = time.monotonic()
+            if now - self._checked_at < self.check_interval:
+                return current
+            self._checked_at = now
+            if catalog_version(max_age=0)[0] == current.token:
+                return current
+            self._stale = True
+        with self._lock:
+            if self._stale or self._snapshot is None:
+                self._snapshot = self._load()
+            return self._snapshot
+
+    def _load(self) -> ChannelSnapshot:
+        # Read the version and clear the flag first: a change committed
+        # while loading leaves the new snapshot stale rather than lost.
+        token = catalog_version()[0]
+        self._stale = False
+        self._checked_at = time.monotonic()
+        ChannelModel = apps.get_model("radio", "Channel")
+        rows = ChannelModel.objects.select_related("rating_weight").order_by("id")
+        try:
+            return ChannelSnapshot([_config(channel) for channel in rows], token)
+        except BaseException:
+            self._stale = True
+            raise
+
+    async def asnapshot(self) -> ChannelSnapshot:
+        """Async :meth:`snapshot`; a rebuild runs in a worker thread."""
+        if self.needs_io():
+            return await sync_to_async(self.snapshot)()
+        return self.snapshot()
+
+    def get(self, name: str) -> ChannelConfig:
+        return self.snapshot().get(name)
+
+    def resolve(self, value: str) -> str:
+        return self.snapshot().resolve(value)
+
+
+channel_registry = ChannelRegistry()
@@ -0,0 +1,107 @@
+"""Cooldown windows over recently played keys (track, artist, album)."""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Deque, Dict, Hashable, Iterator, List, Optional, Tuple
+
+COOLDOWN_KINDS = ("track", "artist", "album")
+COOLDOWN_OPTIONS = ("size", "seconds")
+
+
+def validate_cooldowns(config) -> Dict[str, Dict]:
+    """Check a ``{kind: {"size": n, "seconds": s}}`` mapping; raise ``ValueError``."""
+    if not isinstance(config, dict):
+        raise ValueError("Cooldowns must be an object keyed by kind.")
+    unknown = set(config) - set(COOLDOWN_KINDS)
+    if unknown:
+        raise ValueError(f"Unknown cooldown kinds: {', '.join(sorted(unknown))}")
+    for kind, options in config.items():
+        if not isinstance(options, dict) or set(options) - set(COOLDOWN_OPTIONS):
+            raise ValueError(f"{kind}: expected only {' and '.join(COOLDOWN_OPTIONS)}")
+        for name, value in options.items():
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{kind}.{name} must be a number")
+            if value < 0:
+                raise ValueError(f"{kind}.{name} must not be negative")
+            if name == "size" and value != int(value):
+                raise ValueError(f"{kind}.size must be a whole number")
+    return config
+
+
+class CooldownWindow:
+    """The last ``size`` plays and/or the plays of the last ``seconds``.
+
+    Plays are kept in a ring buffer, oldest first, with a count per key next
+    to it, so membership checks and evictions are ``O(1)``. :meth:`push` and
+    :meth:`expire` return the keys that just left the window so callers can
+    lift whatever they attached to them.
+    """
+
+    def __init__(self, size: int = 0, seconds: Optional[float] = None) -> None:
+        self.size = size
+        self.seconds = seconds or None
+        self._ring: Deque[Tuple[Hashable, float]] = deque()
+        self._counts: Dict[Hashable, int] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.size or self.seconds)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._counts
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        """Iterate over plays in the window, oldest first."""
+        return (key for key, _ in self._ring)
+
+    def keys(self) -> List[Hashable]:
+        """Return the distinct keys currently cooling down."""
+        return list(self._counts)
+
+    def _pop(self) -> Optional[Hashable]:
+        key, _ = self._ring.popleft()
+        count = self._counts[key] - 1
+        if count:
+            self._counts[key] = count
+            return None
+        del self._counts[key]
+        return key
+
+    def push(self, key: Hashable, now: float) -> Tuple[bool, List[Hashable]]:
+        """Record a play of ``key``.
+
+        Return whether ``key`` newly entered the window and the keys that
+        left it.
+        """
+        released = self.expire(now)
+        if not self:
+            return False, released
+        if self.size and len(self._ring) >= self.size:
+            left = self._pop()
+            if left is not None:
+                released.append(left)
+        self._ring.append((key, now))
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if key in released:
+            # Evicted and re-entered in the same step: nothing changes.
+            released.remove(key)
+            return False, released
+        return count == 0, released
+
+    def expire(self, now: float) -> List[Hashable]:
+        """Drop plays older than ``seconds`` and return keys that left."""
+        released: List[Hashable] = []
+        if self.seconds is None:
+            return released
+        cutoff = now - self.seconds
+        while self._ring and self._ring[0][1] <= cutoff:
+            left = self._pop()
+            if left is not None:
+                released.append(left)
+        return released
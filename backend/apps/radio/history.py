@@ -0,0 +1,188 @@
+"""Radio scores rebuilt from the feedback history.
+
+A score in ``RadioService.scores`` is the sum of
+:data:`~apps.radio.scoring.ACTION_SCORES` over the ``Feedback`` rows of its
+channel and track, so the history alone can restore scores after a restart.
+Replaying the whole table gets slower as it grows. A
+:class:`~apps.radio.models.ScoreSnapshot` therefore stores every channel's
+scores as of its ``last_feedback_id``, and :meth:`ScoreHistory.restore`
+loads the newest one and streams only the rows after it. A restore that
+replays ``snapshot_every`` rows or more writes a new snapshot, so boot time
+depends on the feedback since the last snapshot, not on all of it.
+``manage.py snapshot_scores`` takes one on demand (e.g. from cron) and
+``manage.py verify_scores`` compares one with a full replay.
+
+Rows are replayed in id order. A snapshot is ignored once
+:data:`ACTION_SCORES` change, since it was summed with other values. On
+databases where concurrent transactions may commit ids out of order, a row
+committed after a snapshot already passed its id is missing from that
+snapshot; ``verify_scores`` reports such drift.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import logging
+import math
+from collections import defaultdict
+from typing import DefaultDict, List, Optional, Tuple
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+
+from .scoring import ACTION_SCORES
+
+logger = logging.getLogger(__name__)
+
+Scores = DefaultDict[str, DefaultDict[int, float]]
+# ``(channel, track_id, snapshot score, replayed score)``
+Mismatch = Tuple[str, int, float, float]
+
+
+def new_scores() -> Scores:
+    return defaultdict(lambda: defaultdict(float))
+
+
+def scoring_key() -> str:
+    """Identify the action scores a snapshot is summed with."""
+    return json.dumps(ACTION_SCORES, sort_keys=True)
+
+
+class ScoreHistory:
+    """Restore, snapshot and verify radio scores from ``Feedback``.
+
+    ``chunk_size`` rows are fetched at a time while replaying; the newest
+    ``keep`` snapshots are kept.
+    """
+
+    def __init__(
+        self, chunk_size: int = 2000, snapshot_every: int = 10000, keep: int = 3
+    ) -> None:
+        self.chunk_size = chunk_size
+        self.snapshot_every = snapshot_every
+        self.keep = keep
+
+    def replay(
+        self, scores: Scores, after: int = 0, until: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """Add feedback with ids in ``(after, until]`` to ``scores``.
+
+        Return the id of the last row replayed (``after`` if none) and the
+        number of rows.
+        """
+        Feedback = apps.get_model("playback", "Feedback")
+        rows = Feedback.objects.filter(
+            id__gt=after, track__isnull=False, action__in=list(ACTION_SCORES)
+        )
+        if until is not None:
+            rows = rows.filter(id__lte=until)
+        last, count = after, 0
+        for last, channel, track_id, action in (
+            rows.order_by("id")
+            .values_list("id", "channel", "track_id", "action")
+            .iterator(chunk_size=self.chunk_size)
+        ):
+            scores[channel][track_id] += ACTION_SCORES[action]
+            count += 1
+        return last, count
+
+    def latest(self):
+        """Return the newest usable snapshot, or ``None``."""
+        ScoreSnapshot = apps.get_model("radio", "ScoreSnapshot")
+        return (
+            ScoreSnapshot.objects.filter(scoring=scoring_key())
+            .order_by("-last_feedback_id", "-id")
+            .first()
+        )
+
+    def current(self) -> Tuple[Scores, int, int]:
+        """Return scores, last feedback id and rows replayed past the snapshot."""
+        snapshot = self.latest()
+        if snapshot is None:
+            scores, after = new_scores(), 0
+        else:
+            scores, after = self.load(snapshot), snapshot.last_feedback_id
+        last, replayed = self.replay(scores, after)
+        return scores, last, replayed
+
+    def restore(self) -> List[Tuple[str, int, float]]:
+        """Return ``(channel, track_id, score)`` rows of the current scores."""
+        scores, last, replayed = self.current()
+        logger.info("Restored radio scores, replaying %d feedback rows", replayed)
+        if replayed >= self.snapshot_every:
+            self.save(scores, last)
+        return [
+            (channel, track_id, score)
+            for channel, tracks in scores.items()
+            for track_id, score in tracks.items()
+        ]
+
+    def snapshot(self):
+        """Store a snapshot of the scores as of the newest feedback."""
+        scores, last, _ = self.current()
+        return self.save(scores, last)
+
+    def save(self, scores: Scores, last_feedback_id: int):
+        """Store ``scores`` as of ``last_feedback_id``, pruning old snapshots."""
+        ScoreSnapshot = apps.get_model("radio", "ScoreSnapshot")
+        channels = sorted(scores)
+        codes, tracks, values = [], [], []
+        for code, channel in enumerate(channels):
+            codes.append(np.full(len(scores[channel]), code, dtype=np.uint32))
+            tracks.append(np.fromiter(scores[channel], dtype=np.int64))
+            values.append(np.fromiter(scores[channel].values(), dtype=np.float64))
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            channel=np.concatenate(codes or [np.zeros(0, np.uint32)]),
+            track=np.concatenate(tracks or [np.zeros(0, np.int64)]),
+            score=np.concatenate(values or [np.zeros(0, np.float64)]),
+        )
+        with transaction.atomic():
+            snapshot = ScoreSnapshot.objects.create(
+                last_feedback_id=last_feedback_id,
+                scoring=scoring_key(),
+                channels=channels,
+                data=buffer.getvalue(),
+            )
+            stale = ScoreSnapshot.objects.order_by(
+                "-last_feedback_id", "-id"
+            ).values_list("id", flat=True)[self.keep :]
+            ScoreSnapshot.objects.filter(id__in=list(stale)).delete()
+        return snapshot
+
+    def load(self, snapshot) -> Scores:
+        """Return the scores stored in ``snapshot``."""
+        scores = new_scores()
+        with np.load(io.BytesIO(bytes(snapshot.data))) as arrays:
+            rows = zip(
+                arrays["channel"].tolist(),
+                arrays["track"].tolist(),
+                arrays["score"].tolist(),
+            )
+            for code, track_id, score in rows:
+                scores[snapshot.channels[code]][track_id] = score
+        return scores
+
+    def verify(self, snapshot, tolerance: float = 1e-6) -> List[Mismatch]:
+        """Compare ``snapshot`` with a full replay up to its feedback id."""
+        stored = self.load(snapshot)
+        replayed = new_scores()
+        self.replay(replayed, until=snapshot.last_feedback_id)
+        mismatches = []
+        for channel in sorted(set(stored) | set(replayed)):
+            mine, theirs = stored[channel], replayed[channel]
+            for track_id in sorted(set(mine) | set(theirs)):
+                a, b = mine.get(track_id, 0.0), theirs.get(track_id, 0.0)
+                if not math.isclose(a, b, rel_tol=1e-9, abs_tol=tolerance):
+                    mismatches.append((channel, track_id, a, b))
+        return mismatches
+
+
+def get_score_history() -> Optional[ScoreHistory]:
+    """Build a :class:`ScoreHistory` from ``SUITUNE_SCORE_HISTORY``."""
+    config = getattr(settings, "SUITUNE_SCORE_HISTORY", None)
+    return None if config is None else ScoreHistory(**config)
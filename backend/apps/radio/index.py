@@ -0,0 +1,408 @@
+"""In-process track index used by the radio sampler."""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Hashable, Iterable, List, Optional
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+
+from apps.core.catalog import catalog_version
+from apps.core.concurrency import in_event_loop
+
+GROUPINGS = ("artist", "album", "duplicates")
+# Snapshot directories kept under ``SUITUNE_INDEX_PATH``.
+SNAPSHOTS_KEPT = 3
+
+
+class FenwickTree:
+    """Prefix-sum tree over non-negative float weights.
+
+    Point updates and weighted sampling are ``O(log n)``.
+    """
+
+    def __init__(self, weights: Iterable[float] = ()) -> None:
+        values = array("d", weights)
+        self.size = len(values)
+        self.values = values
+        self.tree = array("d", [0.0]) * (self.size + 1)
+        tree = self.tree
+        for i, value in enumerate(values, start=1):
+            tree[i] += value
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self._top = 1 << self.size.bit_length() if self.size else 0
+
+    @classmethod
+    def from_array(cls, weights: np.ndarray) -> "FenwickTree":
+        """Build a tree from a NumPy vector in one vectorised pass."""
+        weights = np.ascontiguousarray(weights, dtype=np.float64)
+        size = len(weights)
+        prefix = np.concatenate(([0.0], np.cumsum(weights)))
+        idx = np.arange(1, size + 1)
+        tree = np.zeros(size + 1)
+        tree[1:] = prefix[idx] - prefix[idx - (idx & -idx)]
+        self = cls.__new__(cls)
+        self.size = size
+        self.values = array("d", weights.tobytes())
+        self.tree = array("d", tree.tobytes())
+        self._top = 1 << size.bit_length() if size else 0
+        return self
+
+    def total(self) -> float:
+        return self.prefix(self.size)
+
+    def prefix(self, count: int) -> float:
+        """Return the sum of the first ``count`` weights."""
+        total = 0.0
+        tree = self.tree
+        while count > 0:
+            total += tree[count]
+            count -= count & -count
+        return total
+
+    def set(self, pos: int, weight: float) -> None:
+        """Set the weight stored at ``pos``."""
+        delta = weight - self.values[pos]
+        if not delta:
+            return
+        self.values[pos] = weight
+        i = pos + 1
+        tree = self.tree
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+
+    def find(self, target: float) -> int:
+        """Return the position whose cumulative range contains ``target``."""
+        pos = 0
+        step = self._top
+        tree = self.tree
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and tree[nxt] <= target:
+                pos = nxt
+                target -= tree[nxt]
+            step >>= 1
+        # Float drift can push ``target`` onto the total; step back to the
+        # last slot that actually carries weight.
+        pos = min(pos, self.size - 1)
+        while pos > 0 and self.values[pos] <= 0:
+            pos -= 1
+        return pos
+
+
+class Grouping:
+    """Tracks grouped by a normalised key (artist name, artist/album pair).
+
+    Code ``0`` stands for the empty value and is never treated as a group.
+    """
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        names: List[Hashable],
+        order: Optional[np.ndarray] = None,
+        bounds: Optional[np.ndarray] = None,
+    ) -> None:
+        self.codes = codes
+        self.names = names
+        self.lookup = {name: code for code, name in enumerate(names)}
+        if order is None:
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+        self._order = order
+        self._bounds = bounds
+
+    @classmethod
+    def empty(cls) -> "Grouping":
+        return cls(np.zeros(0, dtype=np.int32), [""])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def name(self, pos: int) -> Hashable:
+        return self.names[self.codes[pos]]
+
+    def positions(self, code: int) -> np.ndarray:
+        """Return the positions of all tracks in group ``code``."""
+        return self._order[self._bounds[code] : self._bounds[code + 1]]
+
+    def positions_of(self, name: Hashable) -> np.ndarray:
+        code = self.lookup.get(name, 0)
+        return self.positions(code) if code else self._order[:0]
+
+
+class TrackIndex:
+    """Compact, lazily built arrays of track ids and scoring features.
+
+    The index is marked stale by ``Track`` signals (see ``apps.radio.signals``)
+    and rebuilt with a single ``values_list`` query on next access. Artist
+    and album names are case-folded and stored as integer codes.
+
+    ``duplicates`` groups copies of one recording under the id of the best
+    copy (see :mod:`apps.library.duplicates`); the other copies, and tracks
+    whose file is missing, are ``hidden`` and never sampled.
+
+    With a ``path`` (``SUITUNE_INDEX_PATH``) every build is saved there
+    under its catalog version and memory-mapped read-only, and processes
+    that find the snapshot for the current version map it instead of
+    querying. Pre-forked workers (see :mod:`apps.radio.prefork`) and any
+    process on the host thus share one copy of the arrays in the page cache.
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = 2.0) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self.token: Optional[str] = None
+        self._checked_at = 0.0
+        self.ids = array("q")
+        self.artist = Grouping.empty()
+        self.album = Grouping.empty()
+        self.duplicates = Grouping.empty()
+        self.hidden = np.zeros(0, dtype=bool)
+        self.added_at = np.zeros(0, dtype=np.float64)
+        self.version = 0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    def needs_io(self) -> bool:
+        """Return whether :meth:`ensure` may query the cache or database."""
+        return self._stale or (
+            self.token is not None
+            and time.monotonic() - self._checked_at >= self.check_interval
+        )
+
+    def ensure(self) -> bool:
+        """Rebuild the index if stale. Return ``True`` when it was rebuilt.
+
+        An index built by this method also goes stale when the catalog
+        version changes, so scans and edits made by other processes are
+        picked up within ``check_interval`` seconds. On the event loop a built
+        index is used as it is until a worker thread ensures it again.
+        """
+        if self.token is not None and in_event_loop():
+            return False
+        if not self._stale:
+            if not self.needs_io():
+                return False
+            self._checked_at = time.monotonic()
+            if catalog_version(max_age=0)[0] == self.token:
+                return False
+            self._stale = True
+        with self._lock:
+            if not self._stale:
+                return False
+            # Read the version first: a change committed meanwhile bumps it
+            # again and leaves this build stale rather than lost.
+            token = catalog_version()[0]
+            self._stale = False
+            self._checked_at = time.monotonic()
+            try:
+                if self.path:
+                    self._ensure_shared(token)
+                else:
+                    self._build()
+            except BaseException:
+                self._stale = True
+                raise
+            self.token = token
+            return True
+
+    def _build(self) -> None:
+        TrackModel = apps.get_model("library", "Track")
+        rows = TrackModel.objects.order_by("id").values_list(
+            "id", "artist", "album", "created_at", "duplicate_of_id", "missing_since"
+        )
+        ids = array("q")
+        duplicate_of = array("q")
+        missing = array("b")
+        added_at = array("d")
+        artist_codes = array("i")
+        album_codes = array("i")
+        artists = {"": 0}
+        albums = {"": 0}
+        for track_id, artist, album, created_at, original, gone in rows.iterator(
+            chunk_size=5000
+        ):
+            ids.append(track_id)
+            duplicate_of.append(original or 0)
+            missing.append(gone is not None)
+            added_at.append(created_at.timestamp())
+            artist = artist.casefold()
+            artist_codes.append(artists.setdefault(artist, len(artists)))
+            # Albums are per artist: every "Greatest Hits" is a different one.
+            album = (artist, album.casefold()) if album else ""
+            album_codes.append(albums.setdefault(album, len(albums)))
+        self._load(
+            ids,
+            added_at,
+            Grouping(np.array(artist_codes, dtype=np.int32), list(artists)),
+            Grouping(np.array(album_codes, dtype=np.int32), list(albums)),
+            np.array(duplicate_of, dtype=np.int64),
+            np.array(missing, dtype=bool),
+        )
+
+    def _ensure_shared(self, token: str) -> None:
+        """Map the snapshot of ``token`` under ``path``, building it if missing.
+
+        One process builds a snapshot (under an exclusive file lock) and the
+        others map what it wrote instead of querying the database.
+        """
+        root = Path(self.path)
+        root.mkdir(parents=True, exist_ok=True)
+        if self._map(root / token):
+            return
+        with open(root / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self._map(root / token):
+                return
+            self._build()
+            self.save(root / token)
+            self._map(root / token)
+        # Recent snapshots stay for processes about to map them; files
+        # already mapped survive their removal anyway.
+        snapshots = [d for d in root.iterdir() if not d.name.startswith(".")]
+        snapshots.sort(key=lambda d: d.stat().st_mtime)
+        for old in snapshots[:-SNAPSHOTS_KEPT]:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def save(self, directory) -> None:
+        """Write the index to ``directory`` as ``.npy`` arrays plus names."""
+        directory = Path(directory)
+        tmp = directory.with_name(f".{directory.name}.{os.getpid()}")
+        tmp.mkdir(parents=True)
+        arrays = {
+            "ids": np.frombuffer(self.ids, dtype=np.int64),
+            "added_at": self.added_at,
+            "hidden": self.hidden,
+        }
+        names = {}
+        for kind in GROUPINGS:
+            grouping = getattr(self, kind)
+            arrays[f"{kind}_codes"] = grouping.codes
+            arrays[f"{kind}_order"] = grouping._order
+            arrays[f"{kind}_bounds"] = grouping._bounds
+            names[kind] = grouping.names
+        for name, values in arrays.items():
+            np.save(tmp / f"{name}.npy", values)
+        (tmp / "names.json").write_text(json.dumps(names))
+        try:
+            os.rename(tmp, directory)
+        except OSError:  # another process saved it first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _map(self, directory: Path) -> bool:
+        """Load a saved index with its arrays memory-mapped read-only."""
+        try:
+            names = json.loads((directory / "names.json").read_text())
+            arrays = {
+                path.stem: np.load(path, mmap_mode="r")
+                for path in directory.glob("*.npy")
+            }
+        except (OSError, ValueError):
+            return False
+        groupings = {
+            kind: Grouping(
+                arrays[f"{kind}_codes"],
+                [tuple(n) if isinstance(n, list) else n for n in names[kind]],
+                arrays[f"{kind}_order"],
+                arrays[f"{kind}_bounds"],
+            )
+            for kind in GROUPINGS
+        }
+        ids = arrays["ids"]
+        self._install(
+            memoryview(ids).cast("B").cast("q") if len(ids) else array("q"),
+            arrays["added_at"],
+            arrays["hidden"],
+            **groupings,
+        )
+        return True
+
+    def _load(
+        self,
+        ids: array,
+        added_at,
+        artist: Grouping,
+        album: Grouping,
+        duplicate_of: Optional[np.ndarray] = None,
+        missing: Optional[np.ndarray] = None,
+    ) -> None:
+        if duplicate_of is None:
+            duplicate_of = np.zeros(len(ids), dtype=np.int64)
+        hidden = duplicate_of > 0
+        if missing is not None:
+            hidden |= missing
+        self._install(
+            ids,
+            np.array(added_at, dtype=np.float64),
+            hidden,
+            artist,
+            album,
+            self._group_duplicates(ids, duplicate_of),
+        )
+
+    def _install(self, ids, added_at, hidden, artist, album, duplicates) -> None:
+        self.ids = ids
+        self.added_at = added_at
+        self.hidden = hidden
+        self.artist = artist
+        self.album = album
+        self.duplicates = duplicates
+        self.version += 1
+
+    @staticmethod
+    def _group_duplicates(ids: array, duplicate_of: np.ndarray) -> Grouping:
+        """Group tracks by the copy they duplicate, or by their own id."""
+        original = np.where(duplicate_of > 0, duplicate_of, np.asarray(ids))
+        keys, inverse, counts = np.unique(
+            original, return_inverse=True, return_counts=True
+        )
+        shared = counts > 1
+        codes = np.zeros(len(keys), dtype=np.int32)
+        codes[shared] = np.arange(1, shared.sum() + 1)
+        return Grouping(codes[inverse], [""] + keys[shared].tolist())
+
+    def original(self, track_id: int, pos: Optional[int] = None) -> int:
+        """Return the id of the best copy of ``track_id`` (itself if unique)."""
+        if pos is None:
+            pos = self.position(track_id)
+        if pos is None or not self.duplicates.codes[pos]:
+            return track_id
+        return self.duplicates.name(pos)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def position(self, track_id: int) -> Optional[int]:
+        # ``ids`` is sorted; a bisection needs no per-worker lookup table.
+        pos = bisect_left(self.ids, track_id)
+        if pos < len(self.ids) and self.ids[pos] == track_id:
+            return pos
+        return None
+
+    def positions(self, track_ids: np.ndarray) -> np.ndarray:
+        """Vectorised :meth:`position`, with ``-1`` for unknown ids."""
+        ids = np.frombuffer(self.ids, dtype=np.int64)
+        if not len(ids):
+            return np.full(len(track_ids), -1, dtype=np.intp)
+        pos = np.minimum(np.searchsorted(ids, track_ids), len(ids) - 1)
+        return np.where(ids[pos] == track_ids, pos, -1)
+
+
+track_index = TrackIndex(path=getattr(settings, "SUITUNE_INDEX_PATH", None) or None)
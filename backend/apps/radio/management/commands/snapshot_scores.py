@@ -0,0 +1,20 @@
+"""Store a snapshot of the radio scores rebuilt from feedback."""
+
+from django.core.management.base import BaseCommand
+
+from apps.radio.history import ScoreHistory, get_score_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot every channel's radio scores as of the newest Feedback row, "
+        "so restarts only replay feedback given after it."
+    )
+
+    def handle(self, *args, **options):
+        snapshot = (get_score_history() or ScoreHistory()).snapshot()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stored scores up to feedback {snapshot.last_feedback_id}."
+            )
+        )
@@ -0,0 +1,47 @@
+"""Check a score snapshot against a full replay of the feedback history."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.radio.history import ScoreHistory, get_score_history
+from apps.radio.models import ScoreSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay all Feedback up to a snapshot's high-water mark and report "
+        "scores that differ from the snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--snapshot", type=int, help="Snapshot id (default: the newest)."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=1e-6,
+            help="Largest absolute difference still counted as equal.",
+        )
+
+    def handle(self, *args, **options):
+        history = get_score_history() or ScoreHistory()
+        if options["snapshot"] is None:
+            snapshot = history.latest()
+        else:
+            snapshot = ScoreSnapshot.objects.filter(pk=options["snapshot"]).first()
+        if snapshot is None:
+            raise CommandError("No score snapshot to verify.")
+        mismatches = history.verify(snapshot, options["tolerance"])
+        for channel, track_id, stored, replayed in mismatches:
+            self.stdout.write(f"{channel or '-'} {track_id}: {stored} != {replayed}")
+        if mismatches:
+            raise CommandError(
+                f"Snapshot {snapshot.pk} differs from the replay for "
+                f"{len(mismatches)} scores."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Snapshot {snapshot.pk} matches the replay up to feedback "
+                f"{snapshot.last_feedback_id}."
+            )
+        )
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("radio", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlayEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("channel", models.CharField(max_length=255)),
+                ("track_id", models.BigIntegerField()),
+                ("origin", models.CharField(max_length=32)),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ScoreEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("channel", models.CharField(max_length=255)),
+                ("track_id", models.BigIntegerField()),
+                ("score", models.FloatField(default=0.0)),
+                ("updated_at", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("channel", "track_id"), name="radio_score_channel_track"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:32
+
+import apps.radio.models
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("radio", "0002_state_backend"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="channel",
+            name="artist_penalty",
+            field=models.FloatField(
+                default=0.2, help_text="Score lost per recent play of the same artist."
+            ),
+        ),
+        migrations.AddField(
+            model_name="channel",
+            name="cooldowns",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text=(
+                    "Per-kind overrides of SUITUNE_RADIO_COOLDOWNS, "
+                    'e.g. {"artist": {"size": 5}}.'
+                ),
+                validators=[apps.radio.models.validate_channel_cooldowns],
+            ),
+        ),
+        migrations.AddField(
+            model_name="channel",
+            name="exploration",
+            field=models.FloatField(
+                default=0.3,
+                help_text="Chance of drawing from tracks without positive feedback.",
+                validators=[
+                    django.core.validators.MinValueValidator(0.0),
+                    django.core.validators.MaxValueValidator(1.0),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="channel",
+            name="freshness_days",
+            field=models.FloatField(
+                default=30.0,
+                help_text="Decay time of the new-track bonus, in days.",
+                validators=[django.core.validators.MinValueValidator(0.01)],
+            ),
+        ),
+    ]
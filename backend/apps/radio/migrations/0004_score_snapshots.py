@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("radio", "0003_channel_settings"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScoreSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_feedback_id", models.BigIntegerField()),
+                (
+                    "scoring",
+                    models.CharField(
+                        help_text="Action scores the snapshot was summed with.",
+                        max_length=255,
+                    ),
+                ),
+                ("channels", models.JSONField(default=list)),
+                ("data", models.BinaryField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["scoring", "last_feedback_id"],
+                        name="radio_snapshot_latest",
+                    )
+                ],
+            },
+        ),
+    ]
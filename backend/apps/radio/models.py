@@ -1,6 +1,18 @@
 """Data models for radio."""
 
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
+
+from .cooldown import validate_cooldowns
+
+
+def validate_channel_cooldowns(value) -> None:
+    try:
+        validate_cooldowns(value)
+    except ValueError as exc:
+        raise ValidationError(str(exc))
 
 
 class Channel(models.Model):
@@ -8,6 +20,28 @@ class Channel(models.Model):
 
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
+    exploration = models.FloatField(
+        default=0.3,
+        validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        help_text="Chance of drawing from tracks without positive feedback.",
+    )
+    artist_penalty = models.FloatField(
+        default=0.2, help_text="Score lost per recent play of the same artist."
+    )
+    freshness_days = models.FloatField(
+        default=30.0,
+        validators=[MinValueValidator(0.01)],
+        help_text="Decay time of the new-track bonus, in days.",
+    )
+    cooldowns = models.JSONField(
+        default=dict,
+        blank=True,
+        validators=[validate_channel_cooldowns],
+        help_text=(
+            "Per-kind overrides of SUITUNE_RADIO_COOLDOWNS, "
+            'e.g. {"artist": {"size": 5}}.'
+        ),
+    )
 
     class Meta:
         ordering = ["id"]
@@ -32,3 +66,52 @@ class RatingWeight(models.Model):
         """Return the weighted rating value."""
         return rating * (self.positive if rating > 0 else self.negative)
 
+
+class ScoreEntry(models.Model):
+    """Shared radio score of a track on a channel (see ``apps.radio.state``)."""
+
+    channel = models.CharField(max_length=255)
+    track_id = models.BigIntegerField()
+    score = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["channel", "track_id"], name="radio_score_channel_track"
+            )
+        ]
+
+
+class PlayEntry(models.Model):
+    """A track picked by some worker, shared so cooldowns agree."""
+
+    channel = models.CharField(max_length=255)
+    track_id = models.BigIntegerField()
+    origin = models.CharField(max_length=32)
+
+    class Meta:
+        ordering = ["id"]
+
+
+class ScoreSnapshot(models.Model):
+    """Every channel's radio scores as of one feedback row (``apps.radio.history``)."""
+
+    last_feedback_id = models.BigIntegerField()
+    scoring = models.CharField(
+        max_length=255, help_text="Action scores the snapshot was summed with."
+    )
+    channels = models.JSONField(default=list)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["scoring", "last_feedback_id"], name="radio_snapshot_latest"
+            )
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - simple repr
+        return f"Scores up to feedback {self.last_feedback_id}"
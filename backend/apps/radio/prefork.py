@@ -0,0 +1,45 @@
+"""Warm start for pre-forking servers (gunicorn ``preload_app``).
+
+:func:`warm_start` runs in the master once the application is loaded: it
+builds the track index, the similarity matrix and the channel snapshot,
+restores radio scores (:mod:`apps.radio.history`) and loads the track
+search index (:mod:`apps.library.search`), so workers are forked with them
+in memory instead of each querying for them on its first request. The
+index and the similarity matrix are memory-mapped from
+``SUITUNE_INDEX_PATH`` and ``SUITUNE_SIMILARITY_PATH`` when set, which
+keeps them shared page cache for the whole life of the workers, including
+across library changes; the remaining objects are moved out of the garbage
+collector's reach so collections in the workers do not copy their pages.
+
+:func:`after_fork` then gives each worker what must not be shared.
+"""
+
+import gc
+
+from django.core.cache import caches
+from django.db import connections
+
+from apps.library.search import track_search
+
+from . import radio_service
+from .channels import channel_registry
+
+
+def warm_start() -> None:
+    """Build the shared read-mostly radio structures in the master."""
+    radio_service.index.ensure()
+    radio_service.similarity.ensure()
+    channel_registry.snapshot()
+    radio_service.load_state()
+    track_search().ensure()
+    # Sockets must not be shared with the workers; they reconnect lazily.
+    connections.close_all()
+    caches.close_all()
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork() -> None:
+    """Reset per-process state inherited from the master."""
+    radio_service.rng.seed()
+    radio_service.state.forked()
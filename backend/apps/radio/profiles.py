@@ -0,0 +1,212 @@
+"""Per-listener radio scores kept next to the channel-wide ones.
+
+``RadioService.scores`` sums everybody's feedback on a channel. A listener
+who is signed in also gets a :class:`SparseScores` profile per channel with
+only their own feedback: two sorted arrays of track ids and scores, so it
+costs 16 bytes per rated track and nothing for the rest of the library.
+
+Profiles are loaded from ``Feedback`` on first use, aggregated in SQL, and
+kept in an LRU bounded by ``max_bytes``; the least recently used ones are
+evicted and loaded again when their listener comes back. Feedback given
+meanwhile is added to a cached profile directly. Other workers see it
+once their copy is ``max_age`` seconds old. A (re)load also counts the
+events still waiting in this process's write-behind
+:data:`~apps.playback.ingest.feedback_buffer`.
+
+When sampling for a listener, the score of every track they rated is
+blended from both profiles::
+
+    (1 - share) * channel + share * personal,  share = rated / (rated + cold_start)
+
+Tracks they never rated keep the channel score. Newcomers therefore hear the
+channel-wide taste and drift towards their own as they rate more.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Count
+
+from apps.core.concurrency import in_event_loop
+
+from .scoring import ACTION_SCORES
+
+# Bytes charged per profile on top of its arrays (objects, LRU entry).
+PROFILE_OVERHEAD = 400
+
+ProfileKey = Tuple[int, str]
+
+
+class SparseScores:
+    """Scores of the tracks one listener rated, as sorted id/value arrays."""
+
+    __slots__ = ("ids", "values", "loaded_at")
+
+    def __init__(
+        self, ids: Optional[np.ndarray] = None, values: Optional[np.ndarray] = None
+    ) -> None:
+        self.ids = np.zeros(0, dtype=np.int64) if ids is None else ids
+        self.values = np.zeros(0, dtype=np.float64) if values is None else values
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def from_pairs(cls, track_ids, scores) -> "SparseScores":
+        """Build a profile from ``(track_id, delta)`` pairs, summing repeats."""
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        ids, inverse = np.unique(track_ids, return_inverse=True)
+        values = np.zeros(len(ids), dtype=np.float64)
+        np.add.at(values, inverse, np.asarray(scores, dtype=np.float64))
+        return cls(ids, values)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.values.nbytes + PROFILE_OVERHEAD
+
+    def get(self, track_id: int, default: Optional[float] = 0.0) -> Optional[float]:
+        i = int(np.searchsorted(self.ids, track_id))
+        if i < len(self.ids) and self.ids[i] == track_id:
+            return float(self.values[i])
+        return default
+
+    def add(self, track_id: int, delta: float) -> float:
+        """Add ``delta`` to ``track_id``'s score and return the new score."""
+        i = int(np.searchsorted(self.ids, track_id))
+        if i < len(self.ids) and self.ids[i] == track_id:
+            self.values[i] += delta
+        else:
+            self.ids = np.insert(self.ids, i, track_id)
+            self.values = np.insert(self.values, i, delta)
+        return float(self.values[i])
+
+
+class UserProfiles:
+    """LRU of :class:`SparseScores` keyed by ``(user_id, channel)``."""
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 2**20,
+        cold_start: float = 10.0,
+        max_age: float = 300.0,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.cold_start = cold_start
+        self.max_age = max_age
+        self.nbytes = 0
+        self._profiles: "OrderedDict[ProfileKey, SparseScores]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def cached(self, user_id: int, channel: str) -> bool:
+        """Return whether the profile can be used without a query."""
+        profile = self._profiles.get((user_id, channel))
+        return (
+            profile is not None and time.monotonic() - profile.loaded_at < self.max_age
+        )
+
+    def get(self, user_id: int, channel: str) -> SparseScores:
+        """Return the listener's profile, loading it if needed.
+
+        On the event loop nothing is loaded: an outdated profile is returned
+        as it is, and an unknown listener gets an empty one for now.
+        """
+        key = (user_id, channel)
+        with self._lock:
+            if self.cached(user_id, channel) or (
+                key in self._profiles and in_event_loop()
+            ):
+                self._profiles.move_to_end(key)
+                return self._profiles[key]
+        if in_event_loop():
+            return SparseScores()
+        # Query without the lock; a concurrent load of the same key just wins.
+        profile = self._load(user_id, channel)
+        with self._lock:
+            self._discard(key)
+            self._profiles[key] = profile
+            self.nbytes += profile.nbytes
+            self._evict()
+            return profile
+
+    def add(self, user_id: int, channel: str, track_id: int, delta: float) -> None:
+        """Apply a score change from feedback the listener just gave.
+
+        Only a profile in memory is changed; one loaded later finds the
+        feedback in the database or the write-behind buffer.
+        """
+        with self._lock:
+            profile = self._profiles.get((user_id, channel))
+            if profile is None:
+                return
+            before = profile.nbytes
+            profile.add(track_id, delta)
+            self.nbytes += profile.nbytes - before
+            self._evict()
+
+    def share(self, profile: SparseScores) -> float:
+        """Return how much of a blended score comes from ``profile``."""
+        rated = len(profile)
+        return rated / (rated + self.cold_start) if rated else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+            self.nbytes = 0
+
+    def _discard(self, key: ProfileKey) -> None:
+        profile = self._profiles.pop(key, None)
+        if profile is not None:
+            self.nbytes -= profile.nbytes
+
+    def _evict(self) -> None:
+        # The newest profile stays even if it alone exceeds the cap.
+        while self.nbytes > self.max_bytes and len(self._profiles) > 1:
+            _, profile = self._profiles.popitem(last=False)
+            self.nbytes -= profile.nbytes
+
+    def _load(self, user_id: int, channel: str) -> SparseScores:
+        from apps.playback.ingest import feedback_buffer
+
+        Feedback = apps.get_model("playback", "Feedback")
+        # No batch may be committed between the query and the pending events,
+        # or it would be counted twice (or not at all).
+        with feedback_buffer.settled():
+            rows = list(
+                Feedback.objects.filter(
+                    user_id=user_id,
+                    channel=channel,
+                    track__isnull=False,
+                    action__in=list(ACTION_SCORES),
+                )
+                .values_list("track_id", "action")
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+            pending = feedback_buffer.pending()
+        rows += [
+            (e.track_id, e.action, 1)
+            for e in pending
+            if e.user_id == user_id
+            and e.channel == channel
+            and e.action in ACTION_SCORES
+        ]
+        return SparseScores.from_pairs(
+            [track_id for track_id, _, _ in rows],
+            [ACTION_SCORES[action] * count for _, action, count in rows],
+        )
+
+
+def get_user_profiles() -> UserProfiles:
+    """Build :class:`UserProfiles` from ``SUITUNE_RADIO_PROFILES``."""
+    return UserProfiles(**getattr(settings, "SUITUNE_RADIO_PROFILES", {}))
@@ -0,0 +1,178 @@
+"""Lookahead play queues filled ahead of the listener."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Deque, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from apps.core.concurrency import call_unblocked
+
+from .services import RadioService
+
+# ``(channel, session, seed, user)``: seeded listening gets a queue of its
+# own, and so does every signed-in listener sharing a session key.
+QueueKey = Tuple[str, str, Optional[int], Optional[int]]
+
+
+class PlayQueue:
+    """Pre-sampled track ids waiting to be handed out for one listener."""
+
+    def __init__(self) -> None:
+        self.items: Deque[int] = deque()
+        self.refilling = False
+
+
+class QueueManager:
+    """Keep per-channel/per-session queues topped up off the request path.
+
+    Queued ids are only *reserved*: a track goes on cooldown when it is
+    handed out, and every queued id is re-checked with
+    :meth:`RadioService.is_eligible` at that point, so plays from other
+    sessions and negative feedback still apply to what was queued earlier.
+    """
+
+    def __init__(
+        self,
+        service: RadioService,
+        size: int = 10,
+        low_water: int = 5,
+        max_queues: int = 1000,
+        executor: Optional[Executor] = None,
+        background: bool = True,
+    ) -> None:
+        self.service = service
+        self.size = size
+        self.low_water = low_water
+        self.max_queues = max_queues
+        self.background = background
+        self._executor = executor
+        self._queues: "OrderedDict[QueueKey, PlayQueue]" = OrderedDict()
+        # Re-entrant so async callers can hold it around take().
+        self._lock = threading.RLock()
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="suitune-queue"
+            )
+        return self._executor
+
+    def _queue(self, key: QueueKey) -> PlayQueue:
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = PlayQueue()
+            if len(self._queues) > self.max_queues:
+                self._queues.popitem(last=False)
+        else:
+            self._queues.move_to_end(key)
+        return queue
+
+    def take(
+        self,
+        channel: str,
+        session: str = "",
+        count: int = 1,
+        seed: Optional[int] = None,
+        user: Optional[int] = None,
+    ) -> List[int]:
+        """Hand out up to ``count`` track ids and schedule a refill.
+
+        With a ``seed`` track the queue leans towards tracks like it; with a
+        ``user`` id it follows that listener's taste.
+        """
+        key = (channel, session, seed, user)
+        taken: List[int] = []
+        with self._lock:
+            queue = self._queue(key)
+            while len(taken) < count:
+                if not queue.items:
+                    # Cold start or drained faster than the refill: fill inline.
+                    queue.items.extend(
+                        self.service.reserve(
+                            channel, self.size, exclude=taken, seed=seed, user=user
+                        )
+                    )
+                    if not queue.items:
+                        break
+                track_id = queue.items.popleft()
+                if self.service.is_eligible(channel, track_id, user):
+                    self.service.mark_played(channel, track_id)
+                    taken.append(track_id)
+            needs_refill = len(queue.items) < self.low_water and not queue.refilling
+            if needs_refill:
+                queue.refilling = True
+        if needs_refill:
+            if self.background:
+                self.executor.submit(self._refill, key)
+            else:
+                self._refill(key)
+        return taken
+
+    async def atake(
+        self,
+        channel: str,
+        session: str = "",
+        count: int = 1,
+        seed: Optional[int] = None,
+        user: Optional[int] = None,
+    ) -> List[int]:
+        """:meth:`take` for async views; never blocks the event loop."""
+        await self.service.aprepare(channel, seed, user)
+        taken = await call_unblocked(
+            (self._lock, self.service._lock),
+            self.take,
+            channel,
+            session,
+            count,
+            seed,
+            user,
+        )
+        await self.service.state.aflush()
+        return taken
+
+    def _refill(self, key: QueueKey) -> None:
+        channel, _, seed, user = key
+        queue = None
+        try:
+            with self._lock:
+                queue = self._queues.get(key)
+                if queue is None:
+                    return
+                pending = list(queue.items)
+            fresh = self.service.reserve(
+                channel,
+                self.size - len(pending),
+                exclude=pending,
+                seed=seed,
+                user=user,
+            )
+            with self._lock:
+                queue.items.extend(t for t in fresh if t not in queue.items)
+        finally:
+            if queue is not None:
+                queue.refilling = False
+            if self.background:
+                close_old_connections()
+
+    def discard(self, channel: str, track_id: int) -> None:
+        """Drop ``track_id`` from every queue of ``channel``."""
+        with self._lock:
+            for (queued_channel, *_), queue in self._queues.items():
+                if queued_channel == channel and track_id in queue.items:
+                    queue.items.remove(track_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._queues.clear()
+
+
+def get_queue_manager(service: RadioService) -> QueueManager:
+    """Build a :class:`QueueManager` from ``SUITUNE_RADIO_QUEUE``."""
+    options = getattr(settings, "SUITUNE_RADIO_QUEUE", {})
+    return QueueManager(service, **options)
@@ -0,0 +1,213 @@
+"""Vectorised radio scoring (README §8).
+
+Every indexed track gets a weight
+
+    softplus(rated(score - artist_penalty * recent_artist_plays) + freshness)
+
+where ``score`` sums the listener's feedback (like +1, complete +0.5,
+skip -0.7), ``rated`` applies the channel's :class:`RatingWeight`
+multipliers and ``freshness = exp(-days_since_added / 30)``. Softplus keeps
+weights positive, decays exponentially for disliked tracks and grows only
+linearly for favourites, so one much-liked track cannot drown out the rest.
+
+Tracks with a positive score form the *familiar* pool and the rest the
+*fresh* pool; each pool has its own :class:`FenwickTree` and
+``exploration`` is the chance of drawing from the fresh one.
+
+Weights for a whole channel are computed in one NumPy pass; feedback and
+plays then only touch the affected positions.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .index import FenwickTree, TrackIndex
+
+# A ban is a score so low that its weight underflows to exactly zero.
+BAN_SCORE = -1e6
+
+ACTION_SCORES = {
+    "like": 1.0,
+    "complete": 0.5,
+    "skip": -0.7,
+    "ban": BAN_SCORE,
+}
+
+SECONDS_PER_DAY = 86400.0
+SOFTPLUS_LINEAR = 30.0
+# Point updates leave rounding residue in tree totals; anything below this
+# means every weight is zero.
+EMPTY_TOTAL = 1e-9
+
+
+class ScoringParams(NamedTuple):
+    positive: float = 1.0
+    negative: float = 1.0
+    artist_penalty: float = 0.2
+    freshness_days: float = 30.0
+    exploration: float = 0.3
+
+
+class ChannelWeights:
+    """Sampling weights of every indexed track on one channel.
+
+    ``blocked`` counts the reasons (cooldown windows, reservation, being a
+    hidden duplicate) a position may not be sampled; a blocked track keeps
+    its computed weight out of both trees.
+    """
+
+    def __init__(
+        self,
+        index: TrackIndex,
+        params: ScoringParams,
+        scores: Dict[int, float],
+        recent: Iterable[int] = (),
+        now: Optional[float] = None,
+    ) -> None:
+        self.index = index
+        self.version = index.version
+        self.params = params
+        size = len(index)
+        self.score = np.zeros(size)
+        for track_id, score in scores.items():
+            pos = index.position(track_id)
+            if pos is not None:
+                self.score[pos] = score
+        self.blocked = index.hidden.astype(np.int32)
+        self.artist_recent = np.zeros(len(index.artist))
+        for track_id in recent:
+            pos = index.position(track_id)
+            if pos is not None:
+                self.artist_recent[index.artist.codes[pos]] += 1
+        self.artist_recent[0] = 0
+        self.rebuild(now)
+
+    def rebuild(self, now: Optional[float] = None) -> None:
+        """Recompute freshness and every weight, then rebuild both trees."""
+        self.built_at = time.time() if now is None else now
+        age_days = (self.built_at - self.index.added_at) / SECONDS_PER_DAY
+        self.freshness = np.exp(-np.maximum(age_days, 0.0) / self.params.freshness_days)
+        weights, familiar = self.compute()
+        weights[self.blocked > 0] = 0.0
+        self.familiar = FenwickTree.from_array(np.where(familiar, weights, 0.0))
+        self.fresh = FenwickTree.from_array(np.where(familiar, 0.0, weights))
+
+    def compute(
+        self, positions: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return unmasked weights and familiarity for ``positions`` (default: all)."""
+        p = self.params
+        if positions is None:
+            score, codes, freshness = (
+                self.score,
+                self.index.artist.codes,
+                self.freshness,
+            )
+        else:
+            score = self.score[positions]
+            codes = self.index.artist.codes[positions]
+            freshness = self.freshness[positions]
+        x = np.take(self.artist_recent, codes)
+        x *= -p.artist_penalty
+        x += score
+        # RatingWeight.apply, vectorised: scale gains and losses separately.
+        gains = np.maximum(x, 0.0)
+        np.minimum(x, 0.0, out=x)
+        x *= p.negative
+        gains *= p.positive
+        x += gains
+        x += freshness
+        # softplus(x) = log(1 + e^x), switching to the identity where e^x
+        # would overflow.
+        linear = np.maximum(x, SOFTPLUS_LINEAR)
+        linear -= SOFTPLUS_LINEAR
+        np.minimum(x, SOFTPLUS_LINEAR, out=x)
+        np.exp(x, out=x)
+        np.log1p(x, out=x)
+        x += linear
+        return x, score > 0
+
+    def refresh(self, positions: Iterable[int]) -> None:
+        """Recompute and store the weights of ``positions``."""
+        positions = np.fromiter(positions, dtype=np.intp)
+        if not len(positions):
+            return
+        weights, familiar = self.compute(positions)
+        for pos, weight, is_familiar, blocked in zip(
+            positions.tolist(),
+            weights.tolist(),
+            familiar.tolist(),
+            self.blocked[positions].tolist(),
+        ):
+            if blocked:
+                weight = 0.0
+            self.familiar.set(pos, weight if is_familiar else 0.0)
+            self.fresh.set(pos, 0.0 if is_familiar else weight)
+
+    def set_score(self, pos: int, score: float) -> None:
+        self.score[pos] = score
+        self.refresh((pos,))
+
+    def set_scores(self, positions: np.ndarray, scores: np.ndarray) -> None:
+        """Set the scores of distinct ``positions`` at once."""
+        self.score[positions] = scores
+        self.refresh(positions)
+
+    def block(self, pos: int) -> None:
+        self.blocked[pos] += 1
+        if self.blocked[pos] == 1:
+            self.familiar.set(pos, 0.0)
+            self.fresh.set(pos, 0.0)
+
+    def unblock(self, pos: int) -> None:
+        self.blocked[pos] -= 1
+        if self.blocked[pos] == 0:
+            self.refresh((pos,))
+
+    def block_many(self, positions: np.ndarray) -> None:
+        """Block distinct ``positions`` at once (e.g. every track of an artist)."""
+        if not len(positions):
+            return
+        self.blocked[positions] += 1
+        for pos in positions[self.blocked[positions] == 1].tolist():
+            self.familiar.set(pos, 0.0)
+            self.fresh.set(pos, 0.0)
+
+    def unblock_many(self, positions: np.ndarray) -> None:
+        if not len(positions):
+            return
+        self.blocked[positions] -= 1
+        self.refresh(positions[self.blocked[positions] == 0])
+
+    def total(self) -> float:
+        total = self.familiar.total() + self.fresh.total()
+        return total if total > EMPTY_TOTAL else 0.0
+
+    def weight(self, pos: int) -> float:
+        """Return the weight ``pos`` currently has in the sampler."""
+        return self.familiar.values[pos] + self.fresh.values[pos]
+
+    def artist_played(self, pos: int, delta: int = 1) -> None:
+        """Count a play (or, with ``delta=-1``, forget one) of ``pos``'s artist."""
+        code = int(self.index.artist.codes[pos])
+        if not code:
+            return
+        self.artist_recent[code] = max(self.artist_recent[code] + delta, 0)
+        self.refresh(self.index.artist.positions(code))
+
+    def sample(self, rng) -> Optional[int]:
+        """Draw a position, choosing the fresh pool with ``exploration`` odds."""
+        familiar_total = self.familiar.total()
+        fresh_total = self.fresh.total()
+        if familiar_total <= EMPTY_TOTAL and fresh_total <= EMPTY_TOTAL:
+            return None
+        explore = rng.random() < self.params.exploration
+        if fresh_total > EMPTY_TOTAL and (explore or familiar_total <= EMPTY_TOTAL):
+            tree, total = self.fresh, fresh_total
+        else:
+            tree, total = self.familiar, familiar_total
+        return tree.find(rng.random() * total)
@@ -6,7 +6,15 @@ from .models import Channel, RatingWeight
 class ChannelSerializer(serializers.ModelSerializer):
     class Meta:
         model = Channel
-        fields = ["id", "name", "description"]
+        fields = [
+            "id",
+            "name",
+            "description",
+            "exploration",
+            "artist_penalty",
+            "freshness_days",
+            "cooldowns",
+        ]
 
 
 class RatingWeightSerializer(serializers.ModelSerializer):
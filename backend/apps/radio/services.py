@@ -1,59 +1,592 @@
 from __future__ import annotations
 
 import random
+import threading
+import time
 from collections import defaultdict, deque
-from typing import Deque, Dict, Optional, Tuple, TYPE_CHECKING
+from typing import Deque, Dict, Hashable, Iterable, List, Optional, Tuple, TYPE_CHECKING
 
+import numpy as np
+from asgiref.sync import sync_to_async
 from django.apps import apps
-from .models import Channel
+
+from apps.core import metrics
+from apps.core.concurrency import call_unblocked, in_event_loop
+from apps.playback.signing import get_signer
+
+from .channels import ChannelRegistry, channel_registry
+from .cooldown import CooldownWindow, validate_cooldowns
+from .history import ScoreHistory
+from .index import TrackIndex, track_index
+from .profiles import UserProfiles
+from .scoring import ACTION_SCORES, ChannelWeights, ScoringParams
+from .similarity import Neighbours, SimilarityIndex, similarity_index
+from .state import MemoryStateBackend, StateBackend
 
 
 if TYPE_CHECKING:  # pragma: no cover - for type checkers only
     from apps.library.models import Track
+    from .models import Channel
 
 
 class RadioService:
-    """Score tracks based on feedback and sample next track."""
+    """Score tracks based on feedback and sample next track.
+
+    Weights for each channel live in a :class:`ChannelWeights` aligned with
+    the shared :class:`TrackIndex`. They are computed in one vectorised pass
+    when the library changes; feedback, plays and cooldowns are point updates
+    afterwards, so picking a track never scans the library.
+
+    ``cooldowns`` maps ``track``/``artist``/``album`` to
+    :class:`~apps.radio.cooldown.CooldownWindow` options, e.g.
+    ``{"track": {"size": 200}, "artist": {"size": 5, "seconds": 7200}}``;
+    without it only the last ``cooldown_size`` tracks cool down. Keys in a
+    window are masked out of the sampler's weights, never filtered in SQL.
+    A channel's own ``cooldowns`` setting overrides these per kind. Copies of
+    one recording share a track cooldown, keyed by the best copy's id.
+
+    Channel settings come from the :class:`~apps.radio.channels.ChannelRegistry`
+    snapshot, so looking them up costs no queries.
+
+    A ``seed`` track biases sampling towards its neighbours in the
+    :class:`~apps.radio.similarity.SimilarityIndex`: with probability
+    ``seed_bias`` a pick is drawn from the seed's ``seed_neighbours`` nearest
+    tracks, weighted by similarity times their usual weight, so cooldowns
+    and bans still apply.
+
+    The ``a``-prefixed coroutines are for async views: blocking work (index
+    rebuilds, channel lookups, state sync) runs in a worker thread, the
+    in-memory sampling runs on the event loop.
 
-    def __init__(self, cooldown_size: int = 2, rng: Optional[random.Random] = None) -> None:
-        self.cooldown_size = cooldown_size
+    Scores and plays are mirrored to a :class:`~apps.radio.state.StateBackend`
+    and changes made by other workers are pulled in at most every
+    ``sync_interval`` seconds. With a :class:`~apps.radio.history.ScoreHistory`
+    the first sync also rebuilds scores from the feedback history; scores a
+    persistent state backend holds take precedence.
+
+    Passing a ``user`` id personalises sampling: the listener's own scores
+    from :class:`~apps.radio.profiles.UserProfiles` are blended into the
+    channel's for the tracks they rated, for the duration of the call.
+    """
+
+    def __init__(
+        self,
+        cooldown_size: int = 2,
+        rng: Optional[random.Random] = None,
+        index: Optional[TrackIndex] = None,
+        state: Optional[StateBackend] = None,
+        sync_interval: float = 1.0,
+        history_size: int = 20,
+        rescore_interval: float = 3600.0,
+        cooldowns: Optional[Dict[str, Dict]] = None,
+        channels: Optional[ChannelRegistry] = None,
+        similarity: Optional[SimilarityIndex] = None,
+        seed_bias: float = 0.7,
+        seed_neighbours: int = 50,
+        score_history: Optional[ScoreHistory] = None,
+        profiles: Optional[UserProfiles] = None,
+    ) -> None:
+        if cooldowns is None:
+            cooldowns = {"track": {"size": cooldown_size}}
+        self.cooldown_config = validate_cooldowns(cooldowns)
+        self.channels = channels or channel_registry
         self.rng = rng or random.Random()
-        self.scores: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
-        self.cooldowns: Dict[str, Deque[int]] = defaultdict(lambda: deque(maxlen=self.cooldown_size))
-
-    def submit_feedback(self, channel: str, track_id: int, liked: bool) -> None:
-        """Adjust score for a track on a channel based on feedback."""
-        delta = 1 if liked else -1
-        new_score = self.scores[channel][track_id] + delta
-        if new_score < 0:
-            new_score = 0
-        self.scores[channel][track_id] = new_score
-
-    def _candidates(self, channel: str):
+        self.index = track_index if index is None else index
+        if similarity is None:
+            similarity = (
+                similarity_index
+                if self.index is track_index
+                else SimilarityIndex(self.index)
+            )
+        self.similarity = similarity
+        self.seed_bias = seed_bias
+        self.seed_neighbours = seed_neighbours
+        self.state = state or MemoryStateBackend()
+        self.score_history = score_history
+        self.profiles = UserProfiles() if profiles is None else profiles
+        self.sync_interval = sync_interval
+        self.rescore_interval = rescore_interval
+        self.scores: Dict[str, Dict[int, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self.cooldowns: Dict[str, Dict[str, CooldownWindow]] = _PerChannel(
+            self._new_windows
+        )
+        # Cooldown options each channel's windows were built with.
+        self._window_config: Dict[str, Dict] = {}
+        self.history: Dict[str, Deque[int]] = defaultdict(
+            lambda: deque(maxlen=history_size)
+        )
+        self._weights: Dict[str, ChannelWeights] = {}
+        self._synced_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    def _cooldown_options(self, channel: str) -> Dict[str, Dict]:
+        return {**self.cooldown_config, **self.channels.get(channel).cooldowns}
+
+    def _new_windows(self, channel: str) -> Dict[str, CooldownWindow]:
+        config = self._window_config[channel] = self._cooldown_options(channel)
+        windows = {kind: CooldownWindow(**options) for kind, options in config.items()}
+        return {kind: window for kind, window in windows.items() if window}
+
+    def _reconfigure(self, channel: str) -> bool:
+        """Rebuild ``channel``'s windows if its cooldown settings changed.
+
+        Recent history is replayed into the new windows (as if played now),
+        so a settings change never frees every track at once. Return whether
+        anything changed; the caller must then rebuild the weights.
+        """
+        if channel not in self.cooldowns:
+            return False
+        if self._cooldown_options(channel) == self._window_config.get(channel):
+            return False
+        windows = self.cooldowns[channel] = self._new_windows(channel)
+        now = time.time()
+        for track_id in self.history[channel]:
+            pos = self.index.position(track_id)
+            for kind, window in windows.items():
+                key = self._cooldown_key(kind, track_id, pos)
+                if key is not None:
+                    window.push(key, now)
+        return True
+
+    def _sync(self) -> None:
+        """Pull scores and plays other workers stored since the last sync."""
+        now = time.monotonic()
+        if self._synced_at is None:
+            restored = (
+                self.score_history.restore() if self.score_history is not None else []
+            )
+            scores, plays = self.state.load()
+            scores = [*restored, *scores]
+            self._synced_at = now
+        elif now - self._synced_at >= self.sync_interval and not in_event_loop():
+            self.state.flush()
+            scores, plays = self.state.poll()
+            self._synced_at = now
+        else:
+            return
+        for channel, track_id, score in scores:
+            self.scores[channel][track_id] = score
+            self._set_score(channel, track_id, score)
+        for channel, track_id in plays:
+            self._note_play(channel, track_id)
+
+    def load_state(self) -> None:
+        """Restore scores and recent plays now rather than on first use."""
+        with self._lock:
+            self._sync()
+
+    def _current(self, channel: str) -> Optional[ChannelWeights]:
+        """Return the channel's weights if they match the current index."""
+        weights = self._weights.get(channel)
+        if weights is None or weights.version != self.index.version:
+            return None
+        return weights
+
+    def weights(self, channel: str) -> ChannelWeights:
+        """Return up-to-date weights for ``channel``, rebuilding if stale."""
+        with metrics.phase("index"):
+            self.index.ensure()
+        params = self.channels.get(channel).params
+        weights = self._current(channel)
+        if self._reconfigure(channel):
+            weights = None
+        if weights is None:
+            return self._build_weights(channel, params)
+        if weights.params != params:
+            with metrics.phase("rescore"):
+                weights.params = params
+                weights.rebuild()
+        elif time.time() - weights.built_at >= self.rescore_interval:
+            with metrics.phase("rescore"):
+                weights.rebuild()
+        self._expire(channel, time.time())
+        return weights
+
+    def _build_weights(self, channel: str, params: ScoringParams) -> ChannelWeights:
+        with metrics.phase("rescore"):
+            self._expire(channel, time.time())
+            weights = ChannelWeights(
+                self.index, params, self.scores[channel], recent=self.history[channel]
+            )
+            for kind, window in self.cooldowns[channel].items():
+                for key in window.keys():
+                    weights.block_many(self._cooldown_positions(kind, key))
+            self._weights[channel] = weights
+        return weights
+
+    def _cooldown_key(
+        self, kind: str, track_id: int, pos: Optional[int]
+    ) -> Optional[Hashable]:
+        if kind == "track":
+            return self.index.original(track_id, pos)
+        if pos is None:
+            return None
+        return getattr(self.index, kind).name(pos) or None
+
+    def _cooldown_positions(self, kind: str, key: Hashable) -> np.ndarray:
+        if kind == "track":
+            copies = self.index.duplicates.positions_of(key)
+            if len(copies):
+                return copies
+            pos = self.index.position(key)
+            return np.array([] if pos is None else [pos], dtype=np.intp)
+        return getattr(self.index, kind).positions_of(key)
+
+    def _release(self, channel: str, kind: str, keys: Iterable[Hashable]) -> None:
+        weights = self._current(channel)
+        if weights is None:
+            return
+        for key in keys:
+            weights.unblock_many(self._cooldown_positions(kind, key))
+
+    def _expire(self, channel: str, now: float) -> None:
+        """Lift time-based cooldowns that ran out."""
+        for kind, window in self.cooldowns[channel].items():
+            released = window.expire(now)
+            if released:
+                self._release(channel, kind, released)
+
+    def _set_score(self, channel: str, track_id: int, score: float) -> None:
+        weights = self._current(channel)
+        pos = self.index.position(track_id)
+        if weights is not None and pos is not None:
+            weights.set_score(pos, score)
+
+    def submit_feedback(
+        self, channel: str, track_id: int, action, user: Optional[int] = None
+    ) -> None:
+        """Adjust score for a track on a channel based on feedback.
+
+        ``action`` is one of :data:`~apps.radio.scoring.ACTION_SCORES`; a bare
+        ``True``/``False`` still means like/ban. Other actions (playback
+        errors) say nothing about taste and are ignored. Feedback from a
+        ``user`` also goes into their own profile.
+        """
+        if isinstance(action, bool):
+            action = "like" if action else "ban"
+        delta = ACTION_SCORES.get(action)
+        if delta is None:
+            return
+        if user is not None:
+            self.profiles.get(user, channel)  # any query runs before locking
+        with self._lock:
+            self._sync()
+            new_score = self.scores[channel][track_id] + delta
+            self.scores[channel][track_id] = new_score
+            self._set_score(channel, track_id, new_score)
+            if user is not None:
+                self.profiles.add(user, channel, track_id, delta)
+            # Queued before the lock is released: a _sync() flushes it before
+            # polling, so the stored total cannot overwrite this change.
+            self.state.add(channel, track_id, delta, flush=False)
+        self.state.maybe_flush()
+
+    def _note_play(self, channel: str, track_id: int) -> None:
+        """Apply cooldowns and artist history for a play of ``track_id``."""
+        weights = self._current(channel)
+        pos = self.index.position(track_id)
+        now = time.time()
+        for kind, window in self.cooldowns[channel].items():
+            key = self._cooldown_key(kind, track_id, pos)
+            if key is None:
+                self._release(channel, kind, window.expire(now))
+                continue
+            entered, released = window.push(key, now)
+            if weights is not None and entered:
+                weights.block_many(self._cooldown_positions(kind, key))
+            self._release(channel, kind, released)
+        history = self.history[channel]
+        if history.maxlen:
+            forgotten = history[0] if len(history) == history.maxlen else None
+            history.append(track_id)
+            if weights is not None:
+                if pos is not None:
+                    weights.artist_played(pos)
+                forgotten_pos = (
+                    self.index.position(forgotten) if forgotten is not None else None
+                )
+                if forgotten_pos is not None:
+                    weights.artist_played(forgotten_pos, -1)
+
+    def reserve(
+        self,
+        channel: str,
+        count: int = 1,
+        exclude: Iterable[int] = (),
+        seed: Optional[int] = None,
+        user: Optional[int] = None,
+    ) -> List[int]:
+        """Sample up to ``count`` distinct eligible track ids for ``user``.
+
+        Nothing is put on cooldown; call :meth:`mark_played` once a reserved
+        track is actually handed out.
+        """
+        picked: List[int] = []
+        if user is not None:
+            self.profiles.get(user, channel)  # any query runs before locking
+        with self._lock:
+            self._sync()
+            weights = self.weights(channel)
+            near = None
+            if seed is not None:
+                with metrics.phase("similar"):
+                    near = self.similarity.neighbours_of(seed, self.seed_neighbours)
+            personal = None
+            if user is not None:
+                with metrics.phase("profile"):
+                    personal = self._personal(weights, user, channel)
+            with metrics.phase("sample"):
+                held = [p for p in map(self.index.position, exclude) if p is not None]
+                for pos in held:
+                    weights.block(pos)
+                relaxed: Optional[List[np.ndarray]] = None
+                if personal is not None:
+                    positions, channel_scores, blended = personal
+                    weights.set_scores(positions, blended)
+                try:
+                    while len(picked) < count:
+                        pos = None
+                        if near is not None and self.rng.random() < self.seed_bias:
+                            pos = self._sample_near(weights, near)
+                        if pos is None:
+                            pos = weights.sample(self.rng)
+                        if pos is None and relaxed is None:
+                            # Artist/album cooldowns cover everything that is
+                            # left: lift them rather than go silent.
+                            relaxed = self._group_masks(channel)
+                            for positions in relaxed:
+                                weights.unblock_many(positions)
+                            pos = weights.sample(self.rng)
+                        if pos is None:
+                            break
+                        picked.append(self.index.ids[pos])
+                        held.append(pos)
+                        weights.block(pos)
+                finally:
+                    if personal is not None:
+                        weights.set_scores(positions, channel_scores)
+                    for pos in held:
+                        weights.unblock(pos)
+                    for group in relaxed or ():
+                        weights.block_many(group)
+        return picked
+
+    def _personal(
+        self, weights: ChannelWeights, user: int, channel: str
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Return positions ``user`` rated, their channel and blended scores."""
+        profile = self.profiles.get(user, channel)
+        share = self.profiles.share(profile)
+        if not share:
+            return None
+        positions = self.index.positions(profile.ids)
+        known = positions >= 0
+        if not known.any():
+            return None
+        positions = positions[known]
+        channel_scores = weights.score[positions].copy()
+        blended = (1 - share) * channel_scores + share * profile.values[known]
+        return positions, channel_scores, blended
+
+    def _sample_near(self, weights: ChannelWeights, near: Neighbours) -> Optional[int]:
+        """Pick one of ``near`` by similarity times weight (``None`` if none)."""
+        positions, scores = near
+        chances = np.fromiter(
+            (weights.weight(pos) for pos in positions.tolist()),
+            dtype=np.float64,
+            count=len(positions),
+        )
+        chances *= np.maximum(scores, 0.0)
+        cumulative = np.cumsum(chances)
+        if not len(cumulative) or cumulative[-1] <= 0:
+            return None
+        target = self.rng.random() * cumulative[-1]
+        i = int(np.searchsorted(cumulative, target, side="right"))
+        return int(positions[min(i, len(positions) - 1)])
+
+    def _group_masks(self, channel: str) -> List[np.ndarray]:
+        return [
+            self._cooldown_positions(kind, key)
+            for kind, window in self.cooldowns[channel].items()
+            if kind != "track"
+            for key in window.keys()
+        ]
+
+    def is_eligible(
+        self, channel: str, track_id: int, user: Optional[int] = None
+    ) -> bool:
+        """Return whether ``track_id`` could be sampled on ``channel`` now.
+
+        With a ``user`` the track's score is blended with theirs, as in
+        :meth:`reserve`.
+        """
+        with self._lock:
+            weights = self.weights(channel)
+            pos = self.index.position(track_id)
+            if pos is None or self.index.hidden[pos]:
+                return False
+            blended = None
+            if user is not None:
+                profile = self.profiles.get(user, channel)
+                share = self.profiles.share(profile)
+                rated = profile.get(track_id, None) if share else None
+                if rated is not None:
+                    blended = (1 - share) * weights.score[pos] + share * rated
+            if blended is None:
+                return self._eligible(weights, channel, track_id, pos)
+            channel_score = float(weights.score[pos])
+            weights.set_score(pos, blended)
+            try:
+                return self._eligible(weights, channel, track_id, pos)
+            finally:
+                weights.set_score(pos, channel_score)
+
+    def _eligible(
+        self, weights: ChannelWeights, channel: str, track_id: int, pos: int
+    ) -> bool:
+        if weights.weight(pos) > 0:
+            return True
+        # Picked by ``reserve`` with artist/album cooldowns lifted.
+        track_window = self.cooldowns[channel].get("track", ())
+        return (
+            weights.total() <= 0
+            and self.index.original(track_id, pos) not in track_window
+            and weights.compute(np.array([pos]))[0][0] > 0
+        )
+
+    def mark_played(self, channel: str, track_id: int) -> None:
+        """Put a handed-out track on cooldown and share the play."""
+        with self._lock:
+            self._note_play(channel, track_id)
+        self.state.record_play(channel, track_id)
+
+    def _sample(
+        self, channel: str, seed: Optional[int] = None, user: Optional[int] = None
+    ) -> Optional[int]:
+        if user is not None:
+            self.profiles.get(user, channel)  # any query runs before locking
+        with self._lock:
+            picked = self.reserve(channel, seed=seed, user=user)
+            if not picked:
+                return None
+            self.mark_played(channel, picked[0])
+        return picked[0]
+
+    def next_track(
+        self, channel: str, seed: Optional[int] = None, user: Optional[int] = None
+    ) -> Tuple[Optional["Track"], Optional[str]]:
+        """Return a recommended track and signed URL, near ``seed`` if given."""
         TrackModel = apps.get_model("library", "Track")
-        cooldown_ids = list(self.cooldowns[channel])
-        return TrackModel.objects.exclude(id__in=cooldown_ids)
-
-    def next_track(self, channel: str) -> Tuple[Optional["Track"], Optional[str]]:
-        """Return a recommended track and signed URL."""
-        candidates = self._candidates(channel)
-        if not candidates:
-            return None, None
-        weights = [self.scores[channel][t.id] + 1 for t in candidates]
-        choice = self.rng.choices(candidates, weights=weights, k=1)[0]
-        self.cooldowns[channel].append(choice.id)
-        url = self.sign_url(choice.audio_url)
-        return choice, url
+        for _ in range(2):
+            track_id = self._sample(channel, seed, user)
+            if track_id is None:
+                return None, None
+            choice = TrackModel.objects.filter(pk=track_id).first()
+            if choice is not None:
+                return choice, self.sign_url(choice)
+            # Deleted behind our back (e.g. a queryset ``delete()``); rebuild.
+            self.index.invalidate()
+        return None, None
+
+    def _needs_io(
+        self, channel: str, seed: Optional[int] = None, user: Optional[int] = None
+    ) -> bool:
+        return (
+            self.index.needs_io()
+            or self.channels.needs_io()
+            or (seed is not None and self.similarity.needs_io())
+            or (user is not None and not self.profiles.cached(user, channel))
+            or self._synced_at is None
+            or time.monotonic() - self._synced_at >= self.sync_interval
+        )
+
+    def _prepare(
+        self, channel: str, seed: Optional[int] = None, user: Optional[int] = None
+    ) -> None:
+        with self._lock:
+            self._sync()
+            self.weights(channel)
+            if seed is not None:
+                self.similarity.ensure()
+            if user is not None:
+                self.profiles.get(user, channel)
+
+    async def aprepare(
+        self, channel: str, seed: Optional[int] = None, user: Optional[int] = None
+    ) -> None:
+        """Do any pending blocking work for ``channel`` off the event loop."""
+        if self._needs_io(channel, seed, user):
+            await sync_to_async(self._prepare)(channel, seed, user)
+
+    async def areserve(
+        self,
+        channel: str,
+        count: int = 1,
+        exclude: Iterable[int] = (),
+        seed: Optional[int] = None,
+        user: Optional[int] = None,
+    ) -> List[int]:
+        await self.aprepare(channel, seed, user)
+        return await call_unblocked(
+            (self._lock,), self.reserve, channel, count, tuple(exclude), seed, user
+        )
+
+    async def asubmit_feedback(
+        self, channel: str, track_id: int, action, user: Optional[int] = None
+    ) -> None:
+        await self.aprepare(channel, user=user)
+        await call_unblocked(
+            (self._lock,), self.submit_feedback, channel, track_id, action, user
+        )
+        await self.state.aflush()
+
+    async def anext_track(
+        self, channel: str, seed: Optional[int] = None, user: Optional[int] = None
+    ) -> Tuple[Optional["Track"], Optional[str]]:
+        """Async :meth:`next_track` using the async ORM."""
+        TrackModel = apps.get_model("library", "Track")
+        for _ in range(2):
+            await self.aprepare(channel, seed, user)
+            track_id = await call_unblocked(
+                (self._lock,), self._sample, channel, seed, user
+            )
+            await self.state.aflush()
+            if track_id is None:
+                return None, None
+            choice = await TrackModel.objects.filter(pk=track_id).afirst()
+            if choice is not None:
+                return choice, self.sign_url(choice)
+            self.index.invalidate()
+        return None, None
 
     @staticmethod
-    def sign_url(url: str) -> str:
-        """Return a signed URL (placeholder)."""
-        return url
+    def sign_url(track: "Track") -> str:
+        """Return a signed stream URL, or ``audio_url`` for non-local tracks."""
+        if not track.path:
+            return track.audio_url
+        return get_signer().sign(track.id, track.path)
+
+
+class _PerChannel(dict):
+    """``channel -> value`` built by ``factory(channel)`` on first access."""
+
+    def __init__(self, factory) -> None:
+        super().__init__()
+        self.factory = factory
+
+    def __missing__(self, channel: str):
+        value = self[channel] = self.factory(channel)
+        return value
+
 
+def apply_channel_rating(channel: "Channel | str", rating: int) -> float:
+    """Return rating weighted according to the channel configuration.
 
-def apply_channel_rating(channel: Channel, rating: int) -> float:
-    """Return rating weighted according to the channel configuration."""
-    weight = getattr(channel, "rating_weight", None)
-    if not weight:
-        return float(rating)
-    return weight.apply(rating)
\ No newline at end of file
+    ``channel`` is a :class:`Channel` or a channel name; the weights come
+    from the channel snapshot, so this never queries the database.
+    """
+    name = getattr(channel, "name", channel)
+    params = channel_registry.get(name).params
+    return rating * (params.positive if rating > 0 else params.negative)
@@ -0,0 +1,38 @@
+"""Signal handlers keeping radio caches in sync with the library."""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.library.signals import library_changed
+
+from .channels import channel_registry
+from .index import track_index
+from .similarity import similarity_index
+
+
+@receiver(post_save, sender="library.Track")
+def track_saved(sender, instance, created, **kwargs):
+    track_index.invalidate()
+
+
+@receiver(post_delete, sender="library.Track")
+def track_deleted(sender, instance, **kwargs):
+    track_index.invalidate()
+
+
+@receiver(library_changed)
+def library_scanned(sender, **kwargs):
+    # Scans and feature analysis both change what tracks sound like.
+    track_index.invalidate()
+    similarity_index.invalidate()
+
+
+@receiver(post_save, sender="radio.Channel")
+@receiver(post_delete, sender="radio.Channel")
+@receiver(post_save, sender="radio.RatingWeight")
+@receiver(post_delete, sender="radio.RatingWeight")
+def channel_changed(sender, **kwargs):
+    # Again on commit, in case a reader rebuilt from the uncommitted rows.
+    channel_registry.invalidate()
+    transaction.on_commit(channel_registry.invalidate)
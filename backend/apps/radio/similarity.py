@@ -0,0 +1,311 @@
+"""Nearest-neighbour index over track audio features for seeded radio.
+
+Every track gets one row of a contiguous float32 matrix, aligned with the
+positions of the shared :class:`~apps.radio.index.TrackIndex`: its
+:data:`~apps.library.features.FEATURE_NAMES` vector, standardised and
+scaled to unit length, or zeros while it has not been analysed. The dot
+product of two rows is their cosine similarity; sharing an artist or an
+album adds a fixed bonus on top, so tracks without features still have
+neighbours.
+
+Tracks added to the library are appended to spare capacity at the end of
+the matrix, loading only their own features. Feature changes (``manage.py
+analyze_library``, a rescan) invalidate the index and it is rebuilt on next
+use. With ``SUITUNE_SIMILARITY_PATH`` the matrix is also saved there and
+later builds memory-map it instead of decoding every vector again, as long
+as the stored features have not changed since.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+from apps.core.concurrency import in_event_loop
+
+from .index import TrackIndex, track_index
+
+ARTIST_WEIGHT = 0.15
+ALBUM_WEIGHT = 0.1
+# Above this many tracks, features are fetched by id range, not an IN list.
+FETCH_BY_ID = 1000
+
+# ``(positions, scores)`` of a seed's neighbours, best first.
+Neighbours = Tuple[np.ndarray, np.ndarray]
+
+
+def _features():
+    from apps.library import features
+    from apps.library.models import TrackFeature
+
+    rows = TrackFeature.objects.filter(version=features.FEATURE_VERSION, error="")
+    return features, rows
+
+
+class SimilarityIndex:
+    """Unit-length feature rows aligned with a :class:`TrackIndex`.
+
+    :meth:`neighbours` answers a batch of seeds with one matrix product;
+    :meth:`neighbours_of` keeps the answers for the last ``cache_size``
+    seeds, so a listener asking for more of the same costs a dict lookup.
+    """
+
+    def __init__(
+        self,
+        index: Optional[TrackIndex] = None,
+        artist_weight: float = ARTIST_WEIGHT,
+        album_weight: float = ALBUM_WEIGHT,
+        path: Optional[str] = None,
+        cache_size: int = 1024,
+    ) -> None:
+        self.index = track_index if index is None else index
+        self.artist_weight = artist_weight
+        self.album_weight = album_weight
+        self.path = path
+        self.cache_size = cache_size
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.mean: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self.size = 0
+        self.version = -1
+        self._buffer = np.zeros((0, 0), dtype=np.float32)
+        self._cache: "OrderedDict[Tuple[int, int], Optional[Neighbours]]" = (
+            OrderedDict()
+        )
+        self._stale = True
+        self._lock = threading.RLock()
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._buffer[: self.size]
+
+    def invalidate(self) -> None:
+        """Reload every row on next use (features were re-analysed)."""
+        self._stale = True
+
+    def needs_io(self) -> bool:
+        return (
+            self._stale or self.index.needs_io() or self.version != self.index.version
+        )
+
+    def ensure(self) -> None:
+        """Bring the rows in line with the track index."""
+        self.index.ensure()
+        if not self.needs_io():
+            return
+        with self._lock:
+            # Version first: if the index is rebuilt meanwhile we sync again.
+            version = self.index.version
+            if not self._stale and version == self.version:
+                return
+            ids = np.array(self.index.ids, dtype=np.int64)
+            if self._stale:
+                self._stale = False
+                self._rebuild(ids)
+            else:
+                self._update(ids)
+            self.version = version
+            self._cache.clear()
+
+    def _rebuild(self, ids: np.ndarray) -> None:
+        stamp = self._stamp() if self.path else None
+        if stamp is not None and self.load(self.path, stamp):
+            self._update(ids)
+            return
+        raw = self._fetch(ids)
+        analysed = raw[~np.isnan(raw).all(axis=1)]
+        if len(analysed):
+            with np.errstate(all="ignore"):
+                self.mean = np.nan_to_num(np.nanmean(analysed, axis=0))
+                scale = np.nan_to_num(np.nanstd(analysed, axis=0))
+        else:
+            self.mean = np.zeros(raw.shape[1], np.float32)
+            scale = np.ones(raw.shape[1], np.float32)
+        self.scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+        self.mean = self.mean.astype(np.float32)
+        self._buffer = np.zeros((0, raw.shape[1]), np.float32)
+        self.size = 0
+        self._append(ids, self._normalise(raw))
+        self.ids = ids
+        if stamp is not None:
+            self.save(self.path, stamp)
+
+    def _update(self, ids: np.ndarray) -> None:
+        """Keep the rows of known tracks, load features of the others only."""
+        old, n = self.ids, self.size
+        if n <= len(ids) and np.array_equal(ids[:n], old[:n]):
+            self._append(ids[n:], self._normalise(self._fetch(ids[n:])))
+            self.ids = ids
+            return
+        found = np.zeros(len(ids), dtype=bool)
+        at = np.searchsorted(old[:n], ids)
+        if n:
+            at = np.minimum(at, n - 1)
+            found = old[at] == ids
+        rows = np.empty((len(ids), self._buffer.shape[1]), np.float32)
+        rows[found] = self.matrix[at[found]]
+        rows[~found] = self._normalise(self._fetch(ids[~found]))
+        self._buffer, self.ids, self.size = rows, ids, len(ids)
+
+    def _append(self, ids: np.ndarray, rows: np.ndarray) -> None:
+        if not len(ids):
+            return
+        end = self.size + len(ids)
+        if end > len(self._buffer) or not self._buffer.flags.writeable:
+            # Leave room to grow; this also copies a memory-mapped matrix.
+            capacity = max(end + end // 4, 1024)
+            buffer = np.zeros((capacity, rows.shape[1]), np.float32)
+            buffer[: self.size] = self.matrix
+            self._buffer = buffer
+        self._buffer[self.size : end] = rows
+        self.size = end
+
+    def _fetch(self, ids: np.ndarray) -> np.ndarray:
+        """Return raw vectors of ``ids`` (``nan`` where not analysed)."""
+        features, rows = _features()
+        raw = np.full((len(ids), len(features.FEATURE_NAMES)), np.nan, np.float32)
+        if not len(ids):
+            return raw
+        if len(ids) <= FETCH_BY_ID:
+            rows = rows.filter(track_id__in=ids.tolist())
+        else:
+            rows = rows.filter(track_id__gte=int(ids.min()))
+        found, vectors = [], []
+        for track_id, vector in rows.values_list("track_id", "vector").iterator(
+            chunk_size=2000
+        ):
+            found.append(track_id)
+            vectors.append(np.frombuffer(bytes(vector), dtype="<f4"))
+        if found:
+            pos = np.searchsorted(ids, found)
+            pos = np.minimum(pos, len(ids) - 1)
+            mine = ids[pos] == found
+            raw[pos[mine]] = np.stack(vectors)[mine]
+        return raw
+
+    def _normalise(self, raw: np.ndarray) -> np.ndarray:
+        if self.mean is None:
+            return np.zeros(raw.shape, np.float32)
+        rows = np.nan_to_num((raw - self.mean) / self.scale).astype(np.float32)
+        # Tracks without features stay all-zero.
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        return np.divide(rows, norms, out=np.zeros_like(rows), where=norms > 0)
+
+    def neighbours(
+        self, track_ids: Sequence[int], k: int = 50
+    ) -> List[Optional[Neighbours]]:
+        """Return the ``k`` most similar tracks to each of ``track_ids``.
+
+        One ``(positions, scores)`` pair per seed, best first, the seed
+        itself excluded; ``None`` for ids not in the library.
+        """
+        self.ensure()
+        with self._lock:
+            return self._neighbours(track_ids, k)
+
+    def _neighbours(
+        self, track_ids: Sequence[int], k: int
+    ) -> List[Optional[Neighbours]]:
+        seeds = [self.index.position(track_id) for track_id in track_ids]
+        known = np.array([pos for pos in seeds if pos is not None], dtype=np.intp)
+        k = min(k, self.size - 1)
+        if not len(known) or k <= 0:
+            return [None] * len(seeds)
+        matrix = self.matrix
+        scores = matrix[known] @ matrix.T
+        for grouping, weight in (
+            (self.index.artist, self.artist_weight),
+            (self.index.album, self.album_weight),
+        ):
+            codes = grouping.codes
+            mine = codes[known][:, None]
+            scores += weight * ((codes[None, :] == mine) & (mine != 0))
+        rows = np.arange(len(known))
+        scores[rows, known] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best = scores[rows[:, None], top]
+        order = np.argsort(-best, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        answers = iter(zip(top, best))
+        return [None if pos is None else next(answers) for pos in seeds]
+
+    def neighbours_of(self, track_id: int, k: int = 50) -> Optional[Neighbours]:
+        """Cached :meth:`neighbours` of a single seed.
+
+        ``None`` on the event loop while the rows are out of line with the
+        index; they are brought up to date from a worker thread.
+        """
+        if self.needs_io():
+            if in_event_loop():
+                return None
+            self.ensure()
+        key = (track_id, k)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            found = self._cache[key] = self._neighbours([track_id], k)[0]
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return found
+
+    def _stamp(self) -> List:
+        """Identify the stored features: version, count and last analysis."""
+        features, rows = _features()
+        stats = rows.aggregate(count=Count("pk"), last=Max("analysed_at"))
+        last = stats["last"].isoformat() if stats["last"] else None
+        return [features.FEATURE_VERSION, stats["count"], last]
+
+    def save(self, path: str, stamp: List) -> None:
+        """Write the matrix under directory ``path`` (``meta.json`` last)."""
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "vectors": self.matrix,
+            "ids": self.ids,
+            "stats": np.stack([self.mean, self.scale]),
+        }
+        for name, array in arrays.items():
+            tmp = directory / f".{name}.{os.getpid()}.npy"
+            np.save(tmp, array)
+            os.replace(tmp, directory / f"{name}.npy")
+        meta = {"stamp": stamp, "size": self.size}
+        tmp = directory / f".meta.{os.getpid()}.json"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, directory / "meta.json")
+
+    def load(self, path: str, stamp: Optional[List] = None) -> bool:
+        """Memory-map a matrix written by :meth:`save`.
+
+        Return ``False``, leaving the index alone, if there is none or it was
+        built from features other than ``stamp``.
+        """
+        directory = Path(path)
+        try:
+            meta = json.loads((directory / "meta.json").read_text())
+            if stamp is not None and meta["stamp"] != stamp:
+                return False
+            vectors = np.load(directory / "vectors.npy", mmap_mode="r")
+            ids = np.load(directory / "ids.npy")
+            mean, scale = np.load(directory / "stats.npy")
+        except (OSError, ValueError, KeyError):
+            return False
+        if not len(vectors) == len(ids) == meta["size"]:
+            return False
+        self._buffer, self.ids, self.size = vectors, ids, len(ids)
+        self.mean, self.scale = mean, scale
+        return True
+
+
+similarity_index = SimilarityIndex(
+    path=getattr(settings, "SUITUNE_SIMILARITY_PATH", None) or None
+)
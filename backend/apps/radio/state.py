@@ -0,0 +1,354 @@
+"""Pluggable storage for radio scores and recent plays.
+
+``RadioService`` keeps working copies of scores and cooldowns in memory and
+hands every change to a state backend. Backends buffer those changes and
+write them in batches (write-behind), then let each worker poll for what the
+others wrote since its last sync. The default in-memory backend keeps the
+old per-process behaviour.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.core.concurrency import in_event_loop
+
+logger = logging.getLogger(__name__)
+
+ScoreRow = Tuple[str, int, float]
+PlayRow = Tuple[str, int]
+
+
+class StateBackend:
+    """Base class buffering score deltas and plays until :meth:`flush`.
+
+    Subclasses implement :meth:`_write`, :meth:`load` and :meth:`poll`.
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 2.0) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.origin = uuid.uuid4().hex
+        self._deltas: Dict[Tuple[str, int], float] = defaultdict(float)
+        self._plays: List[PlayRow] = []
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def forked(self) -> None:
+        """Take a new identity in a forked worker.
+
+        Plays are told apart by ``origin``; workers forked from one master
+        would otherwise ignore each other's plays as their own.
+        """
+        with self._lock:
+            self.origin = uuid.uuid4().hex
+            self._deltas.clear()
+            self._plays.clear()
+
+    def add(
+        self, channel: str, track_id: int, delta: float, flush: bool = True
+    ) -> None:
+        """Queue a score change for ``track_id`` on ``channel``.
+
+        With ``flush=False`` a flush that is due is left to :meth:`maybe_flush`.
+        """
+        with self._lock:
+            self._deltas[(channel, track_id)] += delta
+        if flush:
+            self.maybe_flush()
+
+    def record_play(self, channel: str, track_id: int) -> None:
+        """Queue a play so other workers can put the track on cooldown."""
+        with self._lock:
+            self._plays.append((channel, track_id))
+        self.maybe_flush()
+
+    def due(self) -> bool:
+        """Return whether buffered changes should be written now."""
+        pending = len(self._deltas) + len(self._plays)
+        return bool(pending) and (
+            pending >= self.batch_size
+            or time.monotonic() - self._flushed_at >= self.flush_interval
+        )
+
+    def maybe_flush(self) -> None:
+        # Async callers must not block the event loop; they await aflush().
+        if self.due() and not in_event_loop():
+            self.flush()
+
+    async def aflush(self) -> None:
+        """Flush from async code, in a worker thread, if a flush is due."""
+        if self.due():
+            await sync_to_async(self.flush)()
+
+    def flush(self) -> None:
+        """Write all buffered changes in one batch."""
+        with self._lock:
+            deltas = [(c, t, d) for (c, t), d in self._deltas.items() if d]
+            plays = self._plays
+            self._deltas = defaultdict(float)
+            self._plays = []
+            self._flushed_at = time.monotonic()
+        if not deltas and not plays:
+            return
+        try:
+            self._write(deltas, plays)
+        except Exception:
+            logger.exception("Failed to flush radio state; will retry")
+            with self._lock:
+                for channel, track_id, delta in deltas:
+                    self._deltas[(channel, track_id)] += delta
+                self._plays[:0] = plays
+
+    def _write(self, deltas: List[ScoreRow], plays: List[PlayRow]) -> None:
+        raise NotImplementedError
+
+    def load(self) -> Tuple[List[ScoreRow], List[PlayRow]]:
+        """Return all stored scores and the most recent plays, oldest first."""
+        raise NotImplementedError
+
+    def poll(self) -> Tuple[List[ScoreRow], List[PlayRow]]:
+        """Return scores and plays written by other workers since last call."""
+        raise NotImplementedError
+
+
+class MemoryStateBackend(StateBackend):
+    """Keep nothing outside the worker process."""
+
+    def add(
+        self, channel: str, track_id: int, delta: float, flush: bool = True
+    ) -> None:
+        pass
+
+    def record_play(self, channel: str, track_id: int) -> None:
+        pass
+
+    def _write(self, deltas: List[ScoreRow], plays: List[PlayRow]) -> None:
+        pass
+
+    def load(self) -> Tuple[List[ScoreRow], List[PlayRow]]:
+        return [], []
+
+    def poll(self) -> Tuple[List[ScoreRow], List[PlayRow]]:
+        return [], []
+
+
+class DatabaseStateBackend(StateBackend):
+    """Store state in the Django database (``ScoreEntry``/``PlayEntry``).
+
+    Increments are applied atomically with ``F()`` expressions. Polling
+    re-reads rows touched within ``overlap`` seconds of the previous poll so
+    transactions that committed late are not missed; rows carry absolute
+    scores, so reading them twice is harmless.
+    """
+
+    def __init__(self, recent_plays: int = 500, overlap: float = 5.0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.recent_plays = recent_plays
+        self.overlap = overlap
+        self._polled_at = None
+        self._last_play_id = 0
+
+    def _write(self, deltas: List[ScoreRow], plays: List[PlayRow]) -> None:
+        ScoreEntry = apps.get_model("radio", "ScoreEntry")
+        PlayEntry = apps.get_model("radio", "PlayEntry")
+        now = timezone.now()
+        with transaction.atomic():
+            ScoreEntry.objects.bulk_create(
+                [
+                    ScoreEntry(channel=c, track_id=t, score=0.0, updated_at=now)
+                    for c, t, _ in deltas
+                ],
+                ignore_conflicts=True,
+            )
+            for channel, track_id, delta in deltas:
+                ScoreEntry.objects.filter(channel=channel, track_id=track_id).update(
+                    score=F("score") + delta, updated_at=now
+                )
+            created = PlayEntry.objects.bulk_create(
+                [PlayEntry(channel=c, track_id=t, origin=self.origin) for c, t in plays]
+            )
+            if created and created[-1].pk:
+                PlayEntry.objects.filter(
+                    id__lte=created[-1].pk - self.recent_plays * 10
+                ).delete()
+
+    def load(self) -> Tuple[List[ScoreRow], List[PlayRow]]:
+        ScoreEntry = apps.get_model("radio", "ScoreEntry")
+        PlayEntry = apps.get_model("radio", "PlayEntry")
+        self._polled_at = timezone.now()
+        scores = list(
+            ScoreEntry.objects.values_list("channel", "track_id", "score").iterator()
+        )
+        recent = list(
+            PlayEntry.objects.order_by("-id").values_list("id", "channel", "track_id")[
+                : self.recent_plays
+            ]
+        )
+        self._last_play_id = recent[0][0] if recent else 0
+        return scores, [(c, t) for _, c, t in reversed(recent)]
+
+    def poll(self) -> Tuple[List[ScoreRow], List[PlayRow]]:
+        if self._polled_at is None:
+            return self.load()
+        ScoreEntry = apps.get_model("radio", "ScoreEntry")
+        PlayEntry = apps.get_model("radio", "PlayEntry")
+        since = self._polled_at - timedelta(seconds=self.overlap)
+        self._polled_at = timezone.now()
+        scores = list(
+            ScoreEntry.objects.filter(updated_at__gte=since).values_list(
+                "channel", "track_id", "score"
+            )
+        )
+        rows = list(
+            PlayEntry.objects.filter(id__gt=self._last_play_id)
+            .order_by("id")
+            .values_list("id", "channel", "track_id", "origin")
+        )
+        if rows:
+            self._last_play_id = rows[-1][0]
+        return scores, [(c, t) for _, c, t, origin in rows if origin != self.origin]
+
+
+class SQLiteStateBackend(StateBackend):
+    """Store state in a local SQLite file in WAL mode.
+
+    Meant for single-host deployments: every worker opens the same file,
+    readers never block the writer, and each flush bumps a sequence number
+    inside ``BEGIN IMMEDIATE`` so polls only fetch rows with a newer ``seq``.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS scores (
+        channel TEXT NOT NULL,
+        track_id INTEGER NOT NULL,
+        score REAL NOT NULL,
+        seq INTEGER NOT NULL,
+        PRIMARY KEY (channel, track_id)
+    );
+    CREATE INDEX IF NOT EXISTS scores_seq ON scores (seq);
+    CREATE TABLE IF NOT EXISTS plays (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel TEXT NOT NULL,
+        track_id INTEGER NOT NULL,
+        origin TEXT NOT NULL
+    );
+    """
+
+    def __init__(
+        self, path: Optional[str] = None, recent_plays: int = 500, **kwargs
+    ) -> None:
+        super().__init__(**kwargs)
+        self.path = str(path or settings.BASE_DIR / "radio_state.sqlite3")
+        self.recent_plays = recent_plays
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._conn_lock = threading.Lock()
+        self._score_seq = 0
+        self._play_seq = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections must not cross a fork, so reopen in each worker.
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _write(self, deltas: List[ScoreRow], plays: List[PlayRow]) -> None:
+        with self._conn_lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                (seq,) = conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) + 1 FROM scores"
+                ).fetchone()
+                conn.executemany(
+                    "INSERT INTO scores (channel, track_id, score, seq) "
+                    "VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (channel, track_id) DO UPDATE "
+                    "SET score = score + excluded.score, seq = excluded.seq",
+                    [(c, t, d, seq) for c, t, d in deltas],
+                )
+                conn.executemany(
+                    "INSERT INTO plays (channel, track_id, origin) VALUES (?, ?, ?)",
+                    [(c, t, self.origin) for c, t in plays],
+                )
+                conn.execute(
+                    "DELETE FROM plays WHERE seq <= (SELECT MAX(seq) FROM plays) - ?",
+                    (self.recent_plays * 10,),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def load(self) -> Tuple[List[ScoreRow], List[PlayRow]]:
+        with self._conn_lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                scores = conn.execute(
+                    "SELECT channel, track_id, score, seq FROM scores"
+                ).fetchall()
+                recent = conn.execute(
+                    "SELECT seq, channel, track_id FROM plays "
+                    "ORDER BY seq DESC LIMIT ?",
+                    (self.recent_plays,),
+                ).fetchall()
+            finally:
+                conn.execute("COMMIT")
+        self._score_seq = max((row[3] for row in scores), default=0)
+        self._play_seq = recent[0][0] if recent else 0
+        return [row[:3] for row in scores], [(c, t) for _, c, t in reversed(recent)]
+
+    def poll(self) -> Tuple[List[ScoreRow], List[PlayRow]]:
+        with self._conn_lock:
+            conn = self._connect()
+            scores = conn.execute(
+                "SELECT channel, track_id, score, seq FROM scores WHERE seq > ?",
+                (self._score_seq,),
+            ).fetchall()
+            plays = conn.execute(
+                "SELECT seq, channel, track_id, origin FROM plays "
+                "WHERE seq > ? ORDER BY seq",
+                (self._play_seq,),
+            ).fetchall()
+        if scores:
+            self._score_seq = max(row[3] for row in scores)
+        if plays:
+            self._play_seq = plays[-1][0]
+        return [row[:3] for row in scores], [
+            (c, t) for _, c, t, origin in plays if origin != self.origin
+        ]
+
+
+def get_state_backend() -> StateBackend:
+    """Instantiate the backend configured in ``SUITUNE_RADIO_STATE``."""
+    config = getattr(settings, "SUITUNE_RADIO_STATE", {})
+    backend = import_string(
+        config.get("BACKEND", "apps.radio.state.MemoryStateBackend")
+    )
+    return backend(**config.get("OPTIONS", {}))
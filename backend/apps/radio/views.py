@@ -1,10 +1,12 @@
 """REST API views for radio."""
 from rest_framework import viewsets
+
+from apps.core.catalog import ConditionalCatalogMixin
 from .models import Channel, RatingWeight
 from .serializers import ChannelSerializer, RatingWeightSerializer
 
 
-class ChannelViewSet(viewsets.ModelViewSet):
+class ChannelViewSet(ConditionalCatalogMixin, viewsets.ModelViewSet):
     queryset = Channel.objects.all()
     serializer_class = ChannelSerializer
 
@@ -0,0 +1,12 @@
+"""Benchmarks for the radio, feedback and catalog hot paths.
+
+Run from ``backend/``::
+
+    python -m benchmarks --sizes 1000 10000 100000 --output bench.json
+    python -m benchmarks --compare before.json bench.json
+
+Each size gets a fresh synthetic library with playback and feedback
+history in a throwaway test database. Results are written as JSON (one
+entry per size and case with throughput, p50/p99 latency and SQL queries
+per call) so runs from different commits can be diffed.
+"""
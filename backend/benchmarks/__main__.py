@@ -0,0 +1,85 @@
+"""Command line entry point: ``python -m benchmarks``."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=10.0,
+        help="Stop timing a case after this long (default: 10).",
+    )
+    parser.add_argument("--case", action="append", help="Only run this case.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", help="Write the JSON report here (default: stdout)."
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BEFORE", "AFTER"),
+        help="Compare two reports instead of running; exit 1 on regressions.",
+    )
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "suitune.settings.dev")
+    import django
+
+    django.setup()
+    from django.test.utils import (
+        setup_databases,
+        setup_test_environment,
+        teardown_databases,
+        teardown_test_environment,
+    )
+
+    from .runner import compare, load, run
+
+    if args.compare:
+        rows = compare(load(args.compare[0]), load(args.compare[1]), args.threshold)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(
+                f"{row['size']:>7} {row['case']:<26} "
+                f"{row['p50_before']:.2f}ms -> {row['p50_after']:.2f}ms "
+                f"({row['change']:+.0%}) {flag}"
+            )
+        return 1 if any(row["regression"] for row in rows) else 0
+
+    setup_test_environment()
+    databases = setup_databases(verbosity=0, interactive=False)
+    try:
+        report = run(
+            sizes=args.sizes,
+            iterations=args.iterations,
+            warmup=args.warmup,
+            max_seconds=args.max_seconds,
+            only=args.case,
+            seed=args.seed,
+            log=lambda line: print(line, file=sys.stderr),
+        )
+    finally:
+        teardown_databases(databases, verbosity=0)
+        teardown_test_environment()
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
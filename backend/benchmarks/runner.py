@@ -0,0 +1,241 @@
+"""Timing harness and benchmark cases."""
+
+from __future__ import annotations
+
+import json
+import platform
+import random
+import subprocess
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from apps.library.models import Track
+from apps.library.serializers import TrackSerializer
+from apps.playback.ingest import FeedbackBuffer
+from apps.playback.signing import StreamSigner
+from apps.radio.queue import QueueManager
+from apps.radio.scoring import ChannelWeights, ScoringParams
+from apps.radio.services import RadioService
+
+from .data import build_library, clear_library
+
+CHANNEL = "default"
+FEEDBACK_ACTIONS = ("like", "complete", "skip")
+FEEDBACK_BATCH = 10
+PAGE_SIZE = 100
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted ``samples``."""
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+def measure(
+    fn: Callable[[], object],
+    iterations: int = 200,
+    warmup: int = 10,
+    max_seconds: float = 10.0,
+) -> Dict[str, float]:
+    """Call ``fn`` repeatedly and summarise latency, throughput and queries.
+
+    Stops early after ``max_seconds`` so slow cases on big libraries still
+    finish; ``iterations`` in the result is the number actually timed.
+    """
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        while len(samples) < iterations:
+            t0 = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t0)
+            if time.perf_counter() - started >= max_seconds:
+                break
+        elapsed = time.perf_counter() - started
+    samples.sort()
+    return {
+        "iterations": len(samples),
+        "throughput": len(samples) / elapsed if elapsed else 0.0,
+        "mean_ms": sum(samples) / len(samples) * 1000,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "queries": len(queries) / len(samples),
+    }
+
+
+Cases = Dict[str, Callable[[], object]]
+
+
+def cases(rng: random.Random) -> Tuple[Cases, RadioService, QueueManager]:
+    """Build the benchmark cases against the current library.
+
+    Also return the service and queue the API cases must be patched to use.
+    """
+    ids = list(Track.objects.values_list("id", flat=True))
+    cooldowns = getattr(settings, "SUITUNE_RADIO_COOLDOWNS", None)
+    service = RadioService(cooldowns=cooldowns, rng=random.Random(rng.random()))
+    api_service = RadioService(cooldowns=cooldowns, rng=random.Random(rng.random()))
+    queue = QueueManager(api_service, background=False)
+    client = Client()
+    service.index.ensure()
+    # Feedback on one track in twenty.
+    scores = {track_id: rng.gauss(0, 1) for track_id in ids[::20]}
+    signer = StreamSigner("s3cret", ttl=3600)
+    expires = int(time.time()) + 3600
+    signature = signer.signature(42, expires, "a/b/c.mp3")
+
+    def service_next():
+        service.next_track(CHANNEL)
+
+    def service_feedback():
+        service.submit_feedback(CHANNEL, rng.choice(ids), rng.choice(FEEDBACK_ACTIONS))
+
+    def scoring_compute():
+        # Every weight of a channel, as after a library change.
+        ChannelWeights(service.index, ScoringParams(), scores).compute()
+
+    def signing_verify():
+        # Runs on every Range request of a stream.
+        signer.verify(42, expires, signature, "a/b/c.mp3")
+
+    def serialize_page():
+        return TrackSerializer(Track.objects.all()[:PAGE_SIZE], many=True).data
+
+    def api_next():
+        client.get("/api/next", {"channel": CHANNEL})
+
+    def api_feedback():
+        events = [
+            {
+                "track_id": rng.choice(ids),
+                "action": rng.choice(FEEDBACK_ACTIONS),
+                "channel": CHANNEL,
+            }
+            for _ in range(FEEDBACK_BATCH)
+        ]
+        client.post("/api/feedback", events, content_type="application/json")
+
+    def api_tracks():
+        client.get("/api/tracks/")
+
+    def api_search():
+        # A title prefix, as typed.
+        client.get("/api/search", {"q": f"track {rng.randrange(len(ids))}"[:9]})
+
+    return (
+        {
+            "service.next_track": service_next,
+            "service.submit_feedback": service_feedback,
+            "scoring.compute": scoring_compute,
+            "signing.verify": signing_verify,
+            "serializer.track_page": serialize_page,
+            "api.next": api_next,
+            "api.feedback": api_feedback,
+            "api.tracks": api_tracks,
+            "api.search": api_search,
+        },
+        api_service,
+        queue,
+    )
+
+
+def run(
+    sizes: Iterable[int] = (1000, 10000, 100000),
+    iterations: int = 200,
+    warmup: int = 10,
+    max_seconds: float = 10.0,
+    only: Optional[Iterable[str]] = None,
+    seed: int = 0,
+    log: Callable[[str], None] = lambda line: None,
+) -> Dict[str, object]:
+    """Run every case for every library size and return the JSON report."""
+    only = set(only or ())
+    results = []
+    for size in sizes:
+        clear_library()
+        started = time.perf_counter()
+        build_library(size, channel=CHANNEL, seed=seed)
+        log(f"{size} tracks built in {time.perf_counter() - started:.1f}s")
+        rng = random.Random(seed)
+        benchmarks, api_service, queue = cases(rng)
+        buffer = FeedbackBuffer(batch_size=200, flush_interval=None)
+        with mock.patch.multiple(
+            "apps.api.views",
+            radio_service=api_service,
+            play_queue=queue,
+            feedback_buffer=buffer,
+        ):
+            for name, fn in benchmarks.items():
+                if only and name not in only:
+                    continue
+                result = measure(fn, iterations, warmup, max_seconds)
+                results.append({"size": size, "case": name, **result})
+                log(
+                    f"{size:>7} {name:<26} {result['throughput']:>9.1f}/s "
+                    f"p50 {result['p50_ms']:.2f}ms p99 {result['p99_ms']:.2f}ms "
+                    f"{result['queries']:.1f} queries"
+                )
+            buffer.flush()
+        api_service.state.flush()
+    clear_library()
+    return {"meta": metadata(), "results": results}
+
+
+def metadata() -> Dict[str, object]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "machine": platform.machine(),
+    }
+
+
+def compare(
+    before: Dict[str, object], after: Dict[str, object], threshold: float = 0.1
+) -> List[Dict[str, object]]:
+    """Pair up results of two reports and flag p50 slowdowns over ``threshold``."""
+    old = {(r["size"], r["case"]): r for r in before["results"]}
+    rows = []
+    for new in after["results"]:
+        prev = old.get((new["size"], new["case"]))
+        if prev is None:
+            continue
+        change = new["p50_ms"] / prev["p50_ms"] - 1 if prev["p50_ms"] else 0.0
+        rows.append(
+            {
+                "size": new["size"],
+                "case": new["case"],
+                "p50_before": prev["p50_ms"],
+                "p50_after": new["p50_ms"],
+                "change": change,
+                "queries_before": prev["queries"],
+                "queries_after": new["queries"],
+                "regression": change > threshold or new["queries"] > prev["queries"],
+            }
+        )
+    return rows
+
+
+def load(path: str) -> Dict[str, object]:
+    with open(path) as fh:
+        return json.load(fh)
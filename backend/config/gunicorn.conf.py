@@ -1,3 +1,24 @@
+# Pre-fork warm start: the master imports the application and builds the
+# radio index once (apps.radio.prefork); workers inherit it copy-on-write.
+# Set SUITUNE_INDEX_PATH so the index is memory-mapped and stays shared
+# after library changes too. SUITUNE_PRELOAD=false loads per worker.
+import os
+
 bind = "0.0.0.0:8000"
 workers = 4
 wsgi_app = "suitune.wsgi:application"
+preload_app = os.environ.get("SUITUNE_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+
+def when_ready(server):
+    if preload_app:
+        from apps.radio.prefork import warm_start
+
+        warm_start()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from apps.radio.prefork import after_fork
+
+        after_fork()
@@ -0,0 +1,38 @@
+# ASGI deployment: gunicorn supervising uvicorn workers.
+#
+#   SUITUNE_ASYNC_API=true gunicorn -c config/gunicorn_asgi.conf.py
+#
+# Each worker runs one event loop. With SUITUNE_ASYNC_API the /api/next,
+# /api/feedback and /api/me views are native coroutines, so idle long-polls
+# (``/api/next?wait=30``) cost a socket and a task, not a thread. Everything
+# else (DRF viewsets, admin) still runs in Django's sync thread pool.
+#
+# Workers are forked from a warmed-up master as in config/gunicorn.conf.py.
+#
+# Without gunicorn: uvicorn suitune.asgi:application --workers 2 --port 8000
+import multiprocessing
+import os
+
+bind = "0.0.0.0:8000"
+workers = min(multiprocessing.cpu_count(), 4)
+worker_class = "uvicorn.workers.UvicornWorker"
+wsgi_app = "suitune.asgi:application"
+# Long-polls hold a request open for up to 30 s; give them room.
+timeout = 60
+graceful_timeout = 30
+keepalive = 75
+preload_app = os.environ.get("SUITUNE_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+
+def when_ready(server):
+    if preload_app:
+        from apps.radio.prefork import warm_start
+
+        warm_start()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from apps.radio.prefork import after_fork
+
+        after_fork()
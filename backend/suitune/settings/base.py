@@ -31,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "apps.core.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -65,8 +66,86 @@ DATABASES = {
     "default": env.db("DATABASE_URL", default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
 }
 
-REST_FRAMEWORK = {"DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.AllowAny"]}
+REST_FRAMEWORK = {
+    "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.AllowAny"],
+}
 
 CORS_ALLOW_ALL_ORIGINS = True
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Shared between workers and management commands in production, e.g.
+# redis://127.0.0.1:6379/1 or filecache:///var/tmp/suitune. The catalog
+# version lives in the database, so a per-process cache never serves stale
+# catalog bodies; it only caches each body once per worker.
+CACHES = {"default": env.cache("SUITUNE_CACHE_URL", default="locmemcache://")}
+SUITUNE_CATALOG_CACHE = "default"
+SUITUNE_CATALOG_CACHE_TIMEOUT = 60 * 60
+# How long a process trusts the catalog version it read from the database.
+SUITUNE_CATALOG_CHECK_INTERVAL = 2.0
+
+SUITUNE_MEDIA_ROOT = env("SUITUNE_MEDIA_ROOT", default="/srv/media")
+SUITUNE_STREAM_PREFIX = env("SUITUNE_STREAM_PREFIX", default="/sui_stream/")
+SUITUNE_SIGNING_SECRET = env("SUITUNE_SIGNING_SECRET", default=SECRET_KEY)
+# Long enough to cover a lookahead queue plus seeking in long talk shows.
+SUITUNE_STREAM_TTL = env.int("SUITUNE_STREAM_TTL", default=4 * 60 * 60)
+# Serve streams and artwork from Django (apps.core.media) instead of handing
+# them to Nginx with X-Accel-Redirect; for installs without Nginx in front.
+SUITUNE_SERVE_MEDIA = env.bool("SUITUNE_SERVE_MEDIA", default=False)
+SUITUNE_ARTWORK_ROOT = env("SUITUNE_ARTWORK_ROOT", default=str(BASE_DIR / "artwork"))
+SUITUNE_ARTWORK_PREFIX = env("SUITUNE_ARTWORK_PREFIX", default="/sui_artwork/")
+SUITUNE_ARTWORK_SIZES = (96, 256, 512)
+
+# Audio analysis (manage.py analyze_library): decoder binary and how much of
+# each track is analysed.
+SUITUNE_FFMPEG = env("SUITUNE_FFMPEG", default="ffmpeg")
+SUITUNE_FEATURE_MAX_SECONDS = env.float("SUITUNE_FEATURE_MAX_SECONDS", default=600.0)
+# Directory the similarity matrix for ?seed= is saved to and memory-mapped
+# from; empty to rebuild it from the database in every process.
+SUITUNE_SIMILARITY_PATH = env("SUITUNE_SIMILARITY_PATH", default="")
+# Directory the radio track index is saved to and memory-mapped from, so
+# workers share one copy (see apps.radio.prefork); empty to keep it private.
+SUITUNE_INDEX_PATH = env("SUITUNE_INDEX_PATH", default="")
+
+# Serve /api/next, /api/feedback and /api/me from async views; enable when
+# running under ASGI (config/gunicorn_asgi.conf.py).
+SUITUNE_ASYNC_API = env.bool("SUITUNE_ASYNC_API", default=False)
+
+# Request timing and the Prometheus histograms at /api/metrics, which is only
+# served with a token and requires ``Authorization: Bearer <token>``.
+# Server-Timing response headers reveal internals; they are off unless DEBUG.
+SUITUNE_METRICS_ENABLED = env.bool("SUITUNE_METRICS_ENABLED", default=True)
+SUITUNE_METRICS_TOKEN = env("SUITUNE_METRICS_TOKEN", default="")
+SUITUNE_SERVER_TIMING = env.bool("SUITUNE_SERVER_TIMING", default=DEBUG)
+SUITUNE_SLOW_REQUEST_MS = env.int("SUITUNE_SLOW_REQUEST_MS", default=1000)
+
+SUITUNE_RADIO_STATE = {
+    "BACKEND": env(
+        "SUITUNE_RADIO_STATE_BACKEND", default="apps.radio.state.MemoryStateBackend"
+    ),
+    "OPTIONS": {},
+}
+
+# Cooldown windows per channel: plays (``size``) and/or ``seconds`` during
+# which a track, artist or album is not picked again.
+SUITUNE_RADIO_COOLDOWNS = {
+    "track": {"size": 20},
+    "artist": {"size": 2},
+}
+
+SUITUNE_RADIO_QUEUE = {"size": 10, "low_water": 5}
+SUITUNE_FEEDBACK_BUFFER = {"batch_size": 200, "flush_interval": 5.0}
+# Radio scores are rebuilt from Feedback at startup, from the newest snapshot
+# on; a restore replaying ``snapshot_every`` rows writes a new one. None to
+# start with empty scores.
+SUITUNE_SCORE_HISTORY = {"chunk_size": 2000, "snapshot_every": 10000, "keep": 3}
+# Personal scores of signed-in listeners (apps.radio.profiles): memory cap of
+# the profile LRU, ratings until a listener's own taste weighs as much as the
+# channel's, and seconds before a cached profile is reloaded.
+SUITUNE_RADIO_PROFILES = {"max_bytes": 32 * 2**20, "cold_start": 10, "max_age": 300}
+# Track search (apps.library.search): "fts5" needs the SQLite FTS5 table made
+# by the library migrations, "trigram" keeps an index in every process, and
+# "auto" uses FTS5 where available.
+SUITUNE_SEARCH_BACKEND = env("SUITUNE_SEARCH_BACKEND", default="auto")
+# Local hours [start, end) counted as night listening in /api/stats.
+SUITUNE_STATS_NIGHT_HOURS = (22, 6)
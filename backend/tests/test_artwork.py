@@ -0,0 +1,98 @@
+import io
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from apps.library import artwork
+from apps.library.models import Track
+from apps.library.scanner import LibraryScanner
+
+
+def cover(path: Path, color) -> None:
+    Image.new("RGB", (600, 600), color).save(path, "JPEG")
+
+
+class ArtworkTest(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        cache = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.addCleanup(cache.cleanup)
+        self.root = Path(media.name)
+        self.cache = Path(cache.name)
+        settings = override_settings(
+            SUITUNE_ARTWORK_ROOT=cache.name, SUITUNE_ARTWORK_SIZES=(96, 256)
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        artwork._done.clear()
+        artwork._broken.clear()
+        for album, color in (("One", "red"), ("Two", "blue")):
+            (self.root / album).mkdir()
+            cover(self.root / album / "cover.jpg", color)
+            for n in range(3):
+                (self.root / album / f"{n}.mp3").write_bytes(b"not really audio")
+        (self.root / "loose.ogg").write_bytes(b"not really audio")
+        LibraryScanner(root=str(self.root), workers=1).scan()
+
+    def digest(self, path):
+        return Track.objects.get(path=path).artwork
+
+    def test_scan_renders_each_cover_once_per_size(self):
+        digests = set(
+            Track.objects.exclude(artwork="").values_list("artwork", flat=True)
+        )
+        self.assertEqual(len(digests), 2)
+        self.assertEqual(self.digest("loose.ogg"), "")
+        self.assertEqual(self.digest("One/0.mp3"), self.digest("One/2.mp3"))
+        files = sorted(p.name for p in self.cache.rglob("*.jpg"))
+        self.assertEqual(len(files), 4)
+        with Image.open(self.cache / artwork.relative_path(min(digests), 96)) as image:
+            self.assertEqual(image.size, (96, 96))
+
+    def test_serializer_links_to_immutable_url(self):
+        track = Track.objects.get(path="One/0.mp3")
+        data = self.client.get(f"/api/tracks/{track.pk}/").json()
+        self.assertEqual(data["artwork"], f"/api/artwork/{track.artwork}/256.jpg")
+        loose = Track.objects.get(path="loose.ogg")
+        self.assertIsNone(self.client.get(f"/api/tracks/{loose.pk}/").json()["artwork"])
+
+    def test_track_redirect_picks_smallest_sufficient_size(self):
+        track = Track.objects.get(path="Two/1.mp3")
+        response = self.client.get(f"/api/artwork/{track.pk}?size=50")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], f"/api/artwork/{track.artwork}/96.jpg")
+        loose = Track.objects.get(path="loose.ogg")
+        self.assertEqual(self.client.get(f"/api/artwork/{loose.pk}").status_code, 404)
+
+    def test_file_is_served_by_nginx_and_cached_forever(self):
+        digest = self.digest("One/0.mp3")
+        response = self.client.get(f"/api/artwork/{digest}/256.jpg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/sui_artwork/{digest[:2]}/{digest}-256.jpg"
+        )
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(
+            self.client.get(f"/api/artwork/{digest}/100.jpg").status_code, 404
+        )
+        self.assertEqual(
+            self.client.get("/api/artwork/nothex/256.jpg").status_code, 404
+        )
+
+    def test_prune_removes_unreferenced_artwork(self):
+        shutil.rmtree(self.root / "Two")
+        out = io.StringIO()
+        call_command(
+            "scan_library",
+            root=str(self.root),
+            workers=1,
+            prune_artwork=True,
+            stdout=out,
+        )
+        self.assertIn("Pruned 2", out.getvalue())
+        self.assertEqual(len(list(self.cache.rglob("*.jpg"))), 2)
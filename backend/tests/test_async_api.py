@@ -0,0 +1,139 @@
+import asyncio
+import json
+import random
+import threading
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.test import AsyncRequestFactory, TestCase
+
+from apps.api import async_views
+from apps.core.concurrency import call_unblocked
+from apps.library.models import Track
+from apps.playback.ingest import FeedbackBuffer
+from apps.playback.models import Feedback
+from apps.radio.queue import QueueManager
+from apps.radio.services import RadioService
+
+
+async def anonymous():
+    return AnonymousUser()
+
+
+class AsyncApiTest(TestCase):
+    def setUp(self):
+        self.tracks = [
+            Track.objects.create(title=f"T{i}", artist=f"A{i}", audio_url=f"u{i}")
+            for i in range(3)
+        ]
+        self.service = RadioService(cooldown_size=3, rng=random.Random(5))
+        self.queue = QueueManager(self.service, background=False)
+        self.buffer = FeedbackBuffer(batch_size=1000, flush_interval=None)
+        patcher = mock.patch.multiple(
+            "apps.api.async_views",
+            radio_service=self.service,
+            play_queue=self.queue,
+            feedback_buffer=self.buffer,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = AsyncRequestFactory()
+
+    def request(self, method, path, **kwargs):
+        request = getattr(self.factory, method)(path, **kwargs)
+        request.session = SessionStore()
+        request.auser = anonymous
+        return request
+
+    async def test_next_returns_distinct_tracks_then_no_content(self):
+        seen = set()
+        for _ in range(3):
+            response = await async_views.next_track(self.request("get", "/api/next"))
+            self.assertEqual(response.status_code, 200)
+            payload = json.loads(response.content)
+            self.assertEqual(payload["stream_url"], payload["track"]["audio_url"])
+            seen.add(payload["track"]["id"])
+        self.assertEqual(seen, {t.id for t in self.tracks})
+        response = await async_views.next_track(self.request("get", "/api/next"))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_next_batch_and_validation(self):
+        response = await async_views.next_track(
+            self.request("get", "/api/next", data={"count": 2})
+        )
+        self.assertEqual(len(json.loads(response.content)["tracks"]), 2)
+        response = await async_views.next_track(
+            self.request("get", "/api/next", data={"count": 0})
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_feedback_updates_scores_and_buffers(self):
+        events = [
+            {"track_id": self.tracks[0].id, "action": "like"},
+            {"track_id": self.tracks[1].id, "liked": False},
+        ]
+        response = await async_views.feedback(
+            self.request(
+                "post", "/api/feedback", data=events, content_type="application/json"
+            )
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.content)["count"], 2)
+        self.assertEqual(self.service.scores["default"][self.tracks[0].id], 1.0)
+        self.assertEqual(len(self.buffer), 2)
+        self.assertNotIn(self.tracks[1].id, await self.service.areserve("default", 3))
+        self.assertEqual(await sync_to_async(self.buffer.flush)(), 2)
+        self.assertEqual(await Feedback.objects.filter(action="ban").acount(), 1)
+
+    async def test_held_lock_moves_work_off_the_loop(self):
+        loop_thread = threading.get_ident()
+        ran_in = []
+        lock = threading.RLock()
+        acquired, release = threading.Event(), threading.Event()
+
+        def holder():
+            with lock:
+                acquired.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=holder)
+        thread.start()
+        acquired.wait(5)
+
+        def work():
+            with lock:
+                ran_in.append(threading.get_ident())
+
+        pending = asyncio.ensure_future(call_unblocked((lock,), work))
+        await asyncio.sleep(0.05)
+        release.set()
+        await pending
+        thread.join()
+        await call_unblocked((lock,), work)
+        self.assertNotEqual(ran_in[0], loop_thread)
+        self.assertEqual(ran_in[1], loop_thread)
+
+    async def test_inline_take_leaves_refreshes_to_worker_threads(self):
+        await self.queue.atake("default")
+        self.service.index.invalidate()
+        self.service.channels._stale = True
+        self.service._synced_at -= self.service.sync_interval
+        # Runs on the event loop, as atake() does when the locks are free.
+        self.assertEqual(len(self.queue.take("default")), 1)
+        self.assertTrue(self.service.index.needs_io())
+        await self.queue.atake("default")
+        self.assertFalse(self.service.index.needs_io())
+
+    async def test_feedback_rejects_bad_json(self):
+        response = await async_views.feedback(
+            self.request(
+                "post", "/api/feedback", data="{", content_type="application/json"
+            )
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_me_is_anonymous(self):
+        response = await async_views.me(self.request("get", "/api/me"))
+        self.assertEqual(json.loads(response.content), {"username": None})
@@ -0,0 +1,116 @@
+import io
+import tempfile
+import wave
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.library import features
+from apps.library.features import (
+    FEATURE_NAMES,
+    SAMPLE_RATE,
+    FeatureAccumulator,
+    analyse,
+    decode,
+    feature_vector,
+)
+from apps.library.models import Track, TrackFeature
+
+
+def write_wav(path, seconds=12.0, bpm=120.0, pitch=440.0):
+    """A sine tone with a noise click on every beat, 16-bit mono."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pcm = 0.3 * np.sin(2 * np.pi * pitch * t)
+    click = int(0.01 * SAMPLE_RATE)
+    for start in np.arange(0, seconds, 60.0 / bpm):
+        i = int(start * SAMPLE_RATE)
+        pcm[i : i + click] += rng.uniform(-0.6, 0.6, len(pcm[i : i + click]))
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((np.clip(pcm, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+class FeatureAccumulatorTest(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "beat.wav"
+        write_wav(self.path)
+
+    def test_tempo_and_pitch_class_are_found(self):
+        vector = analyse(str(self.path))
+        self.assertEqual(vector.dtype, np.float32)
+        self.assertEqual(len(vector), len(FEATURE_NAMES))
+        self.assertAlmostEqual(float(vector[0]), 120.0, delta=2.0)
+        chroma = vector[FEATURE_NAMES.index("chroma_C") :]
+        self.assertEqual(int(np.argmax(chroma)), 9)  # A
+
+    def test_chunk_size_does_not_change_the_result(self):
+        big = analyse(str(self.path), chunk_frames=65536)
+        small = analyse(str(self.path), chunk_frames=999)
+        self.assertTrue(np.allclose(big, small, rtol=1e-4, atol=1e-6))
+
+    def test_state_stays_bounded(self):
+        accumulator = FeatureAccumulator()
+        accumulator.max_envelope = 100
+        for pcm in decode(str(self.path), chunk_frames=4096):
+            self.assertLessEqual(len(pcm), 4096)
+            accumulator.update(pcm)
+            self.assertLess(len(accumulator.tail), features.FRAME_SIZE)
+        self.assertEqual(accumulator.envelope_frames, 100)
+
+
+@override_settings(SUITUNE_FFMPEG="/nonexistent/ffmpeg")
+class AnalyzeLibraryTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        write_wav(self.root / "a.wav", seconds=6)
+        write_wav(self.root / "b.wav", seconds=6, bpm=90, pitch=261.63)
+        (self.root / "broken.mp3").write_bytes(b"not really audio")
+        self.tracks = {
+            name: Track.objects.create(
+                title=name, audio_url=f"/{name}", path=name, file_mtime_ns=1
+            )
+            for name in ("a.wav", "b.wav", "broken.mp3")
+        }
+
+    def analyse(self, *args):
+        out = io.StringIO()
+        call_command(
+            "analyze_library", *args, root=str(self.root), workers=1, stdout=out
+        )
+        return out.getvalue()
+
+    def test_only_stale_tracks_are_analysed(self):
+        self.assertIn("Analysed 2 tracks (1 failed)", self.analyse())
+        feature = TrackFeature.objects.get(track=self.tracks["b.wav"])
+        self.assertAlmostEqual(feature.bpm, 90.0, delta=2.0)
+        self.assertEqual(int(np.argmax(feature_vector(feature)[7:])), 0)  # C
+        self.assertIn(
+            "ffmpeg", TrackFeature.objects.get(pk=self.tracks["broken.mp3"]).error
+        )
+
+        self.assertIn("Analysed 0 tracks (0 failed)", self.analyse())
+        self.assertIn("Analysed 0 tracks (1 failed)", self.analyse("--retry-failed"))
+
+        Track.objects.filter(path="a.wav").update(file_mtime_ns=2)
+        self.assertIn("Analysed 1 tracks", self.analyse())
+        bumped = features.FEATURE_VERSION + 1
+        with mock.patch.object(features, "FEATURE_VERSION", bumped):
+            self.assertIn("Analysed 2 tracks (1 failed)", self.analyse())
+            self.assertEqual(TrackFeature.objects.filter(version=bumped).count(), 3)
+
+    def test_pool_results_match_inline_results(self):
+        out = io.StringIO()
+        call_command("analyze_library", root=str(self.root), workers=2, stdout=out)
+        self.assertIn("Analysed 2 tracks", out.getvalue())
+        stored = feature_vector(TrackFeature.objects.get(track=self.tracks["a.wav"]))
+        self.assertTrue(np.allclose(stored, analyse(str(self.root / "a.wav"))))
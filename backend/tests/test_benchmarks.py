@@ -0,0 +1,24 @@
+from django.test import TestCase
+
+from apps.library.models import Track
+from benchmarks.runner import compare, run
+
+
+class BenchmarkSuiteTest(TestCase):
+    def test_report_covers_every_case_and_size(self):
+        report = run(sizes=[30, 60], iterations=3, warmup=1)
+        cases = {(r["size"], r["case"]) for r in report["results"]}
+        self.assertEqual(len(cases), 18)
+        for result in report["results"]:
+            self.assertEqual(result["iterations"], 3)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+        self.assertIn("commit", report["meta"])
+        self.assertFalse(Track.objects.exists())
+
+    def test_compare_flags_slowdowns_and_extra_queries(self):
+        before = {"results": [{"size": 1, "case": "x", "p50_ms": 1.0, "queries": 1}]}
+        after = {"results": [{"size": 1, "case": "x", "p50_ms": 1.05, "queries": 2}]}
+        (row,) = compare(before, after)
+        self.assertTrue(row["regression"])
+        after["results"][0]["queries"] = 1
+        self.assertFalse(compare(before, after)[0]["regression"])
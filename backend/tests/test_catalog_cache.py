@@ -0,0 +1,78 @@
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.http import http_date
+
+from apps.core.catalog import catalog_version
+from apps.core.models import CatalogVersion
+from apps.library.models import Track
+from apps.library.signals import library_changed
+from apps.radio.models import Channel
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(3):
+            Track.objects.create(title=f"T{i}", artist="A", audio_url=f"u{i}")
+
+    def test_revalidation_is_a_304_without_queries(self):
+        first = self.client.get("/api/tracks/")
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/tracks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_bodies_are_served_from_cache(self):
+        first = self.client.get("/api/tracks/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/tracks/")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["Content-Type"], first["Content-Type"])
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_writes_and_scans_change_the_version(self):
+        etag = self.client.get("/api/tracks/")["ETag"]
+        Track.objects.create(title="new", audio_url="u")
+        response = self.client.get("/api/tracks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 4)
+        version = catalog_version()
+        library_changed.send(sender=None)
+        self.assertNotEqual(catalog_version(), version)
+        Channel.objects.create(name="jazz")
+        self.assertEqual(
+            [c["name"] for c in self.client.get("/api/channels/").json()],
+            ["jazz"],
+        )
+
+    def test_changes_from_other_processes_are_served(self):
+        first = self.client.get("/api/tracks/")
+        # Another worker or a scan: no signal reaches this process.
+        Track.objects.bulk_create([Track(title="new", audio_url="u")])
+        CatalogVersion.objects.update(token="elsewhere", changed_at=time.time())
+        with self.settings(SUITUNE_CATALOG_CHECK_INTERVAL=0):
+            response = self.client.get("/api/tracks/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+        self.assertEqual(len(response.json()["results"]), 4)
+
+    def test_etag_depends_on_query(self):
+        a = self.client.get("/api/tracks/", {"page_size": 1})
+        b = self.client.get("/api/tracks/", {"page_size": 2})
+        self.assertNotEqual(a["ETag"], b["ETag"])
+        self.assertEqual(len(b.json()["results"]), 2)
+
+    def test_if_modified_since(self):
+        _, modified = catalog_version()
+        response = self.client.get(
+            "/api/tracks/", HTTP_IF_MODIFIED_SINCE=http_date(modified + 1)
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            "/api/tracks/", HTTP_IF_MODIFIED_SINCE=http_date(modified - 10)
+        )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,74 @@
+from django.test import TestCase
+
+from apps.core.models import CatalogVersion
+from apps.library.models import Track
+from apps.radio.channels import ChannelRegistry, channel_registry
+from apps.radio.models import Channel, RatingWeight
+from apps.radio.services import RadioService, apply_channel_rating
+
+
+class ChannelSnapshotTest(TestCase):
+    def setUp(self):
+        channel_registry.invalidate()
+        self.addCleanup(channel_registry.invalidate)
+        self.jazz = Channel.objects.create(name="jazz", exploration=0.5)
+        RatingWeight.objects.create(channel=self.jazz, positive=2.0, negative=0.5)
+        Channel.objects.create(name="talk", cooldowns={"artist": {"size": 1}})
+
+    def test_snapshot_is_built_in_one_query_and_then_free(self):
+        with self.assertNumQueries(1):
+            snapshot = channel_registry.snapshot()
+        self.assertEqual(len(snapshot), 2)
+        with self.assertNumQueries(0):
+            params = channel_registry.get("jazz").params
+            self.assertEqual(apply_channel_rating(self.jazz, -2), -1.0)
+            self.assertEqual(channel_registry.get("unknown").id, None)
+        self.assertEqual((params.positive, params.exploration), (2.0, 0.5))
+
+    def test_changes_swap_in_a_new_snapshot(self):
+        before = channel_registry.snapshot()
+        self.jazz.exploration = 0.1
+        self.jazz.save()
+        after = channel_registry.snapshot()
+        self.assertIsNot(after, before)
+        self.assertEqual(before.get("jazz").params.exploration, 0.5)
+        self.assertEqual(after.get("jazz").params.exploration, 0.1)
+
+    def test_other_processes_are_noticed_through_catalog_version(self):
+        registry = ChannelRegistry(check_interval=0)
+        first = registry.snapshot()
+        self.assertIs(registry.snapshot(), first)
+        Channel.objects.filter(pk=self.jazz.pk).update(exploration=0.1)
+        CatalogVersion.objects.update(token="elsewhere")
+        self.assertEqual(registry.get("jazz").params.exploration, 0.1)
+
+    def test_channels_can_be_addressed_by_id(self):
+        snapshot = channel_registry.snapshot()
+        self.assertEqual(snapshot.resolve(str(self.jazz.pk)), "jazz")
+        self.assertEqual(snapshot.resolve("jazz"), "jazz")
+        self.assertEqual(snapshot.resolve("9999"), "9999")
+
+    def test_channel_cooldowns_override_service_defaults(self):
+        for i in range(3):
+            Track.objects.create(title=f"T{i}", artist=f"A{i % 2}", audio_url=f"u{i}")
+        service = RadioService(cooldowns={"track": {"size": 1}})
+        service.reserve("talk")
+        self.assertEqual(set(service.cooldowns["talk"]), {"track", "artist"})
+        self.assertEqual(set(service.cooldowns["jazz"]), {"track"})
+
+        picked = service.reserve("jazz")[0]
+        service.mark_played("jazz", picked)
+        Channel.objects.filter(pk=self.jazz.pk).update(cooldowns={"track": {"size": 0}})
+        channel_registry.invalidate()
+        service.weights("jazz")
+        self.assertEqual(service.cooldowns["jazz"], {})
+        self.assertTrue(service.is_eligible("jazz", picked))
+
+    def test_api_validates_cooldowns(self):
+        response = self.client.post(
+            "/api/channels/",
+            {"name": "bad", "cooldowns": {"mood": {"size": 1}}},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cooldowns", response.json())
@@ -0,0 +1,133 @@
+import io
+import random
+import tempfile
+import wave
+from pathlib import Path
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.library.duplicates import (
+    DUPLICATE_BER,
+    LSH_BLOCKS,
+    bit_error_rate,
+    candidate_pairs,
+)
+from apps.library.features import SAMPLE_RATE, FeatureAccumulator
+from apps.library.models import Track
+from apps.radio.index import TrackIndex
+from apps.radio.services import RadioService
+
+
+def song(seed, seconds=12.0):
+    """Random four-note chords with overtones over noise, one every 300 ms."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(0.3 * SAMPLE_RATE)) / SAMPLE_RATE
+    chords = []
+    for _ in range(int(seconds / 0.3)):
+        freqs = 440.0 * 2 ** ((rng.integers(40, 84, 4) - 69) / 12)
+        chord = sum(
+            0.1 / h * np.sin(2 * np.pi * h * f * t) for f in freqs for h in (1, 2, 3)
+        )
+        chord += 0.05 * rng.standard_normal(len(t))
+        chords.append(chord * np.hanning(len(t)) ** 0.3)
+    return np.concatenate(chords)
+
+
+def reencode(pcm, seed=0):
+    """Quieter, duller, noisier and a little late: another rip of ``pcm``."""
+    rng = np.random.default_rng(seed)
+    pcm = 0.5 * np.convolve(pcm, np.ones(3) / 3, "same")
+    pcm = np.concatenate([np.zeros(int(0.04 * SAMPLE_RATE)), pcm])
+    return pcm + rng.normal(0, 0.005, len(pcm))
+
+
+def fingerprint(pcm):
+    accumulator = FeatureAccumulator()
+    for start in range(0, len(pcm), 4096):
+        accumulator.update(pcm[start : start + 4096].astype(np.float32))
+    return accumulator.fingerprinter.result()
+
+
+def write_wav(path, pcm):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((np.clip(pcm, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+class FingerprintTest(SimpleTestCase):
+    def test_copies_match_and_other_songs_do_not(self):
+        original = song(1)
+        words = fingerprint(original)
+        self.assertEqual(words.dtype, np.uint32)
+        self.assertGreaterEqual(len(words), LSH_BLOCKS)
+        self.assertLess(bit_error_rate(words, fingerprint(reencode(original))), 0.1)
+        self.assertGreater(
+            bit_error_rate(words, fingerprint(song(2))), DUPLICATE_BER + 0.05
+        )
+
+    def test_lsh_finds_near_copies_without_comparing_everything(self):
+        rng = np.random.default_rng(0)
+        words = rng.integers(0, 2**32, size=(2000, LSH_BLOCKS), dtype=np.uint32)
+        flips = rng.random((LSH_BLOCKS, 32)) < 0.05
+        noise = flips.astype(np.uint64) @ (
+            np.uint64(1) << np.arange(32, dtype=np.uint64)
+        )
+        copy = words[0] ^ noise.astype(np.uint32)
+        pairs = candidate_pairs(np.vstack([words, copy]))
+        self.assertIn((0, 2000), pairs)
+        self.assertLess(len(pairs), 100)
+
+
+@override_settings(SUITUNE_FFMPEG="/nonexistent/ffmpeg")
+class DuplicateClustersTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        write_wav(root / "album.wav", song(1))
+        write_wav(root / "best-of.wav", reencode(song(1)))
+        write_wav(root / "other.wav", song(2))
+        self.album, self.best_of, self.other = [
+            Track.objects.create(
+                title=name,
+                artist="A",
+                audio_url=f"/{name}",
+                path=name,
+                file_mtime_ns=1,
+                bitrate=bitrate,
+            )
+            for name, bitrate in [
+                ("album.wav", 128),
+                ("best-of.wav", 320),
+                ("other.wav", 128),
+            ]
+        ]
+        out = io.StringIO()
+        call_command("analyze_library", root=tmp.name, workers=1, stdout=out)
+        self.output = out.getvalue()
+
+    def test_analysis_marks_all_but_the_best_copy(self):
+        self.assertIn("Found 1 duplicate clusters (1 extra copies)", self.output)
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.duplicate_of, self.best_of)
+        self.assertEqual(list(self.best_of.duplicates.all()), [self.album])
+
+        out = io.StringIO()
+        call_command("find_duplicates", "--dry-run", stdout=out)
+        self.assertIn(f"{self.album.pk} {self.best_of.pk}", out.getvalue())
+
+    def test_radio_plays_one_copy_and_cools_down_all(self):
+        service = RadioService(
+            rng=random.Random(0), index=TrackIndex(), cooldowns={"track": {"size": 1}}
+        )
+        picks = {service.reserve("music")[0] for _ in range(50)}
+        self.assertEqual(picks, {self.best_of.pk, self.other.pk})
+        self.assertFalse(service.is_eligible("music", self.album.pk))
+
+        service.mark_played("music", self.album.pk)  # e.g. queued before the scan
+        self.assertFalse(service.is_eligible("music", self.best_of.pk))
+        self.assertEqual(service.reserve("music", count=2), [self.other.pk])
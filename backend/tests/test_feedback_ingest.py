@@ -0,0 +1,119 @@
+import json
+import threading
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.library.models import Track
+from apps.playback.ingest import FeedbackBuffer
+from apps.playback.models import Feedback, Playback
+from apps.radio.channels import channel_registry
+from apps.radio.services import RadioService
+
+
+class FeedbackEndpointTest(TestCase):
+    def setUp(self):
+        self.tracks = [
+            Track.objects.create(title=f"T{i}", artist="A", audio_url=f"u{i}")
+            for i in range(3)
+        ]
+        self.buffer = FeedbackBuffer(batch_size=100, flush_interval=None)
+        self.addCleanup(self.buffer.flush)
+        self.service = RadioService()
+        patcher = mock.patch.multiple(
+            "apps.api.views", feedback_buffer=self.buffer, radio_service=self.service
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        channel_registry.snapshot()
+
+    def post(self, payload):
+        return self.client.post(
+            "/api/feedback", json.dumps(payload), content_type="application/json"
+        )
+
+    def test_response_does_not_wait_for_the_database(self):
+        with self.assertNumQueries(0):
+            response = self.post({"track_id": self.tracks[0].id, "action": "like"})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(self.buffer), 1)
+        self.assertEqual(self.service.scores["default"][self.tracks[0].id], 1)
+
+    def test_offline_backlog_is_written_in_one_batch(self):
+        events = [
+            {
+                "track_id": self.tracks[i % 3].id,
+                "action": action,
+                "channel": "music",
+                "ts": f"2026-01-01T0{i}:00:00Z",
+            }
+            for i, action in enumerate(["skip", "complete", "like", "ban", "skip"])
+        ]
+        self.assertEqual(self.post(events).json()["count"], 5)
+        # lookup, savepoint, 2 inserts, 3 statistics updates, release
+        with self.assertNumQueries(8):
+            self.assertEqual(self.buffer.flush(), 5)
+        self.assertEqual(Feedback.objects.count(), 5)
+        self.assertEqual(Playback.objects.filter(skipped=True).count(), 2)
+        skip = Feedback.objects.filter(action="skip").first()
+        self.assertEqual(skip.playback.track_id, skip.track_id)
+        self.assertEqual(skip.created_at.hour, 0)
+
+    def test_legacy_liked_payload_is_accepted(self):
+        self.post({"track_id": self.tracks[1].id, "liked": False})
+        self.buffer.flush()
+        self.assertEqual(Feedback.objects.get().action, "ban")
+
+    def test_invalid_events_are_rejected(self):
+        self.assertEqual(
+            self.post({"track_id": "x", "action": "like"}).status_code, 400
+        )
+        self.assertEqual(self.post([{"track_id": 1, "action": "meh"}]).status_code, 400)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_unknown_tracks_are_dropped_on_flush(self):
+        self.post([{"track_id": 999, "action": "like"}])
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_buffer_flushes_when_full(self):
+        self.buffer.batch_size = 2
+        self.post([{"track_id": self.tracks[0].id, "action": "complete"}] * 2)
+        self.assertEqual(Playback.objects.count(), 2)
+
+    def test_failed_batch_is_retried_then_bad_events_are_dropped(self):
+        self.buffer.flush_interval = 60
+        good, bad = self.tracks[0].id, self.tracks[1].id
+        write = self.buffer._write
+
+        def fail_on_bad(events):
+            if any(e.track_id == bad for e in events):
+                raise RuntimeError("bad event")
+            return write(events)
+
+        self.post([{"track_id": good, "action": "like"}])
+        self.post([{"track_id": bad, "action": "like"}])
+        with mock.patch.object(self.buffer, "_write", side_effect=fail_on_bad):
+            with self.assertLogs("apps.playback.ingest", "ERROR"):
+                self.assertEqual(self.buffer.flush(), 0)
+            # The batch is kept and a flush scheduled again.
+            self.assertEqual(len(self.buffer), 2)
+            self.assertIsNotNone(self.buffer._timer)
+            with self.assertLogs("apps.playback.ingest", "ERROR"):
+                self.assertEqual(self.buffer.flush(), 0)
+            with self.assertLogs("apps.playback.ingest", "ERROR") as logs:
+                self.assertEqual(self.buffer.flush(), 1)
+        self.assertIn("Dropping feedback event", logs.output[-1])
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(Feedback.objects.get().track_id, good)
+
+    def test_flushes_wait_while_settled(self):
+        self.post([{"track_id": self.tracks[0].id, "action": "like"}])
+        with mock.patch.object(self.buffer, "_write", side_effect=len):
+            with self.buffer.settled():
+                flush = threading.Thread(target=self.buffer.flush)
+                flush.start()
+                flush.join(0.1)
+                self.assertTrue(flush.is_alive())
+                self.assertEqual(len(self.buffer.pending()), 1)
+            flush.join(5)
+        self.assertEqual(self.buffer.pending(), [])
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.library.models import Track
+from apps.playback.models import Feedback, Playback
+from apps.radio.models import Channel
+
+
+class HistoryPaginationTest(TestCase):
+    def setUp(self):
+        self.tracks = [
+            Track.objects.create(title=f"T{i}", artist=f"A{i}", audio_url=f"u{i}")
+            for i in range(3)
+        ]
+        self.now = timezone.now().replace(microsecond=123456)
+        # Pairs of plays share a timestamp so ties must be broken by id.
+        Playback.objects.bulk_create(
+            Playback(
+                track=self.tracks[i % 3],
+                channel="night" if i % 2 else "day",
+                started_at=self.now - timedelta(minutes=i // 2),
+            )
+            for i in range(25)
+        )
+
+    def walk(self, url):
+        rows = []
+        while url:
+            with self.assertNumQueries(1):
+                payload = self.client.get(url).json()
+            rows.extend(payload["results"])
+            url = payload["next"]
+        return rows
+
+    def test_pages_cover_every_row_newest_first(self):
+        rows = self.walk("/api/playbacks/?page_size=4")
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(len({r["id"] for r in rows}), 25)
+        keys = [(r["started_at"], r["id"]) for r in rows]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        titles = {t.id: t.title for t in self.tracks}
+        self.assertEqual(rows[0]["track_title"], titles[rows[0]["track"]])
+
+    def test_filters(self):
+        rows = self.walk("/api/playbacks/?channel=night&page_size=5")
+        self.assertEqual(len(rows), 12)
+        self.assertTrue(all(r["channel"] == "night" for r in rows))
+        since = (self.now - timedelta(minutes=2)).isoformat()
+        response = self.client.get("/api/playbacks/", {"since": since})
+        self.assertEqual(len(response.json()["results"]), 6)
+        for params in (
+            {"since": "not-a-date"},
+            {"until": "2024-13-45"},
+            {"since": "2024-02-30T10:00:00"},
+            {"user": "abc"},
+            {"track": "1.5"},
+        ):
+            response = self.client.get("/api/playbacks/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_user_filter_and_anonymous(self):
+        user = get_user_model().objects.create(username="u")
+        Playback.objects.filter(channel="day").update(user=user)
+        self.assertEqual(len(self.walk(f"/api/playbacks/?user={user.pk}")), 13)
+        self.assertEqual(len(self.walk("/api/playbacks/?user=")), 12)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get("/api/playbacks/", {"cursor": "bm9wZQ"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_feedback_and_tracks_are_paginated(self):
+        Feedback.objects.create(track=self.tracks[0], action="like", rating=1)
+        Feedback.objects.create(action="ban", rating=-1)
+        rows = self.walk("/api/feedback/?page_size=1")
+        self.assertEqual([r["action"] for r in rows], ["ban", "like"])
+        self.assertIsNone(rows[0]["track_title"])
+        self.assertEqual(len(self.walk("/api/feedback/?action=like")), 1)
+        rows = self.walk("/api/tracks/?page_size=2")
+        self.assertEqual([r["id"] for r in rows], [t.id for t in self.tracks])
+
+    def test_other_lists_are_not_paginated(self):
+        Channel.objects.create(name="jazz")
+        response = self.client.get("/api/channels/")
+        self.assertEqual([c["name"] for c in response.json()], ["jazz"])
+        self.assertEqual(self.client.get("/api/rating-weights/").json(), [])
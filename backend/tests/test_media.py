@@ -0,0 +1,154 @@
+import os
+import socket
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from apps.core.media import FileRange, parse_range
+from apps.playback.signing import get_signer
+
+BODY = bytes(range(256)) * 40  # 10240 bytes
+
+
+class ParseRangeTest(SimpleTestCase):
+    def test_single_ranges(self):
+        self.assertEqual(parse_range("bytes=0-", 100), (0, 99))
+        self.assertEqual(parse_range("bytes=10-19", 100), (10, 19))
+        self.assertEqual(parse_range("bytes=90-500", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-30", 100), (70, 99))
+        self.assertEqual(parse_range("bytes=-300", 100), (0, 99))
+
+    def test_ignored_and_unsatisfiable_ranges(self):
+        for header in ("bytes=0-1,5-9", "bytes=5-1", "items=0-1", "bytes=-"):
+            self.assertIsNone(parse_range(header, 100))
+        for header in ("bytes=100-", "bytes=-0"):
+            with self.assertRaises(ValueError):
+                parse_range(header, 100)
+
+
+class ServeMediaTest(SimpleTestCase):
+    path = "Artist/01 Song.mp3"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        (self.root / "Artist").mkdir()
+        (self.root / self.path).write_bytes(BODY)
+        patcher = override_settings(
+            SUITUNE_SERVE_MEDIA=True,
+            SUITUNE_MEDIA_ROOT=str(self.root),
+            SUITUNE_SIGNING_SECRET="s3cret",
+        )
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.url = get_signer().sign(7, self.path)
+
+    def get(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def assertPartial(self, response, start, end):
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes {start}-{end}/{len(BODY)}")
+        self.assertEqual(response["Content-Length"], str(end - start + 1))
+        self.assertEqual(self.body(response), BODY[start : end + 1])
+
+    def test_audio_element_probe_play_and_seek(self):
+        # Safari probes the first two bytes, then every browser asks for an
+        # open-ended range to play and another one from the seek position.
+        self.assertPartial(self.get(range="bytes=0-1"), 0, 1)
+        response = self.get(range="bytes=0-")
+        self.assertPartial(response, 0, len(BODY) - 1)
+        self.assertEqual(response["Content-Type"], "audio/mpeg")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertTrue(response["Cache-Control"].startswith("private, max-age="))
+        self.assertPartial(self.get(range="bytes=7000-"), 7000, len(BODY) - 1)
+        self.assertPartial(
+            self.get(range="bytes=-1000"), len(BODY) - 1000, len(BODY) - 1
+        )
+
+    def test_full_and_unsatisfiable_requests(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), BODY)
+        response = self.get(range="bytes=0-1,100-")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Length"], str(len(BODY)))
+        response = self.get(range=f"bytes={len(BODY)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(BODY)}")
+
+    def test_if_range_and_conditional_requests(self):
+        response = self.get(range="bytes=0-")
+        etag, modified = response["ETag"], response["Last-Modified"]
+        self.assertPartial(
+            self.get(range="bytes=100-", if_range=etag), 100, len(BODY) - 1
+        )
+        self.assertPartial(
+            self.get(range="bytes=100-", if_range=modified), 100, len(BODY) - 1
+        )
+        for stale in ('"0-0"', f"W/{etag}", http_date(0)):
+            response = self.get(range="bytes=100-", if_range=stale)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.body(response), BODY)
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        os.utime(self.root / self.path, ns=(1, 1))
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+
+    def test_head_and_missing_files(self):
+        response = self.client.head(self.url, headers={"range": "bytes=10-"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Length"], str(len(BODY) - 10))
+        self.assertEqual(response.content, b"")
+        (self.root / self.path).unlink()
+        self.assertEqual(self.get().status_code, 404)
+        url = get_signer().sign(7, "../secret")
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_wsgi_servers_can_sendfile_the_range(self):
+        response = self.get(range="bytes=4000-4999")
+        file_range = response.file_to_stream
+        self.assertIsInstance(file_range, FileRange)
+        # What gunicorn does with wsgi.file_wrapper: sendfile from the
+        # descriptor's offset for Content-Length bytes.
+        fd = file_range.fileno()
+        offset = os.lseek(fd, 0, os.SEEK_CUR)
+        count = int(response["Content-Length"])
+        a, b = socket.socketpair()
+        with a, b:
+            sent = 0
+            while sent < count:
+                sent += os.sendfile(a.fileno(), fd, offset + sent, count - sent)
+            received = b""
+            while len(received) < count:
+                received += b.recv(count)
+        response.close()
+        self.assertEqual(received, BODY[4000:5000])
+
+    async def test_asgi_streams_without_a_sync_iterator(self):
+        response = await self.async_client.get(
+            self.url, headers={"range": "bytes=9000-"}
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.is_async)
+        self.assertIsNone(response.file_to_stream)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(body, BODY[9000:])
+
+    def test_artwork_is_served_too(self):
+        digest = "ab" * 16
+        with self.settings(SUITUNE_ARTWORK_ROOT=str(self.root)):
+            (self.root / digest[:2]).mkdir()
+            (self.root / f"{digest[:2]}/{digest}-256.jpg").write_bytes(b"jpeg")
+            response = self.client.get(f"/api/artwork/{digest}/256.jpg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(self.body(response), b"jpeg")
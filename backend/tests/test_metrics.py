@@ -0,0 +1,95 @@
+import random
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+
+from apps.core import metrics
+from apps.core.middleware import MetricsMiddleware
+from apps.library.models import Track
+from apps.radio.queue import QueueManager
+from apps.radio.services import RadioService
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        metrics.registry.clear()
+        for i in range(3):
+            Track.objects.create(title=f"T{i}", artist=f"A{i}", audio_url=f"u{i}")
+        service = RadioService(rng=random.Random(3))
+        patcher = mock.patch.multiple(
+            "apps.api.views",
+            radio_service=service,
+            play_queue=QueueManager(service, background=False),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(SUITUNE_SERVER_TIMING=True)
+    def test_server_timing_breaks_down_next(self):
+        response = self.client.get("/api/next", {"channel": "jazz"})
+        self.assertEqual(response.status_code, 200)
+        timing = response["Server-Timing"]
+        for phase in ("db", "queue", "sample", "serialize", "total"):
+            self.assertIn(f"{phase};dur=", timing)
+        self.assertRegex(timing, r'desc="[1-9]\d* queries"')
+
+    def test_server_timing_is_off_by_default(self):
+        response = self.client.get("/api/next", {"channel": "jazz"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(SUITUNE_METRICS_TOKEN="s3cret")
+    def test_metrics_endpoint_renders_histograms(self):
+        self.client.get("/api/next", {"channel": "jazz"})
+        body = self.client.get(
+            "/api/metrics", HTTP_AUTHORIZATION="Bearer s3cret"
+        ).content.decode()
+        labels = 'channel="jazz",endpoint="api/next"'
+        self.assertIn(f"suitune_request_duration_seconds_count{{{labels}}} 1", body)
+        self.assertIn('phase="sample"', body)
+        self.assertIn(f'suitune_request_queries_bucket{{{labels},le="+Inf"}} 1', body)
+
+    @override_settings(SUITUNE_METRICS_TOKEN="s3cret")
+    def test_metrics_token_is_required(self):
+        self.assertEqual(self.client.get("/api/metrics").status_code, 401)
+        response = self.client.get("/api/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_endpoint_is_off_without_a_token(self):
+        self.assertEqual(self.client.get("/api/metrics").status_code, 404)
+
+    @override_settings(SUITUNE_SERVER_TIMING=True)
+    async def test_queries_in_worker_threads_are_counted(self):
+        async def view(request):
+            await Track.objects.acount()
+            await sync_to_async(Track.objects.count)()
+            return HttpResponse()
+
+        middleware = MetricsMiddleware(view)
+        response = await middleware(AsyncRequestFactory().get("/"))
+        self.assertIn('desc="2 queries"', response["Server-Timing"])
+
+    def test_queries_outside_requests_are_not_counted(self):
+        timings, token = metrics.start()
+        metrics.finish(timings, token, "test")
+        Track.objects.count()
+        self.assertEqual(timings.queries, 0)
+
+
+class PhaseTest(SimpleTestCase):
+    def test_phase_is_noop_outside_requests(self):
+        with metrics.phase("anything"):
+            pass
+        timings, token = metrics.start()
+        with metrics.phase("work"):
+            pass
+        metrics.finish(timings, token, "test")
+        self.assertIn("work", timings.phases)
+        self.assertIsNone(metrics._current.get())
@@ -0,0 +1,67 @@
+import random
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.library.models import Track
+from apps.radio.queue import QueueManager
+from apps.radio.services import RadioService
+
+
+class QueueManagerTest(TestCase):
+    def setUp(self):
+        self.tracks = [
+            Track.objects.create(title=f"T{i}", artist="A", audio_url=f"u{i}")
+            for i in range(8)
+        ]
+        self.service = RadioService(cooldown_size=3, rng=random.Random(7))
+        self.queue = QueueManager(self.service, size=4, low_water=2, background=False)
+
+    def test_take_returns_distinct_tracks_and_refills(self):
+        ids = self.queue.take("music", count=3)
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual(list(self.service.cooldowns["music"]["track"]), ids)
+        queue = self.queue._queues[("music", "", None, None)]
+        self.assertGreaterEqual(len(queue.items), 2)
+
+    def test_tracks_played_elsewhere_are_skipped(self):
+        self.queue.take("music", session="a")
+        queued = self.queue._queues[("music", "a", None, None)].items[0]
+        self.service.mark_played("music", queued)
+        self.assertNotIn(queued, self.queue.take("music", session="a", count=1))
+
+    def test_discard_drops_queued_entries(self):
+        self.queue.take("music")
+        queued = self.queue._queues[("music", "", None, None)].items[0]
+        self.queue.discard("music", queued)
+        self.assertNotIn(queued, self.queue._queues[("music", "", None, None)].items)
+
+
+class NextEndpointTest(TestCase):
+    def setUp(self):
+        for i in range(5):
+            Track.objects.create(title=f"T{i}", artist="A", audio_url=f"http://x/{i}")
+        service = RadioService(cooldown_size=2, rng=random.Random(1))
+        queue = QueueManager(service, size=5, low_water=2, background=False)
+        patcher = mock.patch.multiple(
+            "apps.api.views", radio_service=service, play_queue=queue
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_single_track_keeps_original_shape(self):
+        response = self.client.get("/api/next", {"channel": "music"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {"track", "stream_url"})
+
+    def test_batch_is_served_from_one_query(self):
+        self.client.get("/api/next", {"channel": "music", "count": 1})
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/next", {"channel": "music", "count": 3})
+        tracks = response.json()["tracks"]
+        self.assertEqual(len({item["track"]["id"] for item in tracks}), 3)
+        self.assertTrue(all(item["stream_url"] for item in tracks))
+
+    def test_count_is_validated(self):
+        response = self.client.get("/api/next", {"count": "lots"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,101 @@
+import io
+from datetime import datetime, timezone
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from apps.library.models import Track
+from apps.playback.ingest import FeedbackBuffer, FeedbackEvent
+from apps.playback.models import ChannelHourStats, Feedback
+
+UTC = timezone.utc
+
+
+def at(day, hour, minute=0):
+    return datetime(2026, 1, day, hour, minute, tzinfo=UTC)
+
+
+@override_settings(TIME_ZONE="UTC", SUITUNE_STATS_NIGHT_HOURS=(22, 6))
+class PlayStatsTest(TestCase):
+    def setUp(self):
+        self.a, self.b = [
+            Track.objects.create(title=f"T{i}", artist="A", audio_url=f"u{i}")
+            for i in range(2)
+        ]
+        buffer = FeedbackBuffer(flush_interval=None)
+        buffer.add(
+            FeedbackEvent(track.id, action, channel, moment)
+            for track, action, channel, moment in [
+                (self.a, "complete", "music", at(1, 23, 10)),
+                (self.a, "complete", "music", at(1, 23, 40)),
+                (self.a, "skip", "music", at(2, 12)),
+                (self.b, "skip", "music", at(2, 12, 5)),
+                (self.b, "like", "music", at(2, 12, 6)),
+                (self.b, "error", "music", at(2, 13)),
+                (self.b, "complete", "talk", at(2, 2)),
+            ]
+        )
+        buffer.flush()
+
+    def counters(self, track):
+        track.refresh_from_db()
+        return (
+            track.play_count,
+            track.skip_count,
+            track.complete_count,
+            track.last_played_at,
+        )
+
+    def test_events_update_track_counters(self):
+        self.assertEqual(self.counters(self.a), (3, 1, 2, at(2, 12)))
+        self.assertEqual(self.counters(self.b), (2, 1, 1, at(2, 12, 5)))
+
+    def test_events_update_hourly_rollups(self):
+        row = ChannelHourStats.objects.get(channel="music", hour=at(1, 23))
+        self.assertEqual((row.plays, row.completes), (2, 2))
+        row = ChannelHourStats.objects.get(channel="music", hour=at(2, 12))
+        self.assertEqual((row.plays, row.skips, row.likes), (2, 2, 1))
+        self.assertEqual(ChannelHourStats.objects.count(), 4)
+
+    def test_single_feedback_rows_are_counted_too(self):
+        Feedback.objects.create(
+            track=self.a, channel="talk", action="skip", rating=-1, created_at=at(3, 8)
+        )
+        self.assertEqual(self.counters(self.a), (4, 2, 2, at(3, 8)))
+        self.assertEqual(
+            ChannelHourStats.objects.get(channel="talk", hour=at(3, 8)).skips, 1
+        )
+
+    def test_rebuild_matches_incremental_statistics(self):
+        before = list(ChannelHourStats.objects.values_list())
+        expected = [self.counters(self.a), self.counters(self.b)]
+        Track.objects.update(play_count=0)
+        ChannelHourStats.objects.all().delete()
+        out = io.StringIO()
+        call_command("rebuild_stats", stdout=out)
+        self.assertIn("4 hourly rollups", out.getvalue())
+        after = list(ChannelHourStats.objects.values_list())
+        self.assertEqual([row[1:] for row in after], [row[1:] for row in before])
+        self.assertEqual([self.counters(self.a), self.counters(self.b)], expected)
+
+    def test_stats_endpoint_answers_from_rollups(self):
+        params = {"since": "2026-01-01", "until": "2026-01-03"}
+        with self.assertNumQueries(2):  # rollups, top tracks
+            data = self.client.get("/api/stats", params).json()
+        music = data["channels"][0]
+        self.assertEqual(music["channel"], "music")
+        self.assertEqual((music["plays"], music["errors"]), (4, 1))
+        self.assertEqual(music["completion_rate"], 0.5)
+        self.assertEqual(music["skip_rate"], 0.5)
+        self.assertEqual(music["error_rate"], 0.2)
+        self.assertEqual(music["night_share"], 0.5)
+        self.assertEqual(data["total"]["plays"], 5)
+        self.assertEqual(data["total"]["night_share"], 0.6)
+        self.assertEqual(data["top_tracks"][0]["id"], self.a.id)
+
+        talk = self.client.get("/api/stats", {**params, "channel": "talk"}).json()
+        self.assertEqual([c["channel"] for c in talk["channels"]], ["talk"])
+        empty = self.client.get(
+            "/api/stats", {"since": "2025-01-01", "until": "2025-01-02"}
+        )
+        self.assertIsNone(empty.json()["total"]["completion_rate"])
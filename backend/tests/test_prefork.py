@@ -0,0 +1,77 @@
+import gc
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase
+
+from apps.library.models import Track
+from apps.radio import prefork, radio_service
+from apps.radio.index import TrackIndex
+
+
+class SharedIndexTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = tmp.name
+        self.tracks = [
+            Track.objects.create(
+                title=f"T{i}", artist=f"A{i % 2}", album="Hits", audio_url=f"u{i}"
+            )
+            for i in range(4)
+        ]
+        Track.objects.filter(pk=self.tracks[3].pk).update(duplicate_of=self.tracks[0])
+
+    def test_first_build_is_saved_and_mapped_by_everyone(self):
+        built = TrackIndex(path=self.path)
+        self.assertTrue(built.ensure())
+        self.assertIsInstance(built.added_at, np.memmap)
+        self.assertIsInstance(built.ids, memoryview)
+        self.assertEqual(list(built.ids), [t.pk for t in self.tracks])
+
+        mapped = TrackIndex(path=self.path)
+        with self.assertNumQueries(0):
+            mapped.ensure()
+        pos = mapped.position(self.tracks[2].pk)
+        self.assertEqual(pos, 2)
+        self.assertIsNone(mapped.position(0))
+        self.assertEqual(mapped.album.name(pos), ("a0", "hits"))
+        self.assertEqual(list(mapped.artist.positions_of("a1")), [1, 3])
+        self.assertEqual(mapped.original(self.tracks[3].pk), self.tracks[0].pk)
+        self.assertEqual(list(mapped.hidden), [False, False, False, True])
+
+    def test_library_changes_are_built_once_and_mapped_elsewhere(self):
+        first = TrackIndex(path=self.path, check_interval=0)
+        second = TrackIndex(path=self.path, check_interval=0)
+        first.ensure()
+        second.ensure()
+        added = Track.objects.create(title="New", audio_url="u")
+        # The catalog version, then the tracks; the other index only checks
+        # the version.
+        with self.assertNumQueries(2):
+            self.assertTrue(first.ensure())
+        with self.assertNumQueries(1):
+            self.assertTrue(second.ensure())
+        self.assertEqual(second.position(added.pk), 4)
+        self.assertEqual(second.token, first.token)
+        self.assertLessEqual(len(list(Path(self.path).iterdir())), 4)  # + lock
+
+
+class WarmStartTest(TestCase):
+    def test_master_warms_up_and_workers_get_their_own_identity(self):
+        Track.objects.create(title="T", audio_url="u")
+        radio_service.index.invalidate()
+        self.addCleanup(gc.unfreeze)
+        with mock.patch.object(prefork, "connections") as connections:
+            prefork.warm_start()
+        connections.close_all.assert_called_once()
+        self.assertFalse(radio_service.index.needs_io())
+        self.assertFalse(radio_service.similarity.needs_io())
+
+        origin = radio_service.state.origin
+        state = radio_service.rng.getstate()
+        prefork.after_fork()
+        self.assertNotEqual(radio_service.state.origin, origin)
+        self.assertNotEqual(radio_service.rng.getstate(), state)
@@ -0,0 +1,191 @@
+import json
+import random
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils.timezone import now
+
+from apps.library.models import Track
+from apps.playback.ingest import FeedbackBuffer, FeedbackEvent
+from apps.playback.models import Feedback
+from apps.radio.index import TrackIndex
+from apps.radio.profiles import PROFILE_OVERHEAD, SparseScores, UserProfiles
+from apps.radio.queue import QueueManager
+from apps.radio.services import RadioService
+
+
+class SparseScoresTest(SimpleTestCase):
+    def test_ids_stay_sorted_and_memory_follows_ratings(self):
+        profile = SparseScores.from_pairs([7, 3, 7], [1.0, -0.7, 0.5])
+        self.assertEqual(profile.ids.tolist(), [3, 7])
+        self.assertEqual(profile.get(7), 1.5)
+        self.assertEqual(profile.add(5, 1.0), 1.0)
+        self.assertAlmostEqual(profile.add(3, 0.5), -0.2)
+        self.assertEqual(profile.ids.tolist(), [3, 5, 7])
+        self.assertEqual(profile.get(4), 0.0)
+        self.assertEqual(profile.nbytes, 3 * 16 + PROFILE_OVERHEAD)
+
+
+class UserProfilesTest(TestCase):
+    def setUp(self):
+        self.tracks = [
+            Track.objects.create(title=f"T{i}", audio_url=f"u{i}") for i in range(3)
+        ]
+        self.users = [
+            get_user_model().objects.create(username=f"u{i}") for i in range(3)
+        ]
+
+    def give(self, user, channel, i, action, times=1):
+        Feedback.objects.bulk_create(
+            Feedback(
+                user=user,
+                track=self.tracks[i],
+                channel=channel,
+                action=action,
+                rating=Feedback.ACTION_RATINGS[action],
+            )
+            for _ in range(times)
+        )
+
+    def test_profiles_are_loaded_once_and_evicted_least_recent_first(self):
+        a, b, c = (user.pk for user in self.users)
+        self.give(self.users[0], "music", 0, "like", times=2)
+        self.give(self.users[0], "music", 1, "skip")
+        self.give(self.users[0], "talk", 2, "like")
+        self.give(self.users[0], "music", 2, "error")
+        profiles = UserProfiles(max_bytes=2 * (16 * 2 + PROFILE_OVERHEAD))
+        with self.assertNumQueries(1):
+            profile = profiles.get(a, "music")
+            profiles.get(a, "music")
+        self.assertEqual(profile.ids.tolist(), [self.tracks[0].pk, self.tracks[1].pk])
+        self.assertEqual(profile.values.tolist(), [2.0, -0.7])
+
+        profiles.get(b, "music")
+        profiles.add(a, "music", self.tracks[2].pk, 1.0)  # evicted: not loaded
+        profiles.get(c, "music")
+        profiles.add(c, "music", self.tracks[2].pk, 1.0)
+        self.assertFalse(profiles.cached(a, "music"))
+        self.assertTrue(profiles.cached(c, "music"))
+        self.assertLessEqual(profiles.nbytes, profiles.max_bytes)
+        self.assertEqual(profiles.get(c, "music").get(self.tracks[2].pk), 1.0)
+
+    def test_stale_profiles_are_reloaded(self):
+        profiles = UserProfiles(max_age=0)
+        profiles.get(self.users[0].pk, "music")
+        self.give(self.users[0], "music", 0, "like")
+        self.assertEqual(
+            profiles.get(self.users[0].pk, "music").get(self.tracks[0].pk), 1.0
+        )
+
+    def test_reloads_count_feedback_not_written_yet(self):
+        user = self.users[0].pk
+        self.give(self.users[0], "music", 0, "like")
+        buffer = FeedbackBuffer(flush_interval=None)
+        self.addCleanup(buffer.flush)
+        buffer.add(
+            [
+                FeedbackEvent(self.tracks[1].pk, "like", "music", now(), user),
+                FeedbackEvent(self.tracks[1].pk, "like", "talk", now(), user),
+                FeedbackEvent(self.tracks[2].pk, "like", "music", now()),
+            ]
+        )
+        profiles = UserProfiles(max_age=0)
+        with mock.patch("apps.playback.ingest.feedback_buffer", buffer):
+            profile = profiles.get(user, "music")
+        self.assertEqual(profile.ids.tolist(), [self.tracks[0].pk, self.tracks[1].pk])
+        self.assertEqual(profile.values.tolist(), [1.0, 1.0])
+
+
+class PersonalRadioTest(TestCase):
+    def setUp(self):
+        self.tracks = [
+            Track.objects.create(title=f"T{i}", artist=f"A{i}", audio_url=f"u{i}")
+            for i in range(6)
+        ]
+        self.service = RadioService(
+            rng=random.Random(1),
+            index=TrackIndex(),
+            cooldowns={"track": {"size": 0}},
+            profiles=UserProfiles(cold_start=1),
+        )
+        t = [track.pk for track in self.tracks]
+        for _ in range(5):
+            self.service.submit_feedback("music", t[0], "like", user=2)
+        self.service.submit_feedback("music", t[0], "skip", user=1)
+        self.service.submit_feedback("music", t[0], "skip", user=1)
+        self.service.submit_feedback("music", t[1], "like", user=1)
+        self.service.submit_feedback("music", t[2], "like", user=1)
+
+    def share(self, user):
+        picks = [self.service.reserve("music", user=user)[0] for _ in range(400)]
+        return picks.count(self.tracks[0].pk) / len(picks)
+
+    def test_own_ratings_outweigh_the_channel_once_confident(self):
+        scores = self.service.weights("music").score.copy()
+        self.assertGreater(self.share(None), 0.25)
+        self.assertGreater(self.share(3), 0.25)  # cold start: channel taste
+        self.assertLess(self.share(1), 0.15)
+        self.assertEqual(self.service.weights("music").score.tolist(), scores.tolist())
+        self.assertEqual(
+            self.service.profiles.get(1, "music").get(self.tracks[0].pk), -1.4
+        )
+        self.assertAlmostEqual(self.service.scores["music"][self.tracks[0].pk], 3.6)
+
+    def test_eligibility_follows_the_listeners_blend(self):
+        track = self.tracks[3].pk
+        self.service.submit_feedback("music", track, "ban", user=1)
+        self.service.weights("music")
+        # Everybody else's taste, e.g. synced from other workers, says yes.
+        self.service._set_score("music", track, 5.0)
+        self.assertTrue(self.service.is_eligible("music", track))
+        self.assertTrue(self.service.is_eligible("music", track, user=2))
+        self.assertFalse(self.service.is_eligible("music", track, user=1))
+        pos = self.service.index.position(track)
+        self.assertEqual(self.service.weights("music").score[pos], 5.0)
+
+    def test_profiles_are_loaded_before_locking(self):
+        self.service.profiles.clear()
+        locked = []
+        load = self.service.profiles._load
+
+        def check_lock(*args):
+            locked.append(self.service._lock._is_owned())
+            return load(*args)
+
+        with mock.patch.object(self.service.profiles, "_load", side_effect=check_lock):
+            self.service.next_track("music", user=1)
+            self.service.submit_feedback("music", self.tracks[0].pk, "like", user=2)
+        self.assertEqual(locked, [False, False])
+
+    def test_signed_in_listeners_get_their_own_queue_and_profile(self):
+        user = get_user_model().objects.create(username="listener")
+        self.client.force_login(user)
+        queue = QueueManager(self.service, background=False)
+        buffer = FeedbackBuffer(flush_interval=None)
+        patcher = mock.patch.multiple(
+            "apps.api.views",
+            radio_service=self.service,
+            play_queue=queue,
+            feedback_buffer=buffer,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        response = self.client.get("/api/next", {"channel": "music"})
+        self.assertEqual(response.status_code, 200)
+        session = self.client.session.session_key
+        self.assertIn(("music", session, None, user.pk), queue._queues)
+
+        response = self.client.post(
+            "/api/feedback",
+            json.dumps(
+                {"track_id": self.tracks[3].pk, "action": "like", "channel": "music"}
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 202)
+        profile = self.service.profiles.get(user.pk, "music")
+        self.assertEqual(profile.get(self.tracks[3].pk), 1.0)
+        buffer.flush()
+        self.assertEqual(Feedback.objects.get(track=self.tracks[3]).user, user)
@@ -0,0 +1,102 @@
+from django.test import SimpleTestCase, TestCase
+
+from apps.library.models import Track
+from apps.radio.cooldown import CooldownWindow
+from apps.radio.services import RadioService
+
+
+class CooldownWindowTest(SimpleTestCase):
+    def test_size_evicts_oldest_play(self):
+        window = CooldownWindow(size=2)
+        self.assertEqual(window.push("a", 0), (True, []))
+        self.assertEqual(window.push("b", 1), (True, []))
+        self.assertEqual(window.push("c", 2), (True, ["a"]))
+        self.assertNotIn("a", window)
+        self.assertEqual(list(window), ["b", "c"])
+
+    def test_repeated_key_stays_until_last_play_leaves(self):
+        window = CooldownWindow(size=2)
+        window.push("a", 0)
+        self.assertEqual(window.push("a", 1), (False, []))
+        self.assertEqual(window.push("b", 2), (True, []))
+        self.assertIn("a", window)
+        self.assertEqual(window.push("c", 3), (True, ["a"]))
+
+    def test_reentering_key_is_not_released(self):
+        window = CooldownWindow(size=1)
+        window.push("a", 0)
+        self.assertEqual(window.push("a", 1), (False, []))
+        self.assertIn("a", window)
+
+    def test_seconds_expire_old_plays(self):
+        window = CooldownWindow(seconds=60)
+        window.push("a", 0)
+        window.push("b", 30)
+        self.assertEqual(window.expire(59), [])
+        self.assertEqual(window.expire(60), ["a"])
+        self.assertEqual(window.keys(), ["b"])
+
+    def test_disabled_window_keeps_nothing(self):
+        window = CooldownWindow()
+        self.assertFalse(window)
+        self.assertEqual(window.push("a", 0), (False, []))
+        self.assertNotIn("a", window)
+
+
+class ArtistCooldownTest(TestCase):
+    def setUp(self):
+        self.tracks = {
+            (artist, i): Track.objects.create(
+                title=f"{artist}{i}",
+                artist=artist,
+                album=f"{artist} LP",
+                audio_url=f"u{artist}{i}",
+            )
+            for artist in ("A", "B", "C")
+            for i in range(3)
+        }
+
+    def artists(self, service, count):
+        return [service.next_track("music")[0].artist for _ in range(count)]
+
+    def test_same_artist_is_not_repeated_within_window(self):
+        service = RadioService(cooldowns={"artist": {"size": 2}})
+        played = self.artists(service, 12)
+        for i in range(len(played) - 2):
+            self.assertEqual(len(set(played[i : i + 3])), 3, played)
+
+    def test_artist_names_are_case_insensitive(self):
+        Track.objects.filter(artist="B").update(artist="a")
+        Track.objects.filter(artist="C").update(artist="Z")
+        service = RadioService(cooldowns={"artist": {"size": 1}})
+        played = [a.casefold() for a in self.artists(service, 6)]
+        for previous, current in zip(played, played[1:]):
+            self.assertNotEqual(previous, current)
+
+    def test_album_cooldown_masks_whole_album(self):
+        service = RadioService(cooldowns={"album": {"size": 1}})
+        first, _ = service.next_track("music")
+        weights = service.weights("music")
+        for track in Track.objects.filter(album=first.album):
+            self.assertEqual(weights.weight(service.index.position(track.id)), 0)
+
+    def test_time_window_expires(self):
+        service = RadioService(cooldowns={"artist": {"seconds": 3600}})
+        first, _ = service.next_track("music")
+        window = service.cooldowns["music"]["artist"]
+        self.assertIn("a" if first.artist == "A" else first.artist.casefold(), window)
+        service._expire("music", window._ring[0][1] + 3600)
+        self.assertEqual(len(window), 0)
+        pos = service.index.position(first.id)
+        self.assertGreater(service.weights("music").weight(pos), 0)
+
+    def test_exhausted_artist_cooldown_is_relaxed(self):
+        service = RadioService(cooldowns={"track": {"size": 1}, "artist": {"size": 10}})
+        played = [service.next_track("music")[0] for _ in range(6)]
+        self.assertNotIn(None, played)
+        for previous, current in zip(played, played[1:]):
+            self.assertNotEqual(previous.id, current.id)
+
+    def test_unknown_kind_is_rejected(self):
+        with self.assertRaises(ValueError):
+            RadioService(cooldowns={"genre": {"size": 1}})
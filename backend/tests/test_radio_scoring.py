@@ -0,0 +1,123 @@
+from array import array
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from apps.library.models import Track
+from apps.radio.index import FenwickTree, Grouping, TrackIndex
+from apps.radio.models import Channel, RatingWeight
+from apps.radio.channels import channel_registry
+from apps.radio.scoring import ChannelWeights, ScoringParams
+from apps.radio.services import RadioService
+
+DAY = 86400.0
+
+
+def make_index(artists, ages_days, now):
+    index = TrackIndex()
+    names = [""] + sorted(set(a for a in artists if a))
+    lookup = {name: code for code, name in enumerate(names)}
+    codes = np.array([lookup[a] for a in artists], dtype=np.int32)
+    added = array("d", [now - age * DAY for age in ages_days])
+    index._load(
+        array("q", range(1, len(artists) + 1)),
+        added,
+        Grouping(codes, names),
+        Grouping(np.zeros(len(artists), dtype=np.int32), [""]),
+    )
+    index._stale = False
+    return index
+
+
+class ChannelWeightsTest(SimpleTestCase):
+    now = 1_800_000_000.0
+
+    def weights(self, scores=None, params=ScoringParams(), artists=None, ages=None):
+        artists = artists or ["a", "b", "c", "d"]
+        ages = ages or [365] * len(artists)
+        index = make_index(artists, ages, self.now)
+        return ChannelWeights(index, params, scores or {}, now=self.now)
+
+    def test_feedback_orders_weights(self):
+        w = self.weights({1: 1.0, 2: 0.5, 4: -0.7})
+        values, familiar = w.compute()
+        self.assertTrue(values[0] > values[1] > values[2] > values[3] > 0)
+        self.assertEqual(familiar.tolist(), [True, True, False, False])
+
+    def test_ban_removes_track(self):
+        w = self.weights({2: -1e6})
+        self.assertEqual(w.weight(1), 0.0)
+
+    def test_recent_artist_plays_are_penalised(self):
+        w = self.weights(artists=["a", "a", "b", ""])
+        before = w.weight(1)
+        w.artist_played(0)
+        self.assertLess(w.weight(1), before)
+        self.assertEqual(w.weight(2), before)
+        w.artist_played(0, -1)
+        self.assertAlmostEqual(w.weight(1), before)
+
+    def test_new_tracks_get_a_freshness_bonus(self):
+        w = self.weights(ages=[0, 30, 365, 365])
+        values, _ = w.compute()
+        self.assertTrue(values[0] > values[1] > values[2])
+        self.assertAlmostEqual(values[2], values[3])
+
+    def test_channel_multipliers_scale_feedback(self):
+        plain = self.weights({1: 1.0, 2: -0.7})
+        scaled = self.weights(
+            {1: 1.0, 2: -0.7}, ScoringParams(positive=2.0, negative=3.0)
+        )
+        self.assertGreater(scaled.weight(0), plain.weight(0))
+        self.assertLess(scaled.weight(1), plain.weight(1))
+
+    def test_exploration_picks_the_pool(self):
+        w = self.weights({1: 1.0})
+
+        class Draws:
+            def __init__(self, *values):
+                self.values = list(values)
+
+            def random(self):
+                return self.values.pop(0)
+
+        self.assertEqual(w.sample(Draws(0.9, 0.5)), 0)
+        self.assertIn(w.sample(Draws(0.1, 0.5)), (1, 2, 3))
+
+    def test_blocking_hides_and_restores_weight(self):
+        w = self.weights()
+        weight = w.weight(2)
+        w.block(2)
+        w.block(2)
+        w.unblock(2)
+        self.assertEqual(w.weight(2), 0.0)
+        w.unblock(2)
+        self.assertEqual(w.weight(2), weight)
+
+    def test_vectorised_tree_matches_incremental_tree(self):
+        values = np.random.default_rng(3).random(1000)
+        built = FenwickTree.from_array(values)
+        reference = FenwickTree(values.tolist())
+        self.assertTrue(np.allclose(built.tree, reference.tree))
+
+
+class ChannelParamsTest(TestCase):
+    def test_rating_weight_multipliers_are_used_and_refreshed(self):
+        channel = Channel.objects.create(name="music")
+        self.assertEqual(channel_registry.get("music").params, ScoringParams())
+        RatingWeight.objects.create(channel=channel, positive=2.0, negative=0.5)
+        params = channel_registry.get("music").params
+        self.assertEqual((params.positive, params.negative), (2.0, 0.5))
+
+    def test_skips_push_tracks_out_of_rotation(self):
+        tracks = [
+            Track.objects.create(title=f"T{i}", artist=f"A{i}", audio_url=f"u{i}")
+            for i in range(2)
+        ]
+        service = RadioService(cooldown_size=0)
+        for _ in range(5):
+            service.submit_feedback("talk", tracks[0].id, "skip")
+        weights = service.weights("talk")
+        self.assertLess(weights.weight(0) * 10, weights.weight(1))
+        service.submit_feedback("talk", tracks[0].id, "ban")
+        self.assertFalse(service.is_eligible("talk", tracks[0].id))
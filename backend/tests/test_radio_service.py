@@ -1,17 +1,19 @@
-from typing import List
-
 from django.test import TestCase
 
+from apps.core.models import CatalogVersion
 from apps.library.models import Track
+from apps.radio.index import FenwickTree, TrackIndex
 from apps.radio.services import RadioService
 
 
 class DummyRandom:
-    """Deterministic choice helper selecting the highest weight."""
+    """Deterministic random source always drawing the same point."""
+
+    def __init__(self, value: float = 0.3) -> None:
+        self.value = value
 
-    def choices(self, population: List, weights: List[float], k: int = 1):  # type: ignore[override]
-        index = max(range(len(population)), key=lambda i: weights[i])
-        return [population[index]]
+    def random(self) -> float:
+        return self.value
 
 
 class RadioServiceTest(TestCase):
@@ -41,3 +43,47 @@ class RadioServiceTest(TestCase):
         chosen_b, _ = service.next_track(channel_b)
         self.assertEqual(chosen_a.id, self.tracks[1].id)
         self.assertEqual(chosen_b.id, self.tracks[0].id)
+
+    def test_sampling_does_not_load_candidates(self):
+        service = RadioService(cooldown_size=1, rng=DummyRandom())
+        service.next_track("warm")
+        with self.assertNumQueries(1):
+            track, _ = service.next_track("warm")
+        self.assertIsNotNone(track)
+
+    def test_new_tracks_join_the_index(self):
+        service = RadioService(cooldown_size=3, rng=DummyRandom())
+        for _ in range(3):
+            service.next_track("grow")
+        extra = Track.objects.create(title="T3", artist="A", audio_url="u3")
+        chosen, _ = service.next_track("grow")
+        self.assertEqual(chosen.id, extra.id)
+
+    def test_deleted_tracks_are_never_returned(self):
+        service = RadioService(cooldown_size=0, rng=DummyRandom(0.0))
+        self.tracks[0].delete()
+        chosen, _ = service.next_track("gone")
+        self.assertEqual(chosen.id, self.tracks[1].id)
+
+    def test_changes_from_other_processes_join_the_index(self):
+        index = TrackIndex(check_interval=0)
+        index.ensure()
+        # A scan or another worker: no signal reaches this process, only the
+        # catalog version changes.
+        extra = Track.objects.bulk_create([Track(title="T3", audio_url="u3")])[0]
+        self.assertFalse(index.ensure())
+        CatalogVersion.objects.update(token="elsewhere")
+        self.assertTrue(index.ensure())
+        self.assertEqual(index.position(extra.pk), 3)
+
+
+class FenwickTreeTest(TestCase):
+    def test_find_follows_cumulative_weights(self):
+        tree = FenwickTree([1.0, 0.0, 2.0, 1.0])
+        self.assertEqual(tree.total(), 4.0)
+        self.assertEqual(
+            [tree.find(x) for x in (0.0, 0.99, 1.0, 2.9, 3.0)], [0, 0, 2, 2, 3]
+        )
+        tree.set(2, 0.0)
+        self.assertEqual(tree.find(1.5), 3)
+        self.assertEqual(tree.find(tree.total()), 3)
@@ -0,0 +1,123 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.library.models import Track
+from apps.radio.models import ScoreEntry
+from apps.radio.services import RadioService
+from apps.radio.state import DatabaseStateBackend, SQLiteStateBackend
+
+
+class FixedRandom:
+    def __init__(self, value: float = 0.3) -> None:
+        self.value = value
+
+    def random(self) -> float:
+        return self.value
+
+
+class SharedStateMixin:
+    """Two services standing in for two gunicorn workers."""
+
+    def make_backend(self):  # pragma: no cover - overridden
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tracks = [
+            Track.objects.create(title=f"T{i}", artist="A", audio_url=f"u{i}")
+            for i in range(3)
+        ]
+        self.workers = [
+            RadioService(
+                cooldown_size=1,
+                rng=FixedRandom(),
+                state=self.make_backend(),
+                sync_interval=0,
+            )
+            for _ in range(2)
+        ]
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.state.flush()
+
+    def test_feedback_is_shared_after_flush(self):
+        first, second = self.workers
+        first.submit_feedback("music", self.tracks[2].id, True)
+        first.submit_feedback("music", self.tracks[2].id, True)
+        first.state.flush()
+        second.rng = FixedRandom(0.9)
+        chosen, _ = second.next_track("music")
+        self.assertEqual(second.scores["music"][self.tracks[2].id], 2)
+        self.assertEqual(chosen.id, self.tracks[2].id)
+
+    def test_feedback_is_buffered(self):
+        first, _ = self.workers
+        first.state.batch_size = 10
+        first.state.flush_interval = 60
+        first.submit_feedback("music", self.tracks[0].id, True)
+        self.assertEqual(first.state.load()[0], [])
+
+    def test_increments_from_workers_add_up(self):
+        first, second = self.workers
+        first.submit_feedback("music", self.tracks[0].id, "like")
+        first.state.flush()
+        second.submit_feedback("music", self.tracks[0].id, "skip")
+        second.submit_feedback("music", self.tracks[0].id, "skip")
+        second.state.flush()
+        [(channel, track_id, score)] = first.state.load()[0]
+        self.assertEqual((channel, track_id), ("music", self.tracks[0].id))
+        self.assertAlmostEqual(score, -0.4)
+
+    def test_plays_put_tracks_on_cooldown_everywhere(self):
+        first, second = self.workers
+        played, _ = first.next_track("talk")
+        first.state.flush()
+        second._sync()
+        self.assertEqual(list(second.cooldowns["talk"]["track"]), [played.id])
+
+
+class DatabaseStateBackendTest(SharedStateMixin, TestCase):
+    def make_backend(self):
+        return DatabaseStateBackend(batch_size=1000, flush_interval=60)
+
+    def test_rows_are_stored(self):
+        first, _ = self.workers
+        first.submit_feedback("music", self.tracks[1].id, True)
+        first.state.flush()
+        entry = ScoreEntry.objects.get()
+        self.assertEqual(
+            (entry.channel, entry.track_id, entry.score),
+            ("music", self.tracks[1].id, 1.0),
+        )
+
+    def test_feedback_is_queued_before_the_service_lock_is_released(self):
+        # Otherwise a _sync() in between could poll the stored total and
+        # overwrite the score just changed.
+        first, _ = self.workers
+        held = []
+        add = first.state.add
+
+        def check_lock(*args, **kwargs):
+            held.append(first._lock._is_owned())
+            return add(*args, **kwargs)
+
+        with mock.patch.object(first.state, "add", side_effect=check_lock):
+            first.submit_feedback("music", self.tracks[0].id, "like")
+        self.assertEqual(held, [True])
+
+
+class SQLiteStateBackendTest(SharedStateMixin, TestCase):
+    def make_backend(self):
+        return SQLiteStateBackend(path=self.path, batch_size=1000, flush_interval=60)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp.name) / "state.sqlite3")
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmp.cleanup()
@@ -0,0 +1,92 @@
+import io
+import os
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.library.models import Track
+from apps.library.scanner import LibraryScanner
+from apps.playback.models import Playback
+from apps.radio.index import TrackIndex
+
+
+class ScanLibraryTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        (self.root / "Artist" / "Album").mkdir(parents=True)
+        for name in (
+            "Artist/Album/01 Song.mp3",
+            "Artist/Album/02 Other.flac",
+            "loose.ogg",
+        ):
+            (self.root / name).write_bytes(b"not really audio")
+        (self.root / "Artist" / "Album" / "cover.jpg").write_bytes(b"jpeg")
+
+    def scan(self):
+        return LibraryScanner(root=str(self.root), workers=1, chunk_size=2).scan()
+
+    def test_first_scan_creates_tracks(self):
+        result = self.scan()
+        self.assertEqual((result.seen, result.created), (3, 3))
+        track = Track.objects.get(path="Artist/Album/01 Song.mp3")
+        self.assertEqual(track.title, "01 Song")
+        self.assertEqual(track.audio_url, "/sui_stream/Artist/Album/01%20Song.mp3")
+        self.assertEqual(track.file_size, len(b"not really audio"))
+
+    def test_unchanged_rescan_only_reads_manifest(self):
+        self.scan()
+        with self.assertNumQueries(1):
+            result = self.scan()
+        self.assertEqual(result[1:], (0, 0, 0))
+
+    def test_rescan_updates_changed_and_marks_missing(self):
+        self.scan()
+        track = Track.objects.get(path="loose.ogg")
+        changed = self.root / "loose.ogg"
+        changed.write_bytes(b"longer than it was before")
+        os.utime(changed, ns=(1, 1))
+        (self.root / "Artist/Album/02 Other.flac").unlink()
+        result = self.scan()
+        self.assertEqual(result[1:], (0, 1, 1))
+        track.refresh_from_db()
+        self.assertEqual(track.file_size, len(b"longer than it was before"))
+        gone = Track.objects.get(path="Artist/Album/02 Other.flac")
+        self.assertIsNotNone(gone.missing_since)
+        self.assertEqual(len(self.client.get("/api/tracks/").json()["results"]), 2)
+        index = TrackIndex()
+        index.ensure()
+        self.assertTrue(index.hidden[index.position(gone.pk)])
+
+        (self.root / "Artist/Album/02 Other.flac").write_bytes(b"back again")
+        self.assertEqual(self.scan()[1:], (0, 1, 0))
+        gone.refresh_from_db()
+        self.assertIsNone(gone.missing_since)
+
+    def test_moved_files_keep_their_track_and_history(self):
+        self.scan()
+        track = Track.objects.get(path="loose.ogg")
+        Playback.objects.create(track=track, channel="music")
+        (self.root / "Moved").mkdir()
+        os.rename(self.root / "loose.ogg", self.root / "Moved/renamed.ogg")
+        self.assertEqual(self.scan()[1:], (0, 1, 0))
+        track.refresh_from_db()
+        self.assertEqual(track.path, "Moved/renamed.ogg")
+        self.assertEqual(track.audio_url, "/sui_stream/Moved/renamed.ogg")
+        self.assertEqual(Track.objects.count(), 3)
+        self.assertEqual(Playback.objects.get().track, track)
+
+    def test_unreadable_entries_are_skipped(self):
+        os.symlink(self.root / "nowhere.mp3", self.root / "dangling.mp3")
+        with self.assertLogs("apps.library.scanner", "WARNING"):
+            result = self.scan()
+        self.assertEqual((result.seen, result.created), (3, 3))
+
+    def test_command_reports_counts(self):
+        out = io.StringIO()
+        call_command("scan_library", root=str(self.root), workers=2, stdout=out)
+        self.assertIn("3 created", out.getvalue())
+        self.assertEqual(Track.objects.count(), 3)
@@ -0,0 +1,111 @@
+import io
+import random
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from apps.library.models import Track
+from apps.playback.models import Feedback
+from apps.radio.history import ScoreHistory, new_scores
+from apps.radio.index import TrackIndex
+from apps.radio.models import ScoreSnapshot
+from apps.radio.services import RadioService
+
+
+class ScoreHistoryTest(TestCase):
+    def setUp(self):
+        self.tracks = [
+            Track.objects.create(title=f"T{i}", audio_url=f"u{i}") for i in range(3)
+        ]
+        self.history = ScoreHistory(chunk_size=2, snapshot_every=4, keep=2)
+
+    def give(self, *feedback):
+        Feedback.objects.bulk_create(
+            Feedback(
+                track=self.tracks[i],
+                channel=channel,
+                action=action,
+                rating=Feedback.ACTION_RATINGS[action],
+            )
+            for channel, i, action in feedback
+        )
+
+    def scores(self, rows):
+        return {(channel, track_id): score for channel, track_id, score in rows}
+
+    def test_restore_replays_only_feedback_after_the_snapshot(self):
+        t = [track.pk for track in self.tracks]
+        self.give(("music", 0, "like"), ("music", 1, "skip"), ("talk", 0, "error"))
+        snapshot = self.history.snapshot()
+        self.assertEqual(snapshot.channels, ["music"])
+        self.give(("music", 0, "complete"), ("talk", 2, "ban"))
+
+        scores, last, replayed = self.history.current()
+        self.assertEqual(replayed, 2)
+        self.assertEqual(last, Feedback.objects.latest("id").pk)
+        self.assertEqual(
+            self.scores(self.history.restore()),
+            {
+                ("music", t[0]): 1.5,
+                ("music", t[1]): -0.7,
+                ("talk", t[2]): -1e6,
+            },
+        )
+        full = new_scores()
+        self.history.replay(full)
+        self.assertEqual(full, scores)
+
+    def test_long_replays_write_a_snapshot_and_old_ones_are_pruned(self):
+        self.give(*[("music", i % 3, "like") for i in range(4)])
+        self.history.restore()
+        self.assertEqual(ScoreSnapshot.objects.count(), 1)
+        self.assertEqual(
+            ScoreSnapshot.objects.get().last_feedback_id,
+            Feedback.objects.latest("id").pk,
+        )
+        self.history.restore()  # nothing new: no snapshot
+        self.assertEqual(ScoreSnapshot.objects.count(), 1)
+        for _ in range(3):
+            self.give(("music", 0, "skip"))
+            self.history.snapshot()
+        self.assertEqual(ScoreSnapshot.objects.count(), 2)
+
+    def test_snapshots_of_other_action_scores_are_ignored(self):
+        self.give(("music", 0, "like"))
+        self.history.snapshot()
+        ScoreSnapshot.objects.update(scoring="{}")
+        self.assertIsNone(self.history.latest())
+        self.assertEqual(self.history.current()[2], 1)
+
+    def test_service_starts_with_restored_scores(self):
+        self.give(("music", 0, "ban"), ("music", 1, "ban"))
+        self.history.snapshot()
+        service = RadioService(
+            rng=random.Random(0),
+            index=TrackIndex(),
+            cooldowns={"track": {"size": 0}},
+            score_history=self.history,
+        )
+        picks = {service.reserve("music")[0] for _ in range(20)}
+        self.assertEqual(picks, {self.tracks[2].pk})
+        self.assertEqual(service.scores["music"][self.tracks[0].pk], -1e6)
+
+    def test_verify_command(self):
+        self.give(("music", 0, "like"), ("music", 1, "complete"))
+        snapshot = self.history.snapshot()
+        out = io.StringIO()
+        call_command("verify_scores", stdout=out)
+        self.assertIn(f"Snapshot {snapshot.pk} matches", out.getvalue())
+
+        self.give(("music", 0, "skip"))  # newer than the snapshot: not checked
+        scores = self.history.load(snapshot)
+        scores["music"][self.tracks[1].pk] = 2.0
+        tampered = self.history.save(scores, snapshot.last_feedback_id)
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, "differs from the replay for 1"):
+            call_command("verify_scores", snapshot=tampered.pk, stdout=out)
+        self.assertIn(f"music {self.tracks[1].pk}: 2.0 != 0.5", out.getvalue())
+
+        ScoreSnapshot.objects.all().delete()
+        with self.assertRaisesMessage(CommandError, "No score snapshot"):
+            call_command("verify_scores")
@@ -0,0 +1,145 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from apps.library import search
+from apps.library.models import SearchChange, Track
+from apps.library.scanner import LibraryScanner
+from apps.library.search import FTS5Search, TrigramSearch, grams, words
+
+
+class TextTest(SimpleTestCase):
+    def test_words_are_folded_and_padded_grams_cover_prefixes(self):
+        self.assertEqual(words("Beyoncé – DÉJÀ_VU!"), ["beyonce", "deja", "vu"])
+        self.assertEqual(grams("Ab"), {"  a", " ab"})
+        self.assertEqual(grams("  "), set())
+
+
+class SearchTests:
+    """Shared by both backends; ``self.backend`` is the one under test."""
+
+    def setUp(self):
+        cache.clear()
+        self.backend = self.make_backend()
+        patcher = mock.patch.object(search, "_backend", self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.song = self.create(title="Yellow Submarine", artist="The Beatles")
+        self.album = self.create(title="Octopus", album="Yellow Submarine")
+        self.other = self.create(title="Paranoid Android", artist="Radiohead")
+
+    def create(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Track.objects.create(audio_url="u", **fields)
+
+    def find(self, query, limit=20):
+        return self.backend.search(query, limit)
+
+    def test_prefixes_match_while_typing(self):
+        self.assertEqual(self.find("y")[:2], [self.song.pk, self.album.pk])
+        self.assertEqual(self.find("yel sub"), [self.song.pk, self.album.pk])
+        self.assertEqual(self.find("radioh"), [self.other.pk])
+        self.assertEqual(self.find("yel", limit=1), [self.song.pk])
+        self.assertEqual(self.find(""), [])
+        self.assertEqual(self.find("zzz"), [])
+
+    def test_typos_are_tolerated(self):
+        self.assertEqual(self.find("beatels"), [self.song.pk])
+        self.assertEqual(self.find("paranod andriod"), [self.other.pk])
+
+    def test_saves_and_deletes_are_indexed(self):
+        self.backend.ensure()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.title = "Karma Police"
+            self.other.save()
+            self.song.delete()
+        new = self.create(title="Yellow", artist="Coldplay")
+        self.assertEqual(self.find("karma"), [self.other.pk])
+        self.assertEqual(self.find("paranoid"), [])
+        self.assertEqual(self.find("yellow"), [new.pk, self.album.pk])
+
+
+class FTS5SearchTest(SearchTests, TestCase):
+    def make_backend(self):
+        return FTS5Search()
+
+    def test_candidates_are_the_best_matches_not_the_oldest(self):
+        Track.objects.bulk_create(
+            Track(title=f"Yellow Brick Road {i}", audio_url="u") for i in range(10)
+        )
+        exact = Track.objects.bulk_create([Track(title="Yellow", audio_url="u")])[0]
+        self.backend.rebuild()
+        with mock.patch.object(search, "CANDIDATES", 5):
+            self.assertEqual(self.find("yellow", limit=1), [exact.pk])
+
+
+class TrigramSearchTest(SearchTests, TestCase):
+    def make_backend(self):
+        return TrigramSearch(check_interval=0, compact_at=1)
+
+    def test_other_processes_catch_up_through_the_database(self):
+        other = TrigramSearch(check_interval=0)
+        other.ensure()
+        self.create(title="Idioteque")
+        cache.clear()  # nothing is shared through a process-local cache
+        self.assertEqual(other.search("idiot"), [Track.objects.latest("id").pk])
+        self.assertEqual(len(other.extra), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.backend.rebuild()
+        other.search("idiot")
+        self.assertEqual(other.extra, {})
+
+    def test_old_log_entries_are_deleted(self):
+        with mock.patch.object(search, "MAX_CATCH_UP", 2):
+            for track_id in range(5):
+                search.log_changes([track_id])
+        head = search.log_head()
+        self.assertEqual(
+            list(SearchChange.objects.order_by("pk").values_list("pk", flat=True)),
+            [head - 1, head],
+        )
+
+    def test_lost_log_entries_lead_to_a_rebuild(self):
+        other = TrigramSearch(check_interval=0)
+        other.ensure()
+        search.log_changes([self.song.pk])
+        SearchChange.objects.filter(pk=search.log_head()).delete()
+        search.log_changes([self.other.pk])
+        with mock.patch.object(other, "_build", wraps=other._build) as build:
+            other.ensure()
+            build.assert_not_called()  # it may still be being written
+            other.ensure()
+            build.assert_called_once()
+        self.assertEqual(other.seq, search.log_head())
+
+
+class SearchEndpointTest(TestCase):
+    def setUp(self):
+        self.tracks = [
+            Track.objects.create(title=f"Song {i}", artist="Band", audio_url=f"u{i}")
+            for i in range(3)
+        ]
+
+    def test_returns_ranked_tracks(self):
+        response = self.client.get("/api/search", {"q": "song 1"})
+        self.assertEqual(response.status_code, 200)
+        tracks = response.json()
+        self.assertEqual(tracks[0]["id"], self.tracks[1].pk)
+        self.assertEqual(tracks[0]["title"], "Song 1")
+        response = self.client.get("/api/search", {"q": "band", "limit": 2})
+        self.assertEqual(len(response.json()), 2)
+
+    def test_rejects_bad_limits(self):
+        for limit in ("x", "0", "51"):
+            response = self.client.get("/api/search", {"q": "song", "limit": limit})
+            self.assertEqual(response.status_code, 400)
+
+    def test_scans_are_indexed(self):
+        with tempfile.TemporaryDirectory() as root:
+            (Path(root) / "Sleepwalker.mp3").write_bytes(b"not really audio")
+            LibraryScanner(root=root, workers=1).scan()
+        response = self.client.get("/api/search", {"q": "sleepw"})
+        self.assertEqual([track["title"] for track in response.json()], ["Sleepwalker"])
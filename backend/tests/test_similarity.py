@@ -0,0 +1,122 @@
+import random
+import tempfile
+
+import numpy as np
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.library.features import FEATURE_NAMES, FEATURE_VERSION
+from apps.library.models import Track, TrackFeature
+from apps.radio import play_queue
+from apps.radio.index import TrackIndex
+from apps.radio.services import RadioService
+from apps.radio.similarity import SimilarityIndex, similarity_index
+
+
+class SimilarityTestCase(TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        self.centres = self.rng.normal(size=(2, len(FEATURE_NAMES))) * 5
+        self.a = [self.track(f"a{i}", 0, artist=f"A{i}") for i in range(6)]
+        self.b = [self.track(f"b{i}", 1, artist=f"B{i}") for i in range(6)]
+        self.index = TrackIndex()
+
+    def track(self, title, cluster=None, artist="", album=""):
+        track = Track.objects.create(
+            title=title, artist=artist, album=album, audio_url=f"/{title}"
+        )
+        if cluster is not None:
+            vector = self.centres[cluster] + self.rng.normal(size=len(FEATURE_NAMES))
+            TrackFeature.objects.create(
+                track=track,
+                version=FEATURE_VERSION,
+                vector=vector.astype("<f4").tobytes(),
+                analysed_at=timezone.now(),
+            )
+        return track
+
+    def ids(self, positions):
+        return {self.index.ids[pos] for pos in positions}
+
+
+class SimilarityIndexTest(SimilarityTestCase):
+    def test_batched_neighbours_come_from_the_same_cluster(self):
+        similarity = SimilarityIndex(self.index)
+        a, b, missing = similarity.neighbours([self.a[0].id, self.b[0].id, 0], k=5)
+        self.assertEqual(self.ids(a[0]), {t.id for t in self.a[1:]})
+        self.assertEqual(self.ids(b[0]), {t.id for t in self.b[1:]})
+        self.assertTrue(np.all(np.diff(a[1]) <= 0))
+        self.assertIsNone(missing)
+        self.assertEqual(similarity.matrix.dtype, np.float32)
+        self.assertTrue(similarity.matrix.flags.c_contiguous)
+
+    def test_shared_artist_helps_tracks_without_features(self):
+        lone = self.track("lone", artist="Solo")
+        mate = self.track("mate", artist="Solo")
+        positions, scores = SimilarityIndex(self.index).neighbours_of(lone.id, k=3)
+        self.assertEqual(self.index.ids[positions[0]], mate.id)
+        self.assertGreater(scores[0], scores[1])
+
+    def test_new_tracks_are_appended_without_a_rebuild(self):
+        similarity = SimilarityIndex(self.index)
+        similarity.ensure()
+        buffer, before = similarity._buffer, similarity.matrix.copy()
+        added = self.track("a6", 0)
+        self.index.invalidate()
+        with self.assertNumQueries(2):  # track index, the new track's features
+            positions, _ = similarity.neighbours_of(added.id, k=3)
+        self.assertIs(similarity._buffer, buffer)
+        self.assertTrue(np.array_equal(similarity.matrix[:-1], before))
+        self.assertLessEqual(self.ids(positions), {t.id for t in self.a})
+
+    def test_saved_matrix_is_memory_mapped(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        built = SimilarityIndex(self.index, path=tmp.name)
+        built.ensure()
+
+        loaded = SimilarityIndex(TrackIndex(), path=tmp.name)
+        with self.assertNumQueries(2):  # track index, feature stamp
+            loaded.ensure()
+        self.assertIsInstance(loaded._buffer, np.memmap)
+        self.assertTrue(np.array_equal(loaded.matrix, built.matrix))
+
+        TrackFeature.objects.filter(track=self.a[0]).delete()
+        rebuilt = SimilarityIndex(TrackIndex(), path=tmp.name)
+        rebuilt.ensure()
+        self.assertNotIsInstance(rebuilt._buffer, np.memmap)
+        self.assertFalse(rebuilt.matrix[0].any())
+
+
+class SeededRadioTest(SimilarityTestCase):
+    def test_seed_biases_sampling_towards_neighbours(self):
+        service = RadioService(
+            rng=random.Random(3),
+            index=self.index,
+            cooldowns={"track": {"size": 0}},
+            seed_neighbours=5,
+        )
+        cluster = {t.id for t in self.a}
+
+        def share(seed):
+            picks = [service.reserve("music", seed=seed)[0] for _ in range(300)]
+            return sum(pick in cluster for pick in picks) / len(picks)
+
+        self.assertGreater(share(self.a[0].id), 0.75)
+        self.assertLess(share(None), 0.65)
+        with self.assertNumQueries(0):
+            service.reserve("music", seed=self.a[0].id)
+            service.reserve("music", seed=0)  # unknown seed: no bias
+
+    def test_next_endpoint_accepts_seed(self):
+        similarity_index.invalidate()
+        play_queue.clear()
+        self.addCleanup(play_queue.clear)
+        response = self.client.get(
+            "/api/next", {"channel": "music", "seed": self.a[0].id, "count": 3}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["tracks"]), 3)
+        self.assertIn(("music", "", self.a[0].id, None), play_queue._queues)
+        response = self.client.get("/api/next", {"channel": "music", "seed": "x"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,156 @@
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from apps.core.transfer import Importer, export_lines
+from apps.library.models import Track
+from apps.playback.models import Feedback, Playback
+from apps.radio.models import Channel, RatingWeight
+
+
+class TransferTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.user = get_user_model().objects.create(username="alice")
+        channel = Channel.objects.create(
+            name="music", cooldowns={"artist": {"size": 2}}
+        )
+        RatingWeight.objects.create(channel=channel, positive=2.0)
+        self.tracks = [
+            Track.objects.create(title=f"T{i}", audio_url=f"u{i}", path=f"p{i}")
+            for i in range(3)
+        ]
+        # A copy of a track further down the file.
+        Track.objects.filter(pk=self.tracks[0].pk).update(
+            duplicate_of=self.tracks[2],
+            created_at=datetime(2020, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc),
+        )
+        playback = Playback.objects.create(
+            track=self.tracks[1], user=self.user, channel="music"
+        )
+        Feedback.objects.create(
+            playback=playback,
+            track=self.tracks[1],
+            user=self.user,
+            channel="music",
+            action="like",
+            rating=1,
+        )
+        Feedback.objects.create(track=self.tracks[2], action="skip", rating=-1)
+
+    def snapshot(self):
+        return {
+            "tracks": list(
+                Track.objects.values_list("title", "duplicate_of__title", "created_at")
+            ),
+            "channels": list(
+                RatingWeight.objects.values_list(
+                    "channel__name", "channel__cooldowns", "positive"
+                )
+            ),
+            "feedback": list(
+                Feedback.objects.values_list(
+                    "track__title", "playback__track__title", "user__username", "action"
+                )
+            ),
+        }
+
+    def export(self, name="export.ndjson.gz"):
+        path = os.path.join(self.dir, name)
+        out = io.StringIO()
+        call_command("export_data", output=path, stdout=out)
+        self.assertIn("Exported 8 rows", out.getvalue())
+        return path
+
+    def clear(self):
+        Track.objects.all().delete()
+        Channel.objects.all().delete()
+
+    def test_round_trip_into_an_empty_database_keeps_ids(self):
+        before = self.snapshot()
+        ids = sorted(Feedback.objects.values_list("id", flat=True))
+        path = self.export()
+        self.clear()
+        out = io.StringIO()
+        call_command("import_data", path, stdout=out)
+        self.assertIn("2 playback.feedback", out.getvalue())
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(sorted(Feedback.objects.values_list("id", flat=True)), ids)
+
+    def test_import_into_a_populated_database_shifts_ids(self):
+        path = self.export()
+        # Only the file of tracks[1] is in both libraries.
+        Track.objects.exclude(pk=self.tracks[1].pk).update(path="")
+        top = Track.objects.latest("id").pk
+        call_command("import_data", path, stdout=io.StringIO())
+        self.assertEqual(Track.objects.count(), 5)
+        copy = Track.objects.get(pk=self.tracks[0].pk + top)
+        self.assertEqual(copy.duplicate_of_id, self.tracks[2].pk + top)
+        self.assertEqual(Feedback.objects.count(), 4)
+        liked = Feedback.objects.filter(action="like").latest("id")
+        self.assertEqual(liked.track, self.tracks[1])
+        self.assertEqual(liked.playback.track, self.tracks[1])
+        self.assertEqual(liked.playback.user, self.user)
+        skipped = Feedback.objects.filter(action="skip").latest("id")
+        self.assertEqual(skipped.track_id, self.tracks[2].pk + top)
+
+    def test_interrupted_imports_resume_from_the_checkpoint(self):
+        lines = list(export_lines())
+        before = self.snapshot()
+        self.clear()
+        checkpoint = os.path.join(self.dir, "import.json")
+
+        def crash(label, count):
+            if label == "playback.playback":
+                raise RuntimeError("killed")
+
+        with self.assertRaises(RuntimeError):
+            Importer(batch_size=2, checkpoint=checkpoint, progress=crash).run(lines)
+        with open(checkpoint) as fh:
+            self.assertEqual(json.load(fh)["line"], 6)
+        # Batches after the checkpoint may be in already: they are inserted
+        # again, and tracks are not mistaken for copies of themselves.
+        with open(checkpoint) as fh:
+            state = json.load(fh)
+        state["line"] -= 3
+        with open(checkpoint, "w") as fh:
+            json.dump(state, fh)
+
+        Importer(batch_size=2, checkpoint=checkpoint).run(lines)
+        self.assertEqual(self.snapshot(), before)
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_unknown_files_are_rejected(self):
+        path = os.path.join(self.dir, "bad.ndjson")
+        with open(path, "w") as fh:
+            fh.write('{"format": "other"}\n')
+        with self.assertRaisesMessage(CommandError, "Not a suitune export"):
+            call_command("import_data", path, stdout=io.StringIO())
+
+
+class ExportEndpointTest(TestCase):
+    def setUp(self):
+        Track.objects.create(title="T", audio_url="u")
+
+    def test_admins_get_a_streamed_export(self):
+        User = get_user_model()
+        self.client.force_login(User.objects.create(username="listener"))
+        self.assertEqual(self.client.get("/api/export").status_code, 403)
+
+        self.client.force_login(User.objects.create(username="admin", is_staff=True))
+        response = self.client.get("/api/export", {"models": "library.track"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])["models"], ["library.track"])
+        self.assertEqual([json.loads(line)["title"] for line in lines[1:]], ["T"])
+        response = self.client.get("/api/export", {"models": "auth.user"})
+        self.assertEqual(response.status_code, 400)
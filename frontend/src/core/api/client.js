@@ -25,10 +25,28 @@ export async function fetchNext(channel = "music") {
   return nextSchema.parse(json);
 }
 
-export async function fetchTracks() {
-  const resp = await fetch(`${import.meta.env.VITE_API_BASE}/tracks/`);
+const trackPageSchema = z.object({
+  next: z.string().nullable(),
+  results: z.array(trackSchema),
+});
+
+/** One keyset page of tracks; pass the previous page's `next` to continue. */
+export async function fetchTrackPage(next = null) {
+  const resp = await fetch(next ?? `${import.meta.env.VITE_API_BASE}/tracks/`);
   const json = await resp.json();
-  return z.array(trackSchema).parse(json);
+  return trackPageSchema.parse(json);
+}
+
+/** Every track, following the keyset pages to the end. */
+export async function fetchTracks() {
+  const tracks = [];
+  let next = null;
+  do {
+    const page = await fetchTrackPage(next);
+    tracks.push(...page.results);
+    next = page.next;
+  } while (next);
+  return tracks;
 }
 
 export async function fetchFavorites() {